@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'panel.middleware.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,19 +71,149 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# MARDEBURGER_ASGI=1 cuando se sirve con un servidor ASGI (uvicorn,
+# daphne): las páginas del catálogo y la API del carrito usan vistas async
+# y los avisos en vivo del panel se envían con un generador async
+DESPLIEGUE_ASGI = os.environ.get('MARDEBURGER_ASGI') == '1'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# MARDEBURGER_DB elige el perfil: 'sqlite' (por defecto) o 'postgres'.
+
+DB_PERFIL = os.environ.get('MARDEBURGER_DB', 'sqlite')
+
+# Segundos que se reutiliza cada conexión (0 = una conexión por request)
+DB_CONN_MAX_AGE = int(os.environ.get('MARDEBURGER_DB_CONN_MAX_AGE', 60))
+
+if DB_PERFIL == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('MARDEBURGER_DB_NAME', 'mardeburger'),
+            'USER': os.environ.get('MARDEBURGER_DB_USER', 'mardeburger'),
+            'PASSWORD': os.environ.get('MARDEBURGER_DB_PASSWORD', ''),
+            'HOST': os.environ.get('MARDEBURGER_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('MARDEBURGER_DB_PORT', '5432'),
+            # Conexiones persistentes, verificadas antes de reutilizarlas
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+    if os.environ.get('MARDEBURGER_DB_POOL') == '1':
+        # Pool de conexiones de psycopg 3 (pip install "psycopg[pool]").
+        # Reemplaza a las conexiones persistentes, que no se pueden combinar
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('MARDEBURGER_DB_POOL_MIN', 2)),
+                'max_size': int(os.environ.get('MARDEBURGER_DB_POOL_MAX', 10)),
+            },
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {
+                # Espera hasta 20 s por el lock de escritura en vez de
+                # fallar con "database is locked"
+                'timeout': 20,
+                # Toma el lock de escritura al empezar la transacción y
+                # evita los deadlocks al pasar de lectura a escritura
+                'transaction_mode': 'IMMEDIATE',
+                # Se ejecuta en cada conexión nueva
+                'init_command': 'PRAGMA busy_timeout=20000;',
+            },
+        }
     }
+
+    # MARDEBURGER_SQLITE_WAL=1 en el servidor: WAL permite leer mientras
+    # otro proceso escribe un pedido. Queda grabado en el archivo de la
+    # base (y crea db.sqlite3-wal y -shm), por eso no se activa con el
+    # db.sqlite3 de desarrollo que está en el repositorio
+    if os.environ.get('MARDEBURGER_SQLITE_WAL') == '1':
+        DATABASES['default']['OPTIONS']['init_command'] = (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            'PRAGMA busy_timeout=20000;'
+        )
+
+if DESPLIEGUE_ASGI:
+    # Con ASGI el ORM corre en un hilo por request: las conexiones
+    # persistentes no se reutilizan y se acumulan. Cada request abre y
+    # cierra la suya (o la toma del pool, con MARDEBURGER_DB_POOL=1)
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# La caché del catálogo (menu.catalogo) se invalida por versión, y la
+# versión está en la base de datos: con memoria local cada proceso tiene su
+# copia del catálogo pero todos ven los cambios en el siguiente request. Un
+# backend compartido (Redis, Memcached o archivos) evita calcularlo una vez
+# por proceso y suma entre procesos las métricas y los avisos en vivo.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'MARDEBURGER_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('MARDEBURGER_CACHE_LOCATION', 'mardeburger'),
+    },
+    # Caché separada para las sesiones (MARDEBURGER_SESIONES=cache), así
+    # las entradas del catálogo no desalojan carritos
+    'sesiones': {
+        'BACKEND': os.environ.get(
+            'MARDEBURGER_SESSION_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('MARDEBURGER_SESSION_CACHE_LOCATION', 'mardeburger-sesiones'),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
 }
 
 
+# Sesiones
+# https://docs.djangoproject.com/en/5.2/topics/http/sessions/
+# MARDEBURGER_SESIONES elige dónde se guardan (los carritos anónimos):
+#   db     -> tabla django_session (por defecto)
+#   cache  -> caché 'sesiones', sin escribir en la base de datos
+#   cookie -> cookie firmada; el carrito está limitado (menu.carrito) para
+#             no pasar los 4 KB de una cookie
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('MARDEBURGER_SESIONES', 'db')]
+SESSION_CACHE_ALIAS = 'sesiones'
+
+
+# Tareas en segundo plano (menu.tareas)
+# Las procesa `python manage.py procesar_tareas`. Sin ese proceso corriendo,
+# MARDEBURGER_TAREAS_SINCRONICAS=1 las ejecuta al confirmar la transacción
+# dentro del mismo request (útil en desarrollo).
+
+TAREAS_SINCRONICAS = os.environ.get('MARDEBURGER_TAREAS_SINCRONICAS') == '1'
+
+
+# Métricas por vista (panel.middleware.MetricasMiddleware)
+# Se ven en /panel/metricas/ y en formato Prometheus en
+# /panel/metricas/prometheus/. Para que Prometheus lea sin sesión, definir
+# MARDEBURGER_METRICAS_TOKEN y mandarlo como "Authorization: Bearer <token>".
+
+METRICAS_ACTIVAS = os.environ.get('MARDEBURGER_METRICAS', '1') != '0'
+METRICAS_TOKEN = os.environ.get('MARDEBURGER_METRICAS_TOKEN', '')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
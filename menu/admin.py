@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import Categoria, Producto, Pedido, ItemPedido
+from django.db.models import Count
+from django.utils import timezone
+
+from .busqueda import filtro_pedidos
+from .models import Categoria, Producto, Pedido, ItemPedido, Tarea
+from .paginacion import PaginadorPedidos
 
 @admin.register(Categoria)  
 class CategoriaAdmin(admin.ModelAdmin):
@@ -9,10 +14,15 @@ class CategoriaAdmin(admin.ModelAdmin):
     search_fields = ['nombre']
     ordering = ['orden', 'nombre']
     
+    def get_queryset(self, request):
+        # Un COUNT por categoría en la misma consulta de la lista
+        return super().get_queryset(request).annotate(total_productos=Count('productos'))
+    
     def cantidad_productos(self, obj):
         """Muestra la cantidad de productos en esta categoría"""
-        return obj.productos.count()
+        return obj.total_productos
     cantidad_productos.short_description = 'Productos'
+    cantidad_productos.admin_order_field = 'total_productos'
 
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
@@ -66,9 +76,11 @@ class PedidoAdmin(admin.ModelAdmin):
         'metodo_pago',
         'total',
         'cantidad_items',
+        'estado',
         'fecha'
     ]
     list_filter = [
+        'estado',
         'tipo_entrega', 
         'metodo_pago', 
         'fecha'
@@ -78,9 +90,17 @@ class PedidoAdmin(admin.ModelAdmin):
         'telefono', 
         'id'
     ]
-    readonly_fields = ['fecha', 'total']
-    ordering = ['-fecha']
+    # El estado cambia desde el panel (services.cambiar_estado), que
+    # también actualiza el resumen de ventas
+    readonly_fields = [
+        'fecha', 'total', 'estado',
+        'fecha_preparando', 'fecha_listo', 'fecha_entregado', 'fecha_cancelado'
+    ]
+    ordering = ['-fecha', '-id']
     date_hierarchy = 'fecha'
+    # Total cacheado y sin el COUNT extra de todos los pedidos al filtrar
+    paginator = PaginadorPedidos
+    show_full_result_count = False
     
     inlines = [ItemPedidoInline]
     
@@ -91,17 +111,31 @@ class PedidoAdmin(admin.ModelAdmin):
         ('Detalles del pedido', {
             'fields': ('tipo_entrega', 'metodo_pago', 'total', 'notas')
         }),
+        ('Estado', {
+            'fields': ('estado', 'fecha_preparando', 'fecha_listo', 'fecha_entregado', 'fecha_cancelado')
+        }),
         ('Metadata', {
             'fields': ('fecha',),
             'classes': ('collapse',)
         }),
     )
     
+    def get_search_results(self, request, queryset, search_term):
+        """Usa la búsqueda indexada de menu.busqueda en lugar de icontains"""
+        if not search_term:
+            return queryset, False
+        return queryset.filter(filtro_pedidos(search_term)), False
+    
     def cantidad_items(self, obj):
         """Cantidad total de items en el pedido"""
         return obj.cantidad_items()
     cantidad_items.short_description = 'Items'
     
+    def save_related(self, request, form, formsets, change):
+        """Recalcula el resumen guardado si se editaron los items"""
+        super().save_related(request, form, formsets, change)
+        form.instance.actualizar_resumen()
+    
 @admin.register(ItemPedido)
 class ItemPedidoAdmin(admin.ModelAdmin):
     """Admin para Items de Pedido (vista separada)"""
@@ -118,4 +152,55 @@ class ItemPedidoAdmin(admin.ModelAdmin):
         'pedido__nombre_cliente',
         'producto__nombre'
     ]
-    readonly_fields = ['subtotal']
\ No newline at end of file
+    readonly_fields = ['subtotal']
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        obj.pedido.actualizar_resumen()
+    
+    def delete_model(self, request, obj):
+        pedido = obj.pedido
+        super().delete_model(request, obj)
+        pedido.actualizar_resumen()
+    
+    def delete_queryset(self, request, queryset):
+        pedidos = list(Pedido.objects.filter(items__in=queryset).distinct())
+        super().delete_queryset(request, queryset)
+        for pedido in pedidos:
+            pedido.actualizar_resumen()
+
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    """Admin para la cola de tareas en segundo plano"""
+    list_display = [
+        'id',
+        'nombre',
+        'estado',
+        'intentos',
+        'ejecutar_desde',
+        'fecha_creacion',
+        'fecha_fin'
+    ]
+    list_filter = ['estado', 'nombre']
+    readonly_fields = [
+        'nombre',
+        'argumentos',
+        'intentos',
+        'error',
+        'reservada_hasta',
+        'fecha_creacion',
+        'fecha_inicio',
+        'fecha_fin'
+    ]
+    actions = ['reintentar']
+    
+    @admin.action(description='Reintentar las tareas seleccionadas')
+    def reintentar(self, request, queryset):
+        """Vuelve a encolar las tareas fallidas con intentos nuevos"""
+        cantidad = queryset.exclude(estado='en_curso').update(
+            estado='pendiente',
+            intentos=0,
+            ejecutar_desde=timezone.now()
+        )
+        self.message_user(request, f'{cantidad} tareas encoladas nuevamente')
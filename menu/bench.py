@@ -0,0 +1,171 @@
+"""
+Utilidades compartidas por los comandos de benchmark (bench_*).
+
+Los benchmarks corren sobre una base de datos temporal para no tocar la
+base real, y miden con el cliente de pruebas de Django (sin red).
+"""
+import os
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from .busqueda import normalizar_nombre, normalizar_telefono, palabras_nombre
+from .models import Categoria, ItemPedido, PalabraPedido, Pedido, Producto
+
+NOMBRES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elena', 'Facundo', 'Gabriela', 'Hernán', 'Inés', 'Julián']
+APELLIDOS = ['García', 'Fernández', 'López', 'Martínez', 'Pérez', 'Gómez', 'Díaz', 'Sosa']
+
+
+@contextmanager
+def base_de_datos_temporal():
+    """
+    Crea una base de datos de prueba con las migraciones aplicadas y la
+    elimina al terminar. En SQLite usa un archivo (no memoria) para que
+    los tiempos de escritura sean realistas.
+    """
+    setup_test_environment()
+    archivo = None
+    if connection.vendor == 'sqlite':
+        archivo = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = archivo
+
+    nombre_original = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+        teardown_test_environment()
+
+
+def sembrar_catalogo(categorias=5, productos=60):
+    """Crea categorías y productos disponibles de ejemplo"""
+    lista = Categoria.objects.bulk_create([
+        Categoria(nombre=f'Categoría {i}', orden=i) for i in range(categorias)
+    ])
+    return Producto.objects.bulk_create([
+        Producto(
+            nombre=f'Producto {i}',
+            descripcion='Producto de prueba para benchmarks',
+            precio=Decimal(1000 + i * 10),
+            categoria=lista[i % categorias],
+            imagen='productos/bench.jpg',
+            destacado=i < 4,
+        )
+        for i in range(productos)
+    ])
+
+
+def sembrar_pedidos(productos, cantidad=2000, dias=90, semilla=1):
+    """
+    Historial de pedidos repartido en los últimos `dias` días, con 1 a 4
+    productos cada uno (menos si el catálogo es más chico). Casi todos quedan entregados, algunos cancelados
+    y los de la última hora siguen activos. Con la misma semilla se
+    generan siempre los mismos pedidos.
+    """
+    azar = random.Random(semilla)
+    ahora = timezone.now()
+    estados = ['entregado'] * 18 + ['cancelado']
+    pedidos = []
+    fechas = []
+    lineas = []
+
+    for i in range(cantidad):
+        elegidos = azar.sample(productos, azar.randint(1, min(4, len(productos))))
+        cantidades = [azar.randint(1, 3) for _ in elegidos]
+        nombre = f'{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}'
+        telefono = f'2291 {azar.randint(400000, 699999)}'
+        tipo_entrega = azar.choice(['retiro', 'delivery'])
+        # Más pedidos recientes que viejos
+        fecha = ahora - timedelta(minutes=int(dias * 24 * 60 * azar.random() ** 2))
+        pedido = Pedido(
+            nombre_cliente=nombre,
+            telefono=telefono,
+            direccion='Calle 123' if tipo_entrega == 'delivery' else '',
+            tipo_entrega=tipo_entrega,
+            metodo_pago=azar.choice(['efectivo', 'transferencia', 'mercadopago']),
+            total=sum(p.precio * c for p, c in zip(elegidos, cantidades)),
+            total_items=sum(cantidades),
+            resumen_items=[
+                {
+                    'producto': p.nombre, 'cantidad': c,
+                    'precio_unitario': str(p.precio), 'subtotal': str(p.precio * c),
+                }
+                for p, c in zip(elegidos, cantidades)
+            ],
+            telefono_normalizado=normalizar_telefono(telefono),
+            nombre_busqueda=normalizar_nombre(nombre),
+            estado=azar.choice(['recibido', 'preparando', 'listo'])
+            if ahora - fecha < timedelta(hours=1) else azar.choice(estados),
+        )
+        pedidos.append(pedido)
+        fechas.append(fecha)
+        lineas.append(list(zip(elegidos, cantidades)))
+
+    with transaction.atomic():
+        Pedido.objects.bulk_create(pedidos, batch_size=500)
+        # bulk_create completa fecha (auto_now_add) con la hora actual
+        for pedido, fecha in zip(pedidos, fechas):
+            pedido.fecha = fecha
+            if pedido.estado in ('entregado', 'cancelado'):
+                setattr(pedido, f'fecha_{pedido.estado}', pedido.fecha + timedelta(minutes=30))
+        Pedido.objects.bulk_update(
+            pedidos, ['fecha', 'fecha_entregado', 'fecha_cancelado'], batch_size=500
+        )
+        ItemPedido.objects.bulk_create(
+            [
+                ItemPedido(pedido=pedido, producto=producto, cantidad=cantidad, precio_unitario=producto.precio)
+                for pedido, items in zip(pedidos, lineas)
+                for producto, cantidad in items
+            ],
+            batch_size=500,
+        )
+        # bulk_create no pasa por Pedido.save: las palabras de búsqueda se crean acá
+        PalabraPedido.objects.bulk_create(
+            [
+                PalabraPedido(pedido=pedido, palabra=palabra)
+                for pedido in pedidos
+                for palabra in palabras_nombre(pedido.nombre_busqueda)
+            ],
+            batch_size=500,
+        )
+    return pedidos
+
+
+def medir(funcion, repeticiones):
+    """Ejecuta funcion() varias veces y devuelve la duración de cada una"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def percentil(tiempos, p):
+    """Percentil p (0-100) de una lista de tiempos"""
+    if not tiempos:
+        return 0
+    ordenados = sorted(tiempos)
+    indice = min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))
+    return ordenados[indice]
+
+
+def resumir(tiempos, duracion_total=None):
+    """Latencias en milisegundos (p50, p95, p99, media) y throughput"""
+    duracion_total = duracion_total or sum(tiempos)
+    return {
+        'n': len(tiempos),
+        'p50_ms': round(percentil(tiempos, 50) * 1000, 3),
+        'p95_ms': round(percentil(tiempos, 95) * 1000, 3),
+        'p99_ms': round(percentil(tiempos, 99) * 1000, 3),
+        'media_ms': round(statistics.fmean(tiempos) * 1000, 3) if tiempos else 0,
+        'por_segundo': round(len(tiempos) / duracion_total, 1) if duracion_total else 0,
+    }
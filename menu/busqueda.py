@@ -0,0 +1,84 @@
+"""
+Búsqueda de pedidos por número, teléfono o nombre del cliente.
+
+Cada pedido guarda su teléfono normalizado (Pedido.save) en una columna
+indexada, y cada palabra de su nombre en minúsculas y sin acentos en
+PalabraPedido. La búsqueda compara exacto el número y busca por prefijo
+el teléfono y las palabras del nombre: a diferencia de LIKE '%...%' la base
+usa el índice, así que cuesta lo mismo con cualquier cantidad de pedidos.
+
+En el nombre cada palabra buscada tiene que ser el comienzo de alguna
+palabra del nombre, así "perez" encuentra a "José Pérez".
+
+El prefijo es LIKE 'texto%' (startswith) en PostgreSQL, que usa el índice
+varchar_pattern_ops que Django crea para las columnas con db_index, y en
+MySQL. El LIKE de SQLite no usa índices (no distingue mayúsculas), así que
+ahí es un rango (>= texto y < texto + máximo), válido con la intercalación
+binaria que SQLite usa por defecto.
+"""
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+
+# Mayor que cualquier carácter: 'abc' <= x < 'abc' + FIN equivale a "empieza con abc"
+FIN = '\U0010ffff'
+
+# Largo máximo de una palabra guardada (y buscada)
+LARGO_PALABRA = 50
+
+
+def normalizar_telefono(telefono):
+    """Las mismas reglas que PedidoForm.clean_telefono: sin espacios ni guiones"""
+    return (telefono or '').replace(' ', '').replace('-', '')
+
+
+def normalizar_nombre(nombre):
+    """José  Pérez -> jose perez"""
+    sin_acentos = ''.join(
+        c for c in unicodedata.normalize('NFKD', nombre or '')
+        if not unicodedata.combining(c)
+    )
+    return ' '.join(sin_acentos.lower().split())
+
+
+def palabras_nombre(nombre_normalizado):
+    """Palabras distintas de un nombre ya normalizado"""
+    return sorted({palabra[:LARGO_PALABRA] for palabra in nombre_normalizado.split()})
+
+
+def _prefijo(campo, valor):
+    if connection.vendor == 'sqlite':
+        return Q(**{f'{campo}__gte': valor, f'{campo}__lt': valor + FIN})
+    return Q(**{f'{campo}__startswith': valor})
+
+
+def filtro_pedidos(texto):
+    """
+    Q para buscar pedidos:
+    - números: número de pedido exacto o teléfono que empieza con esos dígitos
+    - '#123': solo el número de pedido
+    - texto: cada palabra es el comienzo de alguna palabra del nombre
+    """
+    texto = (texto or '').strip()
+    if not texto:
+        return Q()
+
+    if texto.startswith('#') and texto[1:].isdecimal():
+        return Q(pk=int(texto[1:]))
+
+    telefono = normalizar_telefono(texto).lstrip('+')
+    if telefono.isdecimal():
+        filtro = _prefijo('telefono_normalizado', telefono)
+        if len(telefono) <= 9:
+            filtro |= Q(pk=int(telefono))
+        return filtro
+
+    # Acá y no arriba: menu.models importa este módulo
+    from .models import PalabraPedido
+
+    filtro = Q()
+    for palabra in normalizar_nombre(texto).split():
+        coincidencias = PalabraPedido.objects.filter(_prefijo('palabra', palabra[:LARGO_PALABRA]))
+        filtro &= Q(pk__in=coincidencias.values('pedido_id'))
+    return filtro
@@ -0,0 +1,141 @@
+from decimal import Decimal
+
+from . import catalogo
+
+# Cantidad máxima de un mismo producto en el carrito
+MAX_CANTIDAD = 99
+
+# Cantidad máxima de productos distintos. Mantiene acotado el tamaño de la
+# sesión, que con SESSION_ENGINE de cookie firmada no puede pasar los 4 KB
+MAX_PRODUCTOS = 50
+
+
+class Carrito:
+    """
+    Carrito guardado en la sesión como {producto_id: cantidad}.
+
+    Las operaciones validan contra los productos disponibles del catálogo
+    (cacheado) y la sesión solo se escribe en guardar() si el carrito
+    realmente cambió.
+    """
+    CLAVE_SESION = 'carrito'
+
+    def __init__(self, session, productos=None):
+        self.session = session
+        # Productos del catálogo ya cargados (ver acargar)
+        self._productos_api = productos
+        self.original = session.get(self.CLAVE_SESION, {})
+        self.items = {str(k): v for k, v in self.original.items()}
+
+    @classmethod
+    async def acargar(cls, session):
+        """
+        Carrito para vistas async: carga la sesión y los productos del
+        catálogo con las versiones async, así las operaciones siguientes no
+        consultan la base de datos.
+        """
+        productos = await catalogo.aproductos_api()
+        await session.aget(cls.CLAVE_SESION)
+        return cls(session, productos)
+
+    def productos(self):
+        if self._productos_api is None:
+            return catalogo.productos_api()
+        return self._productos_api
+
+    def _validar(self, producto_id, cantidad):
+        try:
+            producto_id = int(producto_id)
+            cantidad = int(cantidad)
+        except (TypeError, ValueError):
+            raise ValueError('Producto o cantidad inválidos')
+
+        if cantidad < 0:
+            raise ValueError('La cantidad no puede ser negativa')
+
+        return str(producto_id), cantidad
+
+    def _verificar_disponible(self, producto_id):
+        if int(producto_id) not in self.productos():
+            raise ValueError('El producto no está disponible')
+
+    def agregar(self, producto_id, cantidad=1):
+        """Suma unidades de un producto disponible"""
+        producto_id, cantidad = self._validar(producto_id, cantidad)
+        self._verificar_disponible(producto_id)
+        self.fijar(producto_id, self.items.get(producto_id, 0) + cantidad)
+
+    def quitar(self, producto_id, cantidad=1):
+        """Resta unidades; si llega a cero el producto sale del carrito"""
+        producto_id, cantidad = self._validar(producto_id, cantidad)
+        restante = self.items.get(producto_id, 0) - cantidad
+        if restante > 0:
+            self.items[producto_id] = restante
+        else:
+            self.items.pop(producto_id, None)
+
+    def fijar(self, producto_id, cantidad):
+        """Fija la cantidad de un producto (0 lo elimina)"""
+        producto_id, cantidad = self._validar(producto_id, cantidad)
+        if cantidad == 0:
+            self.items.pop(producto_id, None)
+            return
+
+        self._verificar_disponible(producto_id)
+        if producto_id not in self.items and len(self.items) >= MAX_PRODUCTOS:
+            raise ValueError('El carrito está lleno')
+        self.items[producto_id] = min(cantidad, MAX_CANTIDAD)
+
+    def reemplazar(self, carrito):
+        """
+        Reemplaza el carrito completo (sincronización desde el navegador).
+        Ignora las líneas inválidas o de productos no disponibles.
+        """
+        self.items = {}
+        for producto_id, cantidad in dict(carrito).items():
+            try:
+                self.fijar(producto_id, cantidad)
+            except ValueError:
+                continue
+
+    def vaciar(self):
+        self.items = {}
+
+    def guardar(self):
+        """Escribe la sesión solo si el carrito cambió"""
+        if self.items != self.original:
+            self.session[self.CLAVE_SESION] = self.items
+            self.original = dict(self.items)
+            return True
+        return False
+
+    def resumen(self):
+        """Líneas con precio y subtotal calculados en el servidor, y total"""
+        productos = self.productos()
+        lineas = []
+        total = Decimal('0.00')
+
+        for producto_id, cantidad in self.items.items():
+            producto = productos.get(int(producto_id))
+            if producto is None:
+                lineas.append({
+                    'id': int(producto_id),
+                    'cantidad': cantidad,
+                    'disponible': False,
+                })
+                continue
+
+            subtotal = Decimal(producto['precio']) * cantidad
+            total += subtotal
+            lineas.append({
+                **producto,
+                'cantidad': cantidad,
+                'subtotal': str(subtotal),
+                'disponible': True,
+            })
+
+        return {
+            'items': lineas,
+            'cantidad': sum(self.items.values()),
+            'total': str(total),
+        }
@@ -0,0 +1,403 @@
+"""
+Caché del catálogo público (productos y categorías).
+
+Todas las claves incluyen el número de versión del catálogo. Cuando un
+producto o una categoría se guarda o se elimina, las señales de
+menu.signals incrementan la versión y las entradas anteriores dejan de
+usarse (expiran solas), sin tener que borrarlas una por una.
+
+Además cada categoría tiene su propia versión, que se usa para cachear el
+HTML ya renderizado de su sección del menú. Editar un producto solo obliga
+a renderizar de nuevo la sección de su categoría.
+
+Las versiones están en la tabla VersionCatalogo y no en la caché: la caché
+por defecto es memoria local de cada proceso, y un cambio hecho desde otro
+worker, un comando (importar_catalogo, limpiar_media) o la cola de tareas
+tiene que verse en todos. Cada request las lee una vez, con una consulta
+(menu.signals las descarta al empezar el request).
+
+Las funciones con prefijo "a" (adestacados, aproducto, ...) son las
+mismas consultas para las vistas async del despliegue ASGI: usan los
+métodos async de la caché y el ORM async, con las mismas claves.
+"""
+import hashlib
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.db.models import Count, F, Max
+from django.http import Http404
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Producto, Categoria, VersionCatalogo
+
+CLAVE_VERSION = 'catalogo'
+CLAVE_ACIERTOS = 'catalogo:aciertos'
+CLAVE_FALLOS = 'catalogo:fallos'
+
+# Las entradas se invalidan por versión, el timeout solo libera memoria
+TIMEOUT = 60 * 60 * 24
+
+
+# Versiones leídas en este request (o contexto async)
+_versiones = ContextVar('versiones_catalogo', default=None)
+
+
+def _leer_versiones():
+    versiones = _versiones.get()
+    if versiones is None:
+        versiones = dict(VersionCatalogo.objects.values_list('clave', 'version'))
+        _versiones.set(versiones)
+    return versiones
+
+
+def olvidar_versiones():
+    """Descarta las versiones leídas: la próxima consulta las vuelve a leer"""
+    _versiones.set(None)
+
+
+def version_catalogo():
+    """Versión actual del catálogo (0 si nunca se modificó)"""
+    return _leer_versiones().get(CLAVE_VERSION, 0)
+
+
+def _clave_version_categoria(categoria_id):
+    return f'categoria:{categoria_id}'
+
+
+def versiones_categorias(categoria_ids):
+    """Versión de cada categoría, como diccionario {id: versión}"""
+    versiones = _leer_versiones()
+    return {pk: versiones.get(_clave_version_categoria(pk), 0) for pk in categoria_ids}
+
+
+def invalidar_catalogo(*categoria_ids):
+    """
+    Incrementa la versión del catálogo y la de las categorías indicadas
+    (aquellas cuya sección del menú cambió).
+    """
+    claves = [CLAVE_VERSION]
+    claves += [_clave_version_categoria(pk) for pk in set(categoria_ids) if pk]
+
+    # Las filas que faltan se crean antes, así el UPDATE con F() no pierde
+    # incrementos de otros procesos
+    VersionCatalogo.objects.bulk_create(
+        [VersionCatalogo(clave=clave) for clave in claves], ignore_conflicts=True
+    )
+    VersionCatalogo.objects.filter(clave__in=claves).update(version=F('version') + 1)
+    olvidar_versiones()
+
+
+def _contar(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, 1, None)
+
+
+def _obtener(nombre, calcular):
+    """Devuelve el valor cacheado para la versión actual o lo calcula"""
+    clave = f'catalogo:{version_catalogo()}:{nombre}'
+    valor = cache.get(clave)
+
+    if valor is None:
+        _contar(CLAVE_FALLOS)
+        valor = calcular()
+        cache.set(clave, valor, TIMEOUT)
+    else:
+        _contar(CLAVE_ACIERTOS)
+
+    return valor
+
+
+def estadisticas_catalogo():
+    """Aciertos, fallos y tasa de aciertos de la caché del catálogo"""
+    aciertos = cache.get(CLAVE_ACIERTOS, 0)
+    fallos = cache.get(CLAVE_FALLOS, 0)
+    consultas = aciertos + fallos
+    return {
+        'version': version_catalogo(),
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': aciertos / consultas if consultas else 0,
+    }
+
+
+# ============================================
+# CONSULTAS CACHEADAS
+# ============================================
+
+def _consulta_categorias():
+    return Categoria.objects.all()
+
+
+def _consulta_disponibles():
+    return Producto.objects.filter(disponible=True).select_related('categoria')
+
+
+def _consulta_destacados():
+    return Producto.objects.filter(destacado=True, disponible=True)[:4]
+
+
+def _consulta_relacionados(encontrado):
+    return Producto.objects.filter(
+        categoria_id=encontrado.categoria_id,
+        disponible=True
+    ).exclude(pk=encontrado.pk)[:3]
+
+
+def categorias():
+    """Todas las categorías en orden de visualización"""
+    return _obtener('categorias', lambda: list(_consulta_categorias()))
+
+
+def productos_disponibles():
+    """Productos disponibles con su categoría, en orden del menú"""
+    return _obtener('productos_disponibles', lambda: list(_consulta_disponibles()))
+
+
+def destacados():
+    """Productos destacados para la página principal"""
+    return _obtener('destacados', lambda: list(_consulta_destacados()))
+
+
+def producto(pk):
+    """
+    Producto con su categoría y hasta 3 productos relacionados.
+
+    Devuelve un diccionario {'producto', 'relacionados'} o lanza Http404.
+    """
+    def calcular():
+        try:
+            encontrado = Producto.objects.select_related('categoria').get(pk=pk)
+        except Producto.DoesNotExist:
+            return False
+
+        relacionados = list(_consulta_relacionados(encontrado))
+        return {'producto': encontrado, 'relacionados': relacionados}
+
+    # False marca un producto inexistente (None significa "no cacheado")
+    detalle = _obtener(f'producto:{pk}', calcular)
+    if not detalle:
+        raise Http404('Producto no encontrado')
+    return detalle
+
+
+def _datos_api(productos):
+    return {
+        p.id: {
+            'id': p.id,
+            'nombre': p.nombre,
+            'precio': str(p.precio),
+            'imagen': p.miniatura_url,
+        }
+        for p in productos
+    }
+
+
+def productos_api():
+    """
+    Datos mínimos de los productos disponibles (id, nombre, precio e
+    imagen) indexados por id, para la API JSON del catálogo.
+    """
+    return _obtener('productos_api', lambda: _datos_api(productos_disponibles()))
+
+
+_AGREGADOS_MARCA = {'modificado': Max('fecha_actualizacion'), 'cantidad': Count('id')}
+
+
+def _marca(productos, categorias):
+    fechas = [f for f in (productos['modificado'], categorias['modificado']) if f]
+    firma = '|'.join(str(v) for v in (
+        productos['modificado'], productos['cantidad'],
+        categorias['modificado'], categorias['cantidad'],
+    ))
+    return {
+        'modificado': max(fechas) if fechas else None,
+        'etag': hashlib.md5(firma.encode()).hexdigest(),
+    }
+
+
+def marca_catalogo():
+    """
+    Validadores HTTP del catálogo: fecha de la última modificación y un
+    ETag derivado de las fechas y cantidades de productos y categorías
+    (las cantidades hacen que también cambie al eliminar algo).
+
+    Se cachean con la versión del catálogo, que es la misma en todos los
+    procesos (sale de VersionCatalogo): después de un cambio ningún
+    proceso sigue respondiendo 304 con el ETag anterior.
+    """
+    def calcular():
+        return _marca(
+            Producto.objects.aggregate(**_AGREGADOS_MARCA),
+            Categoria.objects.aggregate(**_AGREGADOS_MARCA),
+        )
+
+    return _obtener('marca', calcular)
+
+
+# ============================================
+# FRAGMENTOS DEL MENÚ
+# ============================================
+
+def secciones_menu():
+    """
+    HTML de cada sección del menú (una por categoría con productos).
+
+    Cada sección se cachea ya renderizada con la versión de su categoría,
+    así que con el catálogo sin cambios armar el menú es concatenar
+    fragmentos. Solo se consultan los productos si falta algún fragmento.
+    """
+    lista_categorias = categorias()
+    versiones = versiones_categorias([c.id for c in lista_categorias])
+    claves = _claves_fragmentos(lista_categorias, versiones)
+    fragmentos = cache.get_many(list(claves.values()))
+
+    faltantes = [c for c in lista_categorias if claves[c.id] not in fragmentos]
+    if faltantes:
+        nuevos = _renderizar_secciones(faltantes, productos_disponibles(), claves)
+        cache.set_many(nuevos, TIMEOUT)
+        fragmentos.update(nuevos)
+
+    return _secciones(lista_categorias, claves, fragmentos)
+
+
+def _claves_fragmentos(lista_categorias, versiones):
+    return {
+        c.id: f'catalogo:fragmento:{c.id}:{versiones[c.id]}'
+        for c in lista_categorias
+    }
+
+
+def _renderizar_secciones(faltantes, disponibles, claves):
+    por_categoria = {}
+    for p in disponibles:
+        por_categoria.setdefault(p.categoria_id, []).append(p)
+
+    nuevos = {}
+    for categoria in faltantes:
+        productos = por_categoria.get(categoria.id)
+        nuevos[claves[categoria.id]] = render_to_string(
+            'menu/categoria_seccion.html',
+            {'categoria': categoria, 'productos': productos}
+        ) if productos else ''
+    return nuevos
+
+
+def _secciones(lista_categorias, claves, fragmentos):
+    return [
+        mark_safe(fragmentos[claves[c.id]])
+        for c in lista_categorias
+        if fragmentos[claves[c.id]]
+    ]
+
+
+# ============================================
+# VERSIONES ASYNC (despliegue ASGI)
+# ============================================
+
+async def _alista(queryset):
+    return [obj async for obj in queryset]
+
+
+async def _aleer_versiones():
+    versiones = _versiones.get()
+    if versiones is None:
+        versiones = {
+            clave: version
+            async for clave, version in VersionCatalogo.objects.values_list('clave', 'version')
+        }
+        _versiones.set(versiones)
+    return versiones
+
+
+async def aversion_catalogo():
+    return (await _aleer_versiones()).get(CLAVE_VERSION, 0)
+
+
+async def aversiones_categorias(categoria_ids):
+    versiones = await _aleer_versiones()
+    return {pk: versiones.get(_clave_version_categoria(pk), 0) for pk in categoria_ids}
+
+
+async def _acontar(clave):
+    try:
+        await cache.aincr(clave)
+    except ValueError:
+        await cache.aadd(clave, 1, None)
+
+
+async def _aobtener(nombre, calcular):
+    """Como _obtener, con calcular() async"""
+    clave = f'catalogo:{await aversion_catalogo()}:{nombre}'
+    valor = await cache.aget(clave)
+
+    if valor is None:
+        await _acontar(CLAVE_FALLOS)
+        valor = await calcular()
+        await cache.aset(clave, valor, TIMEOUT)
+    else:
+        await _acontar(CLAVE_ACIERTOS)
+
+    return valor
+
+
+async def acategorias():
+    return await _aobtener('categorias', lambda: _alista(_consulta_categorias()))
+
+
+async def aproductos_disponibles():
+    return await _aobtener('productos_disponibles', lambda: _alista(_consulta_disponibles()))
+
+
+async def adestacados():
+    return await _aobtener('destacados', lambda: _alista(_consulta_destacados()))
+
+
+async def aproducto(pk):
+    async def calcular():
+        try:
+            encontrado = await Producto.objects.select_related('categoria').aget(pk=pk)
+        except Producto.DoesNotExist:
+            return False
+
+        relacionados = await _alista(_consulta_relacionados(encontrado))
+        return {'producto': encontrado, 'relacionados': relacionados}
+
+    detalle = await _aobtener(f'producto:{pk}', calcular)
+    if not detalle:
+        raise Http404('Producto no encontrado')
+    return detalle
+
+
+async def aproductos_api():
+    async def calcular():
+        return _datos_api(await aproductos_disponibles())
+
+    return await _aobtener('productos_api', calcular)
+
+
+async def amarca_catalogo():
+    async def calcular():
+        return _marca(
+            await Producto.objects.aaggregate(**_AGREGADOS_MARCA),
+            await Categoria.objects.aaggregate(**_AGREGADOS_MARCA),
+        )
+
+    return await _aobtener('marca', calcular)
+
+
+async def asecciones_menu():
+    lista_categorias = await acategorias()
+    versiones = await aversiones_categorias([c.id for c in lista_categorias])
+    claves = _claves_fragmentos(lista_categorias, versiones)
+    fragmentos = await cache.aget_many(list(claves.values()))
+
+    faltantes = [c for c in lista_categorias if claves[c.id] not in fragmentos]
+    if faltantes:
+        nuevos = _renderizar_secciones(faltantes, await aproductos_disponibles(), claves)
+        await cache.aset_many(nuevos, TIMEOUT)
+        fragmentos.update(nuevos)
+
+    return _secciones(lista_categorias, claves, fragmentos)
@@ -1,4 +1,5 @@
 from django import forms
+from .busqueda import normalizar_telefono
 from .models import Pedido
 
 
@@ -64,7 +65,7 @@ class PedidoForm(forms.ModelForm):
         telefono = self.cleaned_data.get('telefono')
         
         # Limpiar espacios y guiones
-        telefono_limpio = telefono.replace(' ', '').replace('-', '')
+        telefono_limpio = normalizar_telefono(telefono)
         
         # Verificar que contenga solo números
         if not telefono_limpio.isdigit():
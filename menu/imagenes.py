@@ -0,0 +1,131 @@
+"""
+Variantes redimensionadas de las imágenes de productos.
+
+Por cada imagen se generan versiones JPEG y WebP a anchos fijos, guardadas
+junto a la original en <carpeta>/variantes/ con un nombre derivado del de
+la original (no del hash de la variante, ver menu.storage). Los nombres
+quedan en Producto.imagen_variantes y las plantillas arman srcset con ellos.
+"""
+import io
+import logging
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .catalogo import invalidar_catalogo
+
+logger = logging.getLogger(__name__)
+
+# Anchos en píxeles: 160 cubre la miniatura de 80px del carrito en
+# pantallas de alta densidad, el resto las tarjetas y el detalle
+ANCHOS = (160, 320, 640, 960)
+
+FORMATOS = {
+    'jpeg': {'extension': 'jpg', 'opciones': {'quality': 82, 'optimize': True, 'progressive': True}},
+    'webp': {'extension': 'webp', 'opciones': {'quality': 80, 'method': 4}},
+}
+
+
+def nombre_variante(nombre_original, ancho, formato):
+    """productos/3f8a...c1.jpg -> productos/variantes/3f8a...c1_320.webp"""
+    carpeta, archivo = posixpath.split(posixpath.splitext(nombre_original)[0])
+    extension = FORMATOS[formato]['extension']
+    return posixpath.join(carpeta, 'variantes', f'{archivo}_{ancho}.{extension}')
+
+
+def variantes_vigentes(producto):
+    """True si las variantes guardadas corresponden a la imagen actual"""
+    return bool(producto.imagen) and producto.imagen_variantes.get('origen') == producto.imagen.name
+
+
+def archivos_variantes(variantes):
+    """Nombres de archivo guardados en un Producto.imagen_variantes"""
+    return [
+        nombre
+        for formato in FORMATOS
+        for nombre in variantes.get(formato, {}).values()
+    ]
+
+
+def generar_variantes(producto):
+    """
+    Genera las variantes de la imagen del producto y devuelve el
+    diccionario para Producto.imagen_variantes (no guarda el producto).
+    """
+    storage = producto.imagen.storage
+
+    with producto.imagen.open('rb') as archivo:
+        original = Image.open(archivo)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    if original.mode not in ('RGB', 'L'):
+        original = original.convert('RGB')
+
+    variantes = {'origen': producto.imagen.name}
+    # Nunca se agranda: los anchos mayores al original se omiten
+    anchos = [a for a in ANCHOS if a <= original.width] or [original.width]
+
+    for formato, config in FORMATOS.items():
+        variantes[formato] = {}
+        for ancho in anchos:
+            alto = max(1, round(original.height * ancho / original.width))
+            redimensionada = original.resize((ancho, alto), Image.LANCZOS)
+
+            buffer = io.BytesIO()
+            redimensionada.save(buffer, format=formato.upper(), **config['opciones'])
+
+            # Se reemplaza la variante anterior (al regenerar con forzar)
+            nombre = nombre_variante(producto.imagen.name, ancho, formato)
+            if storage.exists(nombre):
+                storage.delete(nombre)
+            variantes[formato][str(ancho)] = storage.guardar_con_nombre(nombre, ContentFile(buffer.getvalue()))
+
+    return variantes
+
+
+def actualizar_variantes(producto, forzar=False, lanzar_errores=False):
+    """
+    Genera y guarda las variantes si faltan o quedaron de una imagen
+    anterior. Devuelve True si se generaron.
+
+    Con lanzar_errores la excepción se propaga (la cola de tareas la usa
+    para reintentar).
+    """
+    if not producto.imagen or (variantes_vigentes(producto) and not forzar):
+        return False
+
+    if not producto.imagen.storage.exists(producto.imagen.name):
+        logger.info('La imagen %s no existe, no se generan variantes', producto.imagen.name)
+        return False
+
+    # Con el almacenamiento por contenido dos productos pueden compartir
+    # la misma imagen: si otro ya tiene sus variantes, se reutilizan
+    variantes = None
+    if not forzar:
+        variantes = next((
+            otras for otras in type(producto).objects.filter(
+                imagen=producto.imagen.name
+            ).exclude(pk=producto.pk).values_list('imagen_variantes', flat=True)
+            if otras.get('origen') == producto.imagen.name
+        ), None)
+
+    try:
+        variantes = variantes or generar_variantes(producto)
+    except (OSError, ValueError):
+        if lanzar_errores:
+            raise
+        logger.exception('No se pudieron generar las variantes de %s', producto.imagen.name)
+        return False
+
+    # update() no dispara señales (evita volver a entrar acá). La fecha
+    # cambia el ETag de las páginas, y la versión del catálogo está en la
+    # base: el sitio ve las variantes aunque las genere otro proceso
+    ahora = timezone.now()
+    type(producto).objects.filter(pk=producto.pk).update(imagen_variantes=variantes, fecha_actualizacion=ahora)
+    producto.imagen_variantes = variantes
+    producto.fecha_actualizacion = ahora
+    invalidar_catalogo(producto.categoria_id)
+    return True
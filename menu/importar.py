@@ -0,0 +1,304 @@
+"""
+Importación masiva del catálogo desde CSV o JSON.
+
+El archivo se compara contra el catálogo actual y los cambios se aplican
+con bulk_create/bulk_update en una sola transacción. Como las operaciones
+en bloque no disparan señales, la caché del menú se invalida una sola vez
+al final (y no una vez por producto). La versión del catálogo está en la
+base de datos, así que el sitio ve el cambio aunque el comando corra en
+otro proceso.
+
+Formatos aceptados:
+- CSV con encabezado: id, nombre, categoria, precio, descripcion,
+  disponible, destacado, imagen (para crear un producto hacen falta
+  nombre, categoria, precio e imagen; al actualizar, cada columna se
+  cambia únicamente si viene con valor)
+- JSON: una lista de productos con esas claves, o un objeto
+  {"categorias": [{"id", "nombre", "orden"}], "productos": [...]}
+
+Los productos y las categorías se buscan por id y, si no hay id, por
+nombre (sin distinguir mayúsculas). La categoría de un producto puede ser
+un id o un nombre; las categorías que no existen se crean.
+"""
+import csv
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.db import transaction
+from django.utils import timezone
+
+from .catalogo import invalidar_catalogo
+from .models import Categoria, Producto
+from .tareas import encolar
+
+CAMPOS_PRODUCTO = ['nombre', 'categoria', 'precio', 'descripcion', 'disponible', 'destacado', 'imagen']
+
+VERDADERO = {'1', 'si', 'sí', 'true', 'verdadero', 'x', 'yes'}
+FALSO = {'0', 'no', 'false', 'falso', ''}
+
+
+class ImportacionError(Exception):
+    """El archivo tiene filas que no se pueden importar"""
+
+    def __init__(self, errores):
+        self.errores = errores
+        super().__init__('; '.join(errores))
+
+
+class Resultado:
+    """Cambios detectados (y aplicados, salvo en modo de prueba)"""
+
+    def __init__(self):
+        self.categorias_creadas = []
+        self.categorias_actualizadas = []
+        self.productos_creados = []
+        self.productos_actualizados = []
+        self.sin_cambios = 0
+
+    @property
+    def hay_cambios(self):
+        return any([
+            self.categorias_creadas, self.categorias_actualizadas,
+            self.productos_creados, self.productos_actualizados,
+        ])
+
+
+def leer_archivo(ruta):
+    """Devuelve (filas de categorías, filas de productos) del archivo"""
+    ruta = Path(ruta)
+
+    if ruta.suffix.lower() == '.json':
+        with open(ruta, encoding='utf-8') as archivo:
+            datos = json.load(archivo)
+        if isinstance(datos, list):
+            return [], datos
+        return datos.get('categorias', []), datos.get('productos', [])
+
+    # utf-8-sig acepta los CSV guardados desde Excel (con BOM)
+    with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+        return [], list(csv.DictReader(archivo))
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor).strip()
+
+
+def _precio(valor):
+    texto = _texto(valor).replace('$', '').replace(' ', '')
+    if ',' in texto or re.fullmatch(r'\d{1,3}(\.\d{3})+', texto):
+        # Formato local: 1.500,50 -> 1500.50 y 1.500 -> 1500
+        texto = texto.replace('.', '').replace(',', '.')
+    precio = Decimal(texto)
+    if precio < 0:
+        raise InvalidOperation
+    return precio.quantize(Decimal('0.01'))
+
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    texto = _texto(valor).lower()
+    if texto in VERDADERO:
+        return True
+    if texto in FALSO:
+        return False
+    raise ValueError(texto)
+
+
+class _Indice:
+    """Objetos existentes por id y por nombre en minúsculas"""
+
+    def __init__(self, objetos):
+        self.por_id = {obj.id: obj for obj in objetos}
+        self.por_nombre = {}
+        for obj in objetos:
+            self.por_nombre.setdefault(obj.nombre.strip().lower(), []).append(obj)
+
+    def buscar(self, fila):
+        """El objeto de la fila, None si es nuevo. ValueError si no se puede resolver."""
+        identificador = _texto(fila.get('id'))
+        if identificador:
+            try:
+                return self.por_id[int(identificador)]
+            except (KeyError, ValueError):
+                raise ValueError(f'no existe el id {identificador}')
+
+        coincidencias = self.por_nombre.get(_texto(fila.get('nombre')).lower(), [])
+        if len(coincidencias) > 1:
+            raise ValueError('hay varios con ese nombre, indicar el id')
+        return coincidencias[0] if coincidencias else None
+
+    def agregar(self, obj):
+        self.por_nombre.setdefault(obj.nombre.strip().lower(), []).append(obj)
+
+
+def _diferencias(obj, valores):
+    """{campo: (antes, después)} solo para los campos que cambian"""
+    cambios = {}
+    for campo, nuevo in valores.items():
+        anterior = getattr(obj, campo)
+        if campo == 'imagen':
+            anterior = anterior.name
+        elif campo == 'categoria':
+            anterior = obj.categoria
+        if anterior != nuevo:
+            cambios[campo] = (anterior, nuevo)
+    return cambios
+
+
+def importar_catalogo(filas_categorias, filas_productos, aplicar=True):
+    """
+    Compara las filas con el catálogo y, si aplicar es True, guarda los
+    cambios en una transacción. Lanza ImportacionError (sin guardar nada)
+    si alguna fila tiene errores.
+    """
+    resultado = Resultado()
+    errores = []
+
+    categorias = _Indice(list(Categoria.objects.all()))
+    productos = _Indice(list(Producto.objects.select_related('categoria')))
+
+    # Categorías explícitas (solo JSON)
+    for numero, fila in enumerate(filas_categorias, start=1):
+        try:
+            categoria = categorias.buscar(fila)
+            valores = {}
+            if _texto(fila.get('nombre')):
+                valores['nombre'] = _texto(fila['nombre'])
+            if _texto(fila.get('orden')):
+                valores['orden'] = int(fila['orden'])
+        except ValueError as error:
+            errores.append(f'Categoría {numero}: {error}')
+            continue
+
+        if categoria is None:
+            if 'nombre' not in valores:
+                errores.append(f'Categoría {numero}: falta el nombre')
+                continue
+            categoria = Categoria(**valores)
+            categorias.agregar(categoria)
+            resultado.categorias_creadas.append(categoria)
+        elif cambios := _diferencias(categoria, valores):
+            for campo, (_, nuevo) in cambios.items():
+                setattr(categoria, campo, nuevo)
+            resultado.categorias_actualizadas.append((categoria, cambios))
+
+    def resolver_categoria(valor):
+        texto = _texto(valor)
+        if texto.isdecimal() and int(texto) in categorias.por_id:
+            return categorias.por_id[int(texto)]
+        categoria = categorias.buscar({'nombre': texto})
+        if categoria is None:
+            # Categoría nueva mencionada solo por nombre
+            categoria = Categoria(nombre=texto)
+            categorias.agregar(categoria)
+            resultado.categorias_creadas.append(categoria)
+        return categoria
+
+    # Productos
+    vistos = set()
+    for numero, fila in enumerate(filas_productos, start=1):
+        try:
+            producto = productos.buscar(fila)
+        except ValueError as error:
+            errores.append(f'Fila {numero}: {error}')
+            continue
+
+        if producto is not None and id(producto) in vistos:
+            errores.append(f'Fila {numero}: el producto {producto.nombre} aparece más de una vez')
+            continue
+
+        valores = {}
+        fila_valida = True
+        for campo in CAMPOS_PRODUCTO:
+            crudo = fila.get(campo)
+            if crudo is None or (_texto(crudo) == '' and not isinstance(crudo, bool)):
+                continue
+            try:
+                if campo == 'precio':
+                    valores[campo] = _precio(crudo)
+                elif campo in ('disponible', 'destacado'):
+                    valores[campo] = _booleano(crudo)
+                elif campo == 'categoria':
+                    valores[campo] = resolver_categoria(crudo)
+                else:
+                    valores[campo] = _texto(crudo)
+            except (InvalidOperation, ValueError):
+                errores.append(f'Fila {numero}: {campo} inválido ({_texto(crudo)})')
+                fila_valida = False
+
+        if not fila_valida:
+            continue
+
+        if producto is None:
+            # imagen es obligatoria en Producto (el formulario del panel la pide)
+            faltantes = [c for c in ('nombre', 'precio', 'categoria', 'imagen') if c not in valores]
+            if faltantes:
+                errores.append(f'Fila {numero}: para crear un producto falta {", ".join(faltantes)}')
+                continue
+            valores.setdefault('descripcion', '')
+            producto = Producto(**valores)
+            productos.agregar(producto)
+            resultado.productos_creados.append(producto)
+            vistos.add(id(producto))
+            continue
+
+        vistos.add(id(producto))
+        if cambios := _diferencias(producto, valores):
+            for campo, (_, nuevo) in cambios.items():
+                setattr(producto, campo, nuevo)
+            resultado.productos_actualizados.append((producto, cambios))
+        else:
+            resultado.sin_cambios += 1
+
+    if errores:
+        raise ImportacionError(errores)
+
+    if aplicar and resultado.hay_cambios:
+        _guardar(resultado)
+    return resultado
+
+
+def _guardar(resultado):
+    """Aplica el resultado con operaciones en bloque y luego invalida la caché una vez"""
+    ahora = timezone.now()
+    categorias_tocadas = set()
+
+    with transaction.atomic():
+        Categoria.objects.bulk_create(resultado.categorias_creadas)
+
+        # bulk_update no completa los auto_now: se fija a mano para que
+        # cambie la marca del catálogo (ETag / Last-Modified)
+        actualizadas = [categoria for categoria, _ in resultado.categorias_actualizadas]
+        for categoria in actualizadas:
+            categoria.fecha_actualizacion = ahora
+        campos = {campo for _, cambios in resultado.categorias_actualizadas for campo in cambios}
+        if actualizadas:
+            Categoria.objects.bulk_update(actualizadas, [*campos, 'fecha_actualizacion'], batch_size=500)
+        categorias_tocadas.update(categoria.id for categoria in actualizadas)
+
+        # bulk_create/bulk_update toman el id de las categorías recién creadas
+        Producto.objects.bulk_create(resultado.productos_creados, batch_size=500)
+        categorias_tocadas.update(producto.categoria_id for producto in resultado.productos_creados)
+
+        actualizados = []
+        campos = {'fecha_actualizacion'}
+        for producto, cambios in resultado.productos_actualizados:
+            if 'categoria' in cambios:
+                # También cambia la sección de la categoría anterior
+                categorias_tocadas.add(cambios['categoria'][0].id)
+            producto.fecha_actualizacion = ahora
+            campos.update(cambios)
+            actualizados.append(producto)
+        if actualizados:
+            Producto.objects.bulk_update(actualizados, list(campos), batch_size=500)
+        categorias_tocadas.update(producto.categoria_id for producto in actualizados)
+
+        # Variantes de las imágenes nuevas o cambiadas, en segundo plano
+        for producto in resultado.productos_creados + actualizados:
+            if producto.imagen and producto.imagen_variantes.get('origen') != producto.imagen.name:
+                encolar('generar_variantes', producto_id=producto.pk)
+
+    invalidar_catalogo(*categorias_tocadas)
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from menu.bench import base_de_datos_temporal, sembrar_catalogo, resumir
+
+MODOS = ['wsgi', 'asgi']
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara WSGI (vistas sincrónicas, un hilo por request) contra ASGI '
+        '(vistas async del catálogo y la API del carrito) con muchos '
+        'clientes concurrentes: requests por segundo y latencias p50/p95/p99. '
+        'Cada modo corre en su propio proceso sobre una base temporal; con '
+        '--url mide un servidor ya levantado (gunicorn o uvicorn).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrencia', type=int, default=50, help='Clientes simultáneos')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests en total por modo')
+        parser.add_argument('--modo', choices=MODOS, help='Corre un solo modo en este proceso')
+        parser.add_argument('--url', help='Mide un servidor en marcha (ej. http://127.0.0.1:8000)')
+        parser.add_argument('--json', dest='salida_json', help='Guarda los resultados en este archivo')
+
+    def handle(self, *args, **options):
+        if options['url']:
+            resultados = {options['url']: self.medir_servidor(options)}
+        elif options['modo']:
+            # Proceso hijo: el entorno (MARDEBURGER_ASGI) ya eligió las vistas
+            self.stdout.write(json.dumps(self.medir_en_proceso(options)))
+            return
+        else:
+            resultados = {modo: self.correr_modo(modo, options) for modo in MODOS}
+
+        for nombre, resultado in resultados.items():
+            self.stdout.write(
+                f"{nombre:5} {resultado['por_segundo']:>8} req/s  "
+                f"p50 {resultado['p50_ms']} ms  p95 {resultado['p95_ms']} ms  "
+                f"p99 {resultado['p99_ms']} ms  errores {resultado['errores']}"
+            )
+
+        if options['salida_json']:
+            with open(options['salida_json'], 'w') as archivo:
+                json.dump(resultados, archivo, indent=2)
+
+    def correr_modo(self, modo, options):
+        """Corre el modo en un proceso aparte (las URLs se eligen al importar)"""
+        entorno = {**os.environ, 'MARDEBURGER_ASGI': '1' if modo == 'asgi' else '0'}
+        proceso = subprocess.run(
+            [
+                sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_asgi',
+                '--modo', modo,
+                '--concurrencia', str(options['concurrencia']),
+                '--requests', str(options['requests']),
+            ],
+            env=entorno, capture_output=True, text=True,
+        )
+        if proceso.returncode != 0:
+            raise CommandError(f'Falló el modo {modo}:\n{proceso.stderr}')
+        return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+    def urls(self, productos):
+        return [
+            reverse('home'),
+            reverse('menu'),
+            reverse('producto_detail', args=[productos[0].pk]),
+            reverse('api_carrito'),
+        ]
+
+    def medir_en_proceso(self, options):
+        modo = 'asgi' if settings.DESPLIEGUE_ASGI else 'wsgi'
+        concurrencia = options['concurrencia']
+        por_cliente = max(1, options['requests'] // concurrencia)
+
+        with base_de_datos_temporal():
+            urls = self.urls(sembrar_catalogo())
+
+            # Calienta la caché del catálogo
+            client = Client()
+            for url in urls:
+                client.get(url)
+
+            inicio = time.perf_counter()
+            if modo == 'asgi':
+                tiempos, errores = asyncio.run(self.clientes_async(urls, concurrencia, por_cliente))
+            else:
+                tiempos, errores = self.clientes_hilos(urls, concurrencia, por_cliente)
+            duracion = time.perf_counter() - inicio
+
+        resultado = resumir(tiempos, duracion)
+        resultado.update({'modo': modo, 'concurrencia': concurrencia, 'errores': errores})
+        return resultado
+
+    def clientes_hilos(self, urls, concurrencia, por_cliente):
+        """WSGI: un hilo por cliente, como los threads de gunicorn"""
+        tiempos = []
+        errores = []
+        lock = threading.Lock()
+
+        def cliente(numero):
+            client = Client()
+            propios = []
+            try:
+                for i in range(por_cliente):
+                    inicio = time.perf_counter()
+                    response = client.get(urls[(numero + i) % len(urls)])
+                    propios.append(time.perf_counter() - inicio)
+                    if response.status_code != 200:
+                        with lock:
+                            errores.append(response.status_code)
+            finally:
+                connection.close()
+            with lock:
+                tiempos.extend(propios)
+
+        with ThreadPoolExecutor(concurrencia) as pool:
+            list(pool.map(cliente, range(concurrencia)))
+        return tiempos, len(errores)
+
+    async def clientes_async(self, urls, concurrencia, por_cliente):
+        """ASGI: todos los clientes en un mismo event loop"""
+        tiempos = []
+        errores = 0
+
+        async def cliente(numero):
+            nonlocal errores
+            client = AsyncClient()
+            for i in range(por_cliente):
+                inicio = time.perf_counter()
+                response = await client.get(urls[(numero + i) % len(urls)])
+                tiempos.append(time.perf_counter() - inicio)
+                if response.status_code != 200:
+                    errores += 1
+
+        await asyncio.gather(*(cliente(n) for n in range(concurrencia)))
+        return tiempos, errores
+
+    def medir_servidor(self, options):
+        """Carga HTTP real contra un servidor levantado aparte"""
+        base = options['url'].rstrip('/')
+        rutas = ['/', '/menu/', '/api/catalogo/', '/api/carrito/']
+        concurrencia = options['concurrencia']
+        por_cliente = max(1, options['requests'] // concurrencia)
+        tiempos = []
+        errores = []
+        lock = threading.Lock()
+
+        def cliente(numero):
+            propios = []
+            for i in range(por_cliente):
+                inicio = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(base + rutas[(numero + i) % len(rutas)], timeout=30) as respuesta:
+                        respuesta.read()
+                except (urllib.error.URLError, OSError) as error:
+                    with lock:
+                        errores.append(repr(error))
+                propios.append(time.perf_counter() - inicio)
+            with lock:
+                tiempos.extend(propios)
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(concurrencia) as pool:
+            list(pool.map(cliente, range(concurrencia)))
+        resultado = resumir(tiempos, time.perf_counter() - inicio)
+        resultado.update({'concurrencia': concurrencia, 'errores': len(errores)})
+        return resultado
@@ -0,0 +1,75 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from menu.bench import base_de_datos_temporal, sembrar_catalogo, resumir
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el throughput de la API del carrito con cada motor de '
+        'sesiones (db, cache, cookie) sobre una base de datos temporal.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=200, help='Carritos simulados por motor')
+        parser.add_argument('--cambios', type=int, default=8, help='Cambios al carrito por usuario')
+        parser.add_argument(
+            '--motores', nargs='+', default=list(settings.SESSION_ENGINES),
+            choices=list(settings.SESSION_ENGINES)
+        )
+        parser.add_argument('--json', dest='salida_json', help='Guarda los resultados en este archivo')
+
+    def handle(self, *args, **options):
+        resultados = {}
+
+        with base_de_datos_temporal():
+            productos = sembrar_catalogo()
+
+            for motor in options['motores']:
+                with override_settings(SESSION_ENGINE=settings.SESSION_ENGINES[motor]):
+                    resultados[motor] = self.medir_motor(productos, options['usuarios'], options['cambios'])
+
+        for motor, resultado in resultados.items():
+            self.stdout.write(
+                f"{motor:7} {resultado['por_segundo']:>8} req/s  "
+                f"p50 {resultado['p50_ms']} ms  p95 {resultado['p95_ms']} ms  "
+                f"p99 {resultado['p99_ms']} ms  {resultado['consultas_por_request']} consultas/req"
+            )
+
+        if options['salida_json']:
+            with open(options['salida_json'], 'w') as archivo:
+                json.dump(resultados, archivo, indent=2)
+
+    def medir_motor(self, productos, usuarios, cambios):
+        url = reverse('api_carrito')
+        tiempos = []
+        consultas = 0
+        inicio_total = time.perf_counter()
+
+        for usuario in range(usuarios):
+            client = Client()
+            for i in range(cambios):
+                producto = productos[(usuario + i) % len(productos)]
+                accion = 'quitar' if i % 4 == 3 else 'agregar'
+                cuerpo = json.dumps({'accion': accion, 'producto_id': producto.id, 'cantidad': 1})
+
+                with CaptureQueriesContext(connection) as capturadas:
+                    inicio = time.perf_counter()
+                    client.post(url, cuerpo, content_type='application/json')
+                    tiempos.append(time.perf_counter() - inicio)
+                consultas += len(capturadas)
+
+            inicio = time.perf_counter()
+            client.get(url)
+            tiempos.append(time.perf_counter() - inicio)
+
+        resultado = resumir(tiempos, time.perf_counter() - inicio_total)
+        resultado['consultas_por_request'] = round(consultas / max(len(tiempos), 1), 2)
+        return resultado
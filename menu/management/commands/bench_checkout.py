@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from menu.bench import base_de_datos_temporal, sembrar_catalogo, resumir
+from menu.models import Pedido
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga de CheckoutView: varios clientes concurrentes arman '
+        'un carrito y confirman pedidos. Mide pedidos por segundo con el '
+        'perfil de base de datos actual (MARDEBURGER_DB).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Clientes concurrentes')
+        parser.add_argument('--pedidos', type=int, default=25, help='Pedidos por cliente')
+        parser.add_argument(
+            '--sin-ajustes', action='store_true',
+            help='SQLite sin WAL ni busy timeout, para comparar con MARDEBURGER_SQLITE_WAL=1'
+        )
+        parser.add_argument('--json', dest='salida_json', help='Guarda los resultados en este archivo')
+
+    def handle(self, *args, **options):
+        perfil = settings.DB_PERFIL
+        if connection.vendor == 'sqlite':
+            if options['sin_ajustes']:
+                connection.settings_dict['OPTIONS'] = {}
+                perfil = 'sqlite-sin-ajustes'
+            elif 'WAL' in connection.settings_dict['OPTIONS'].get('init_command', ''):
+                perfil = 'sqlite-wal'
+
+        with base_de_datos_temporal():
+            productos = sembrar_catalogo()
+            tiempos = []
+            errores = []
+            lock = threading.Lock()
+
+            def cliente(numero):
+                client = Client()
+                propios = []
+                try:
+                    for i in range(options['pedidos']):
+                        inicio = time.perf_counter()
+                        ok = self.hacer_pedido(client, productos, numero + i)
+                        duracion = time.perf_counter() - inicio
+                        if ok:
+                            propios.append(duracion)
+                        else:
+                            with lock:
+                                errores.append(numero)
+                except Exception as error:
+                    with lock:
+                        errores.append(repr(error))
+                finally:
+                    connection.close()
+                with lock:
+                    tiempos.extend(propios)
+
+            hilos = [
+                threading.Thread(target=cliente, args=(n,))
+                for n in range(options['hilos'])
+            ]
+            inicio_total = time.perf_counter()
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            duracion_total = time.perf_counter() - inicio_total
+
+            resultado = resumir(tiempos, duracion_total)
+            resultado.update({
+                'perfil': perfil,
+                'hilos': options['hilos'],
+                'pedidos_creados': Pedido.objects.count(),
+                'errores': len(errores),
+            })
+
+        self.stdout.write(
+            f"{perfil}: {resultado['por_segundo']} pedidos/s con {options['hilos']} hilos  "
+            f"p50 {resultado['p50_ms']} ms  p95 {resultado['p95_ms']} ms  "
+            f"p99 {resultado['p99_ms']} ms  errores {resultado['errores']}"
+        )
+
+        if options['salida_json']:
+            with open(options['salida_json'], 'w') as archivo:
+                json.dump(resultado, archivo, indent=2)
+
+    def hacer_pedido(self, client, productos, semilla):
+        """Arma un carrito de 3 productos y confirma el pedido"""
+        for i in range(3):
+            producto = productos[(semilla * 3 + i) % len(productos)]
+            client.post(
+                reverse('api_carrito'),
+                json.dumps({'accion': 'agregar', 'producto_id': producto.id, 'cantidad': 1}),
+                content_type='application/json'
+            )
+
+        response = client.post(reverse('checkout'), {
+            'nombre_cliente': 'Cliente Benchmark',
+            'telefono': '2291 123456',
+            'tipo_entrega': 'retiro',
+            'metodo_pago': 'efectivo',
+        })
+        return response.status_code == 302
@@ -0,0 +1,208 @@
+import json
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from menu.bench import base_de_datos_temporal, sembrar_catalogo, sembrar_pedidos, resumir
+from menu.models import Pedido
+from panel.ventas import reconstruir_ventas
+
+PASOS_CLIENTE = ['home', 'menu', 'carrito', 'checkout', 'confirmar', 'pedido_confirmado']
+PASOS_PANEL = ['panel_dashboard', 'panel_pedido_list']
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga del embudo completo: clientes concurrentes recorren '
+        'inicio → menú → carrito → checkout → pedido confirmado mientras el '
+        'personal mira el dashboard y la lista de pedidos. Informa latencias '
+        'p50/p95/p99, throughput y consultas por request de cada paso sobre '
+        'una base temporal con catálogo e historial de pedidos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=10, help='Clientes concurrentes')
+        parser.add_argument('--recorridos', type=int, default=10, help='Pedidos completos por cliente')
+        parser.add_argument('--personal', type=int, default=2, help='Usuarios del panel concurrentes')
+        parser.add_argument('--productos', type=int, default=60, help='Productos del catálogo')
+        parser.add_argument('--historial', type=int, default=5000, help='Pedidos previos en la base')
+        parser.add_argument('--json', dest='salida_json', help='Guarda los resultados en este archivo')
+        parser.add_argument('--comparar', help='JSON de una corrida anterior para comparar')
+
+    def handle(self, *args, **options):
+        for opcion in ('usuarios', 'recorridos', 'productos'):
+            if options[opcion] < 1:
+                raise CommandError(f'--{opcion} tiene que ser al menos 1')
+        for opcion in ('personal', 'historial'):
+            if options[opcion] < 0:
+                raise CommandError(f'--{opcion} no puede ser negativo')
+
+        anterior = None
+        if options['comparar']:
+            try:
+                with open(options['comparar']) as archivo:
+                    anterior = json.load(archivo)
+            except (OSError, ValueError) as error:
+                raise CommandError(f'No se pudo leer {options["comparar"]}: {error}')
+
+        with base_de_datos_temporal():
+            productos = sembrar_catalogo(productos=options['productos'])
+            sembrar_pedidos(productos, cantidad=options['historial'])
+            reconstruir_ventas()
+            staff = User.objects.create_superuser('bench', 'bench@example.com', 'bench')
+            resultado = self.correr(productos, staff, options)
+
+        for paso, datos in resultado['pasos'].items():
+            self.stdout.write(
+                f"{paso:18} p50 {datos['p50_ms']:>8} ms  p95 {datos['p95_ms']:>8} ms  "
+                f"p99 {datos['p99_ms']:>8} ms  {datos['consultas_por_request']:>5} consultas/req  "
+                f"errores {datos['errores']}"
+            )
+        embudo = resultado['embudo']
+        self.stdout.write(
+            f"{embudo['pedidos']} pedidos en {embudo['duracion_s']} s: "
+            f"{embudo['pedidos_por_minuto']} pedidos/min, {embudo['requests_por_segundo']} req/s"
+        )
+
+        if anterior:
+            self.comparar(anterior, resultado)
+
+        if options['salida_json']:
+            with open(options['salida_json'], 'w') as archivo:
+                json.dump(resultado, archivo, indent=2)
+
+    def correr(self, productos, staff, options):
+        tiempos = {paso: [] for paso in PASOS_CLIENTE + PASOS_PANEL}
+        consultas = dict.fromkeys(tiempos, 0)
+        errores = dict.fromkeys(tiempos, 0)
+        lock = threading.Lock()
+        terminaron = threading.Event()
+
+        def registrar(propios):
+            with lock:
+                for paso, medido in propios.items():
+                    tiempos[paso].extend(medido['tiempos'])
+                    consultas[paso] += medido['consultas']
+                    errores[paso] += medido['errores']
+
+        def pedir(client, propios, paso, metodo, url, esperado=200, **kwargs):
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                response = getattr(client, metodo)(url, **kwargs)
+                duracion = time.perf_counter() - inicio
+            medido = propios.setdefault(paso, {'tiempos': [], 'consultas': 0, 'errores': 0})
+            medido['tiempos'].append(duracion)
+            medido['consultas'] += len(capturadas)
+            medido['errores'] += response.status_code != esperado
+
+        def cliente(numero):
+            client = Client()
+            propios = {}
+            try:
+                for i in range(options['recorridos']):
+                    semilla = numero * options['recorridos'] + i
+                    pedir(client, propios, 'home', 'get', reverse('home'))
+                    pedir(client, propios, 'menu', 'get', reverse('menu'))
+                    for j in range(3):
+                        producto = productos[(semilla * 3 + j) % len(productos)]
+                        pedir(
+                            client, propios, 'carrito', 'post', reverse('api_carrito'),
+                            data=json.dumps({'accion': 'agregar', 'producto_id': producto.id, 'cantidad': 1}),
+                            content_type='application/json',
+                        )
+                    pedir(client, propios, 'checkout', 'get', reverse('checkout'))
+                    pedir(client, propios, 'confirmar', 'post', reverse('checkout'), esperado=302, data={
+                        'nombre_cliente': f'Cliente {numero}',
+                        'telefono': f'2291 {100000 + semilla}',
+                        'tipo_entrega': 'retiro',
+                        'metodo_pago': 'efectivo',
+                    })
+                    pedir(client, propios, 'pedido_confirmado', 'get', reverse('pedido_confirmado'))
+            finally:
+                connection.close()
+            registrar(propios)
+
+        def personal(numero):
+            client = Client()
+            client.force_login(staff)
+            propios = {}
+            try:
+                while not terminaron.is_set():
+                    for paso in PASOS_PANEL:
+                        pedir(client, propios, paso, 'get', reverse(paso))
+            finally:
+                connection.close()
+            registrar(propios)
+
+        clientes = [threading.Thread(target=cliente, args=(n,)) for n in range(options['usuarios'])]
+        panel = [threading.Thread(target=personal, args=(n,)) for n in range(options['personal'])]
+        pedidos_antes = Pedido.objects.count()
+
+        inicio = time.perf_counter()
+        for hilo in clientes + panel:
+            hilo.start()
+        for hilo in clientes:
+            hilo.join()
+        terminaron.set()
+        for hilo in panel:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        pedidos = Pedido.objects.count() - pedidos_antes
+        pasos = {}
+        for paso, duraciones in tiempos.items():
+            datos = resumir(duraciones, duracion)
+            datos['consultas_por_request'] = round(consultas[paso] / max(len(duraciones), 1), 2)
+            datos['errores'] = errores[paso]
+            pasos[paso] = datos
+
+        total_requests = sum(len(duraciones) for duraciones in tiempos.values())
+        return {
+            'configuracion': {
+                clave: options[clave]
+                for clave in ('usuarios', 'recorridos', 'personal', 'productos', 'historial')
+            },
+            'embudo': {
+                'pedidos': pedidos,
+                'duracion_s': round(duracion, 2),
+                'pedidos_por_minuto': round(pedidos / duracion * 60, 1),
+                'requests_por_segundo': round(total_requests / duracion, 1),
+            },
+            'pasos': pasos,
+        }
+
+    def comparar(self, anterior, actual):
+        """Diferencias de p95, consultas y throughput contra la corrida anterior"""
+        self.stdout.write('\nComparación con la corrida anterior:')
+        for paso, datos in actual['pasos'].items():
+            previo = anterior.get('pasos', {}).get(paso)
+            if not previo:
+                continue
+            cambio = self.porcentaje(previo['p95_ms'], datos['p95_ms'])
+            linea = (
+                f"{paso:18} p95 {previo['p95_ms']} → {datos['p95_ms']} ms ({cambio})  "
+                f"consultas {previo['consultas_por_request']} → {datos['consultas_por_request']}"
+            )
+            peor = datos['p95_ms'] > previo['p95_ms'] * 1.2 or (
+                datos['consultas_por_request'] > previo['consultas_por_request']
+            )
+            self.stdout.write(self.style.WARNING(linea) if peor else linea)
+
+        previo = anterior.get('embudo', {}).get('pedidos_por_minuto')
+        if previo:
+            actual_por_minuto = actual['embudo']['pedidos_por_minuto']
+            self.stdout.write(
+                f"pedidos/min {previo} → {actual_por_minuto} "
+                f"({self.porcentaje(previo, actual_por_minuto)})"
+            )
+
+    def porcentaje(self, antes, despues):
+        if not antes:
+            return 'sin dato previo'
+        return f'{(despues - antes) / antes * 100:+.0f}%'
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from menu.imagenes import actualizar_variantes
+from menu.models import Producto
+
+
+class Command(BaseCommand):
+    help = 'Genera las variantes redimensionadas (JPEG/WebP) de las imágenes de productos existentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forzar', action='store_true',
+            help='Regenera también las variantes que ya están al día'
+        )
+
+    def handle(self, *args, **options):
+        generadas = 0
+        productos = Producto.objects.exclude(imagen='').order_by('id')
+
+        for producto in productos.iterator(chunk_size=200):
+            if actualizar_variantes(producto, forzar=options['forzar']):
+                generadas += 1
+                self.stdout.write(f'  {producto.imagen.name}')
+
+        self.stdout.write(self.style.SUCCESS(f'Variantes generadas para {generadas} productos'))
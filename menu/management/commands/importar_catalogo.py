@@ -0,0 +1,78 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from menu.importar import CAMPOS_PRODUCTO, ImportacionError, importar_catalogo, leer_archivo
+from menu.models import Producto
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa productos y categorías desde un CSV o JSON: compara contra el '
+        'catálogo, aplica altas y cambios en bloque en una transacción e '
+        'informa qué cambió. Ver menu/importar.py para el formato.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Archivo .csv o .json')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Solo muestra los cambios, sin guardarlos'
+        )
+        parser.add_argument(
+            '--plantilla', action='store_true',
+            help='En lugar de importar, escribe el catálogo actual en el archivo (CSV) para editarlo'
+        )
+
+    def handle(self, *args, **options):
+        if options['plantilla']:
+            return self.escribir_plantilla(options['archivo'])
+
+        try:
+            categorias, productos = leer_archivo(options['archivo'])
+        except (OSError, ValueError) as error:
+            raise CommandError(f'No se pudo leer {options["archivo"]}: {error}')
+
+        try:
+            resultado = importar_catalogo(categorias, productos, aplicar=not options['dry_run'])
+        except ImportacionError as error:
+            for mensaje in error.errores:
+                self.stderr.write(f'  {mensaje}')
+            raise CommandError('No se importó nada: corregir las filas indicadas')
+
+        for categoria in resultado.categorias_creadas:
+            self.stdout.write(f'+ categoría {categoria.nombre}')
+        for categoria, cambios in resultado.categorias_actualizadas:
+            self.stdout.write(f'~ categoría {categoria.nombre}: {self.describir(cambios)}')
+        for producto in resultado.productos_creados:
+            self.stdout.write(f'+ {producto.nombre} (${producto.precio}, {producto.categoria.nombre})')
+        for producto, cambios in resultado.productos_actualizados:
+            self.stdout.write(f'~ {producto.nombre}: {self.describir(cambios)}')
+
+        resumen = (
+            f'{len(resultado.productos_creados)} productos nuevos, '
+            f'{len(resultado.productos_actualizados)} modificados, '
+            f'{resultado.sin_cambios} sin cambios; '
+            f'{len(resultado.categorias_creadas)} categorías nuevas, '
+            f'{len(resultado.categorias_actualizadas)} modificadas'
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Prueba (no se guardó nada): {resumen}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Catálogo importado: {resumen}'))
+
+    def describir(self, cambios):
+        return ', '.join(f'{campo} {antes} → {despues}' for campo, (antes, despues) in cambios.items())
+
+    def escribir_plantilla(self, ruta):
+        productos = Producto.objects.select_related('categoria').order_by('categoria__orden', 'nombre')
+        with open(ruta, 'w', encoding='utf-8-sig', newline='') as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(['id', *CAMPOS_PRODUCTO])
+            for producto in productos.iterator(chunk_size=500):
+                escritor.writerow([
+                    producto.id, producto.nombre, producto.categoria.nombre, producto.precio,
+                    producto.descripcion, int(producto.disponible), int(producto.destacado),
+                    producto.imagen.name,
+                ])
+        self.stdout.write(self.style.SUCCESS(f'Catálogo actual escrito en {ruta}'))
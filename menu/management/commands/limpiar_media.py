@@ -0,0 +1,134 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from menu.catalogo import invalidar_catalogo
+from menu.imagenes import archivos_variantes
+from menu.models import Producto
+from menu.storage import es_nombre_por_contenido
+
+
+def recorrer(carpeta, base=''):
+    """Recorre la carpeta de a un archivo por vez: (nombre relativo, DirEntry)"""
+    with os.scandir(carpeta) as entradas:
+        for entrada in entradas:
+            if entrada.name.startswith('.'):
+                continue
+            nombre = f'{base}{entrada.name}'
+            if entrada.is_dir(follow_symlinks=False):
+                yield from recorrer(entrada.path, f'{nombre}/')
+            elif entrada.is_file(follow_symlinks=False):
+                yield nombre, entrada
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina de MEDIA_ROOT los archivos que ningún producto usa (imágenes '
+        'reemplazadas, de productos borrados y sus variantes).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Solo muestra lo que se eliminaría'
+        )
+        parser.add_argument(
+            '--minutos', type=int, default=60,
+            help='No toca archivos modificados hace menos de estos minutos (subidas en curso)'
+        )
+        parser.add_argument(
+            '--deduplicar', action='store_true',
+            help='Antes de limpiar, pasa las imágenes existentes a nombres por contenido '
+                 '(las copias idénticas quedan en un único archivo)'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        # Los nombres viejos de las imágenes renombradas se borran en la
+        # próxima pasada: hasta entonces los pueden pedir las páginas que
+        # los navegadores ya tenían abiertas
+        renombrados = self.deduplicar(dry_run) if options['deduplicar'] else set()
+
+        if not os.path.isdir(settings.MEDIA_ROOT):
+            self.stdout.write(f'{settings.MEDIA_ROOT} no existe, no hay nada que limpiar')
+            return
+
+        referenciados = self.archivos_referenciados()
+        limite = time.time() - options['minutos'] * 60
+        eliminados = 0
+        liberados = 0
+
+        for nombre, entrada in recorrer(settings.MEDIA_ROOT):
+            if nombre in referenciados or nombre in renombrados:
+                continue
+            datos = entrada.stat()
+            if datos.st_mtime > limite:
+                continue
+
+            eliminados += 1
+            liberados += datos.st_size
+            self.stdout.write(f'  {nombre} ({datos.st_size // 1024} KB)')
+            if not dry_run:
+                os.remove(entrada.path)
+
+        accion = 'Se eliminarían' if dry_run else 'Eliminados'
+        self.stdout.write(self.style.SUCCESS(
+            f'{accion} {eliminados} archivos ({liberados / 1024 / 1024:.1f} MB)'
+        ))
+
+    def archivos_referenciados(self):
+        """Imágenes de productos y sus variantes vigentes"""
+        referenciados = set()
+        filas = Producto.objects.exclude(imagen='').values_list('imagen', 'imagen_variantes')
+        for imagen, variantes in filas.iterator(chunk_size=500):
+            referenciados.add(imagen)
+            if variantes.get('origen') == imagen:
+                referenciados.update(archivos_variantes(variantes))
+        return referenciados
+
+    def deduplicar(self, dry_run):
+        """
+        Renombra cada imagen al hash de su contenido (sin disparar señales)
+        y devuelve los nombres anteriores.
+
+        Cambia fecha_actualizacion e invalida el catálogo, cuya versión está
+        en la base de datos: el sitio, que corre en otros procesos, deja de
+        servir los nombres viejos (y los ETag de las páginas cambian).
+        """
+        storage = Producto._meta.get_field('imagen').storage
+        categorias = set()
+        renombrados = set()
+        productos = Producto.objects.exclude(imagen='').only(
+            'imagen', 'imagen_variantes', 'categoria_id'
+        ).order_by('id')
+
+        for producto in productos.iterator(chunk_size=200):
+            nombre = producto.imagen.name
+            if es_nombre_por_contenido(nombre) or not storage.exists(nombre):
+                continue
+            if dry_run:
+                self.stdout.write(f'  se renombraría {nombre}')
+                continue
+
+            with storage.open(nombre, 'rb') as archivo:
+                nuevo = storage.save(nombre, archivo)
+
+            # Las variantes siguen siendo de la misma imagen: se conservan
+            variantes = dict(producto.imagen_variantes)
+            if variantes.get('origen') == nombre:
+                variantes['origen'] = nuevo
+
+            Producto.objects.filter(pk=producto.pk).update(
+                imagen=nuevo, imagen_variantes=variantes, fecha_actualizacion=timezone.now()
+            )
+            categorias.add(producto.categoria_id)
+            renombrados.add(nombre)
+            self.stdout.write(f'  {nombre} -> {nuevo}')
+
+        if categorias:
+            invalidar_catalogo(*categorias)
+        return renombrados
@@ -0,0 +1,155 @@
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def inicializar_proceso():
+    """
+    Prepara cada proceso del pool. Con spawn/forkserver el proceso arranca
+    sin Django configurado; con fork no hay conexiones heredadas porque el
+    worker las cierra antes de enviar trabajo al pool.
+    """
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def ejecutar_en_proceso(tarea_id):
+    # Se importa acá y no arriba: este módulo se importa en los procesos
+    # del pool antes de django.setup()
+    from menu.tareas import ejecutar
+    return tarea_id, ejecutar(tarea_id)
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker de la cola de tareas (menu.tareas): ejecuta las tareas '
+        'pendientes con un pool de procesos y reintenta las que fallan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--procesos', type=int, default=2,
+            help='Tamaño del pool (0 ejecuta las tareas en este mismo proceso)'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=1.0,
+            help='Segundos de espera cuando la cola está vacía'
+        )
+        parser.add_argument(
+            '--una-vez', action='store_true',
+            help='Procesa lo pendiente y termina'
+        )
+        parser.add_argument(
+            '--metricas', action='store_true',
+            help='Muestra profundidad de la cola y latencias (JSON) y termina'
+        )
+
+    def handle(self, *args, **options):
+        from menu.tareas import metricas_tareas, purgar_completadas, recuperar_colgadas
+
+        if options['metricas']:
+            self.stdout.write(json.dumps(metricas_tareas(), indent=2))
+            return
+
+        self.ultimo_latido = None
+        self.mantener([])
+        purgar_completadas()
+
+        procesos = max(options['procesos'], 0)
+        ejecutor = None
+        if procesos:
+            connections.close_all()
+            ejecutor = ProcessPoolExecutor(max_workers=procesos, initializer=inicializar_proceso)
+
+        self.stdout.write(f'Procesando tareas con {procesos or "ningún"} proceso(s) auxiliar(es)...')
+        try:
+            if ejecutor:
+                self.bucle_pool(ejecutor, procesos, options)
+            else:
+                self.bucle_local(options)
+        except KeyboardInterrupt:
+            self.stdout.write('Deteniendo el worker...')
+        finally:
+            if ejecutor:
+                ejecutor.shutdown(wait=True, cancel_futures=True)
+
+    def mantener(self, en_curso):
+        """
+        Cada un tercio de DURACION_RESERVA renueva la reserva de las tareas
+        que está ejecutando este worker y devuelve a la cola las de
+        reservas vencidas (de workers que murieron).
+        """
+        from menu.tareas import DURACION_RESERVA, recuperar_colgadas, renovar
+
+        ahora = time.monotonic()
+        if self.ultimo_latido is not None and ahora - self.ultimo_latido < DURACION_RESERVA / 3:
+            return
+        self.ultimo_latido = ahora
+
+        if en_curso:
+            renovar(en_curso)
+        recuperadas = recuperar_colgadas()
+        if recuperadas:
+            self.stdout.write(f'{recuperadas} tareas colgadas devueltas a la cola')
+
+    def bucle_local(self, options):
+        # Sin pool la tarea corre en este proceso y la reserva no se renueva
+        # mientras tanto: una tarea más larga que DURACION_RESERVA puede
+        # volver a la cola. Es el modo de desarrollo.
+        from menu.tareas import ejecutar, reclamar
+
+        while True:
+            self.mantener([])
+            ids = reclamar(1)
+            for tarea_id in ids:
+                self.informar(tarea_id, ejecutar(tarea_id))
+            if not ids:
+                if options['una_vez']:
+                    return
+                time.sleep(options['intervalo'])
+
+    def bucle_pool(self, ejecutor, procesos, options):
+        from menu.tareas import reclamar
+
+        # Futuro -> id de la tarea que ejecuta
+        en_vuelo = {}
+        while True:
+            self.mantener(en_vuelo.values())
+            ids = reclamar(procesos - len(en_vuelo)) if len(en_vuelo) < procesos else []
+            # El pool puede hacer fork al recibir trabajo: no hay que
+            # pasarle la conexión abierta de este proceso
+            connections.close_all()
+            for tarea_id in ids:
+                en_vuelo[ejecutor.submit(ejecutar_en_proceso, tarea_id)] = tarea_id
+
+            if not en_vuelo:
+                if options['una_vez']:
+                    return
+                time.sleep(options['intervalo'])
+                continue
+
+            terminadas, _ = wait(en_vuelo, timeout=options['intervalo'], return_when=FIRST_COMPLETED)
+            for futuro in terminadas:
+                del en_vuelo[futuro]
+                try:
+                    self.informar(*futuro.result())
+                except BrokenProcessPool:
+                    # Un proceso murió: sus tareas quedan en curso y, al
+                    # vencer la reserva, recuperar_colgadas() las devuelve a
+                    # la cola
+                    raise CommandError('Un proceso del pool terminó inesperadamente')
+                except Exception as error:
+                    self.stderr.write(f'Error inesperado en el pool: {error!r}')
+
+    def informar(self, tarea_id, ok):
+        if ok:
+            self.stdout.write(f'  tarea #{tarea_id} completada')
+        else:
+            self.stdout.write(self.style.WARNING(f'  tarea #{tarea_id} falló (ver admin)'))
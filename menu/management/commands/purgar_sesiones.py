@@ -0,0 +1,41 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina las sesiones vencidas. Con sesiones en base de datos borra '
+        'por lotes para no bloquear la escritura de pedidos en SQLite.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=1000,
+            help='Sesiones a borrar por transacción (por defecto 1000)'
+        )
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE != 'django.contrib.sessions.backends.db':
+            # La caché y las cookies firmadas vencen solas
+            import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+            self.stdout.write(f'{settings.SESSION_ENGINE}: no hay sesiones que purgar en la base de datos')
+            return
+
+        ahora = timezone.now()
+        borradas = 0
+
+        while True:
+            claves = list(
+                Session.objects.filter(expire_date__lt=ahora)
+                .values_list('session_key', flat=True)[:options['lote']]
+            )
+            if not claves:
+                break
+            Session.objects.filter(session_key__in=claves).delete()
+            borradas += len(claves)
+
+        self.stdout.write(self.style.SUCCESS(f'{borradas} sesiones vencidas eliminadas'))
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:39
+
+from django.db import migrations, models
+
+
+def completar_resumen(apps, schema_editor):
+    """
+    Calcula total_items y resumen_items para los pedidos existentes. Lee
+    los items ordenados por pedido, así en memoria solo hay un lote de
+    pedidos a la vez.
+    """
+    Pedido = apps.get_model('menu', 'Pedido')
+    ItemPedido = apps.get_model('menu', 'ItemPedido')
+
+    lote = []
+    pedido = None
+    items = ItemPedido.objects.select_related('producto').order_by('pedido_id', 'id')
+    for item in items.iterator(chunk_size=2000):
+        if pedido is None or pedido.pk != item.pedido_id:
+            if len(lote) == 2000:
+                Pedido.objects.bulk_update(lote, ['total_items', 'resumen_items'], batch_size=500)
+                lote = []
+            pedido = Pedido(pk=item.pedido_id, total_items=0, resumen_items=[])
+            lote.append(pedido)
+        pedido.total_items += item.cantidad
+        pedido.resumen_items.append({
+            'producto': item.producto.nombre,
+            'cantidad': item.cantidad,
+            'precio_unitario': str(item.precio_unitario),
+            'subtotal': str(item.cantidad * item.precio_unitario),
+        })
+    Pedido.objects.bulk_update(lote, ['total_items', 'resumen_items'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='resumen_items',
+            field=models.JSONField(blank=True, default=list, help_text='Líneas del pedido (producto, cantidad, precio, subtotal)'),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='total_items',
+            field=models.PositiveIntegerField(default=0, help_text='Cantidad total de unidades del pedido'),
+        ),
+        migrations.RunPython(completar_resumen, migrations.RunPython.noop),
+    ]
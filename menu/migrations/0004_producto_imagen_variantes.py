@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0003_categoria_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='imagen_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Versiones redimensionadas de la imagen (ver menu.imagenes)'),
+        ),
+    ]
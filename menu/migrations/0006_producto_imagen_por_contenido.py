@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:51
+
+import menu.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0005_tarea'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='producto',
+            name='imagen',
+            field=models.ImageField(help_text='Imagen del producto (recomendado: 800x600px)', storage=menu.storage.AlmacenamientoPorContenido(), upload_to='productos/'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:59
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Copias de menu.busqueda al momento de esta migración: si esas funciones
+# cambian, la migración tiene que seguir haciendo lo mismo
+def normalizar_telefono(telefono):
+    return (telefono or '').replace(' ', '').replace('-', '')
+
+
+def normalizar_nombre(nombre):
+    sin_acentos = ''.join(
+        c for c in unicodedata.normalize('NFKD', nombre or '')
+        if not unicodedata.combining(c)
+    )
+    return ' '.join(sin_acentos.lower().split())
+
+
+def completar_busqueda(apps, schema_editor):
+    """Completa teléfono normalizado y nombre de búsqueda de los pedidos existentes"""
+    Pedido = apps.get_model('menu', 'Pedido')
+
+    lote = []
+    for pedido in Pedido.objects.only('id', 'telefono', 'nombre_cliente').iterator(chunk_size=2000):
+        pedido.telefono_normalizado = normalizar_telefono(pedido.telefono)
+        pedido.nombre_busqueda = normalizar_nombre(pedido.nombre_cliente)
+        lote.append(pedido)
+        if len(lote) == 2000:
+            Pedido.objects.bulk_update(lote, ['telefono_normalizado', 'nombre_busqueda'], batch_size=500)
+            lote = []
+    Pedido.objects.bulk_update(lote, ['telefono_normalizado', 'nombre_busqueda'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0006_producto_imagen_por_contenido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='nombre_busqueda',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Nombre en minúsculas y sin acentos', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='telefono_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['tipo_entrega', 'fecha'], name='pedido_entrega_fecha_idx'),
+        ),
+        migrations.RunPython(completar_busqueda, migrations.RunPython.noop),
+    ]
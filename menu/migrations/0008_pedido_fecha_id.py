@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0007_pedido_busqueda'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='pedido',
+            options={'ordering': ['-fecha', '-id'], 'verbose_name_plural': 'Pedidos'},
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['fecha', 'id'], name='pedido_fecha_id_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+def marcar_entregados(apps, schema_editor):
+    """
+    Los pedidos anteriores al estado se dan por entregados: si quedaran
+    como recibidos aparecería todo el historial en la cola de cocina.
+    """
+    Pedido = apps.get_model('menu', 'Pedido')
+    Pedido.objects.update(estado='entregado')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0008_pedido_fecha_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='estado',
+            field=models.CharField(choices=[('recibido', 'Recibido'), ('preparando', 'En preparación'), ('listo', 'Listo'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], default='recibido', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='fecha_cancelado',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='fecha_entregado',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='fecha_listo',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='fecha_preparando',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(condition=models.Q(('estado__in', ['recibido', 'preparando', 'listo'])), fields=['fecha', 'id'], name='pedido_activo_idx'),
+        ),
+        migrations.RunPython(marcar_entregados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0009_pedido_estado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarea',
+            name='reservada_hasta',
+            field=models.DateTimeField(blank=True, help_text='En curso: el worker la renueva mientras ejecuta; vencida, vuelve a la cola', null=True),
+        ),
+    ]
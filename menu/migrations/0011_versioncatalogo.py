@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:46
+
+import time
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0010_tarea_reservada_hasta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCatalogo',
+            fields=[
+                ('clave', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=time.time_ns)),
+            ],
+            options={
+                'verbose_name_plural': 'Versiones del catálogo',
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def completar_palabras(apps, schema_editor):
+    """Palabras de los pedidos existentes, desde nombre_busqueda (ya normalizado)"""
+    Pedido = apps.get_model('menu', 'Pedido')
+    PalabraPedido = apps.get_model('menu', 'PalabraPedido')
+
+    lote = []
+    for pedido_id, nombre in Pedido.objects.values_list('id', 'nombre_busqueda').iterator(chunk_size=2000):
+        # Copia de menu.busqueda.palabras_nombre al momento de esta migración
+        lote += [
+            PalabraPedido(pedido_id=pedido_id, palabra=palabra)
+            for palabra in sorted({palabra[:50] for palabra in nombre.split()})
+        ]
+        if len(lote) >= 2000:
+            PalabraPedido.objects.bulk_create(lote, batch_size=500)
+            lote = []
+    PalabraPedido.objects.bulk_create(lote, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0011_versioncatalogo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PalabraPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('palabra', models.CharField(db_index=True, max_length=50)),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='palabras', to='menu.pedido')),
+            ],
+            options={
+                'verbose_name_plural': 'Palabras de pedidos',
+            },
+        ),
+        migrations.RunPython(completar_palabras, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,10 @@
+import time
+
 from django.db import models
+from django.utils import timezone
+
+from .busqueda import LARGO_PALABRA, normalizar_nombre, normalizar_telefono, palabras_nombre
+from .storage import AlmacenamientoPorContenido
 
 class Categoria(models.Model):
     """Categorías de productos (Hamburguesas, Bebidas, Acompañamientos, etc.)"""
@@ -7,6 +13,7 @@ class Categoria(models.Model):
         default=0,
         help_text="Orden de visualización (menor número aparece primero)"
     )
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name_plural = "Categorías"
@@ -29,8 +36,15 @@ class Producto(models.Model):
     )
     imagen = models.ImageField(
         upload_to='productos/',
+        storage=AlmacenamientoPorContenido(),
         help_text="Imagen del producto (recomendado: 800x600px)"
     )
+    imagen_variantes = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Versiones redimensionadas de la imagen (ver menu.imagenes)"
+    )
     categoria = models.ForeignKey(
         Categoria, 
         on_delete=models.CASCADE, 
@@ -53,6 +67,42 @@ class Producto(models.Model):
     
     def __str__(self):
         return f"{self.nombre} - ${self.precio}"
+    
+    def _variantes(self, formato):
+        """Variantes {ancho: nombre} vigentes para la imagen actual"""
+        if not self.imagen or self.imagen_variantes.get('origen') != self.imagen.name:
+            return {}
+        return {int(ancho): nombre for ancho, nombre in self.imagen_variantes.get(formato, {}).items()}
+    
+    def _srcset(self, formato):
+        storage = self.imagen.storage
+        return ', '.join(
+            f"{storage.url(nombre)} {ancho}w"
+            for ancho, nombre in sorted(self._variantes(formato).items())
+        )
+    
+    @property
+    def srcset_jpeg(self):
+        """Atributo srcset con las variantes JPEG"""
+        return self._srcset('jpeg')
+    
+    @property
+    def srcset_webp(self):
+        """Atributo srcset con las variantes WebP"""
+        return self._srcset('webp')
+    
+    @property
+    def miniatura_url(self):
+        """URL de la variante más chica (carrito) o de la imagen original"""
+        variantes = self._variantes('jpeg')
+        if variantes:
+            return self.imagen.storage.url(variantes[min(variantes)])
+        return self.imagen.url if self.imagen else ''
+
+
+# Pedidos que la cocina todavía tiene que atender (fuera de la clase para
+# poder usarlo en Pedido.Meta)
+ESTADOS_ACTIVOS = ['recibido', 'preparando', 'listo']
 
 
 class Pedido(models.Model):
@@ -69,6 +119,25 @@ class Pedido(models.Model):
         ('delivery', 'Delivery'),
     ]
     
+    ESTADOS = [
+        ('recibido', 'Recibido'),
+        ('preparando', 'En preparación'),
+        ('listo', 'Listo'),
+        ('entregado', 'Entregado'),
+        ('cancelado', 'Cancelado'),
+    ]
+    
+    ESTADOS_ACTIVOS = ESTADOS_ACTIVOS
+    
+    # Estados a los que se puede pasar desde cada uno
+    TRANSICIONES = {
+        'recibido': ['preparando', 'cancelado'],
+        'preparando': ['listo', 'cancelado'],
+        'listo': ['entregado', 'cancelado'],
+        'entregado': [],
+        'cancelado': [],
+    }
+    
     # Información del cliente
     nombre_cliente = models.CharField(max_length=200)
     telefono = models.CharField(max_length=20)
@@ -98,19 +167,135 @@ class Pedido(models.Model):
         help_text="Aclaraciones o instrucciones especiales"
     )
     
+    # Resumen precalculado al crear el pedido (evita consultar ItemPedido)
+    total_items = models.PositiveIntegerField(
+        default=0,
+        help_text="Cantidad total de unidades del pedido"
+    )
+    resumen_items = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Líneas del pedido (producto, cantidad, precio, subtotal)"
+    )
+    
+    # Búsqueda (ver menu.busqueda), se completan en save()
+    telefono_normalizado = models.CharField(
+        max_length=20,
+        blank=True,
+        editable=False,
+        db_index=True
+    )
+    nombre_busqueda = models.CharField(
+        max_length=200,
+        blank=True,
+        editable=False,
+        db_index=True,
+        help_text="Nombre en minúsculas y sin acentos"
+    )
+    
+    # Estado (ver services.cambiar_estado) y fecha de cada transición
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADOS,
+        default='recibido'
+    )
+    fecha_preparando = models.DateTimeField(null=True, blank=True)
+    fecha_listo = models.DateTimeField(null=True, blank=True)
+    fecha_entregado = models.DateTimeField(null=True, blank=True)
+    fecha_cancelado = models.DateTimeField(null=True, blank=True)
+    
     # Metadata
     fecha = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        ordering = ['-fecha']
+        ordering = ['-fecha', '-id']
         verbose_name_plural = "Pedidos"
+        indexes = [
+            models.Index(fields=['tipo_entrega', 'fecha'], name='pedido_entrega_fecha_idx'),
+            # Paginación por cursor (menu.paginacion)
+            models.Index(fields=['fecha', 'id'], name='pedido_fecha_id_idx'),
+            # Cola de cocina: solo los pedidos activos, pocos sin importar el historial
+            models.Index(
+                fields=['fecha', 'id'],
+                name='pedido_activo_idx',
+                condition=models.Q(estado__in=ESTADOS_ACTIVOS)
+            ),
+        ]
     
     def __str__(self):
         return f"Pedido #{self.id} - {self.nombre_cliente} (${self.total})"
     
+    def save(self, *args, **kwargs):
+        self.telefono_normalizado = normalizar_telefono(self.telefono)
+        self.nombre_busqueda = normalizar_nombre(self.nombre_cliente)
+        
+        nuevo = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'telefono' in update_fields:
+                update_fields.add('telefono_normalizado')
+            if 'nombre_cliente' in update_fields:
+                update_fields.add('nombre_busqueda')
+            kwargs['update_fields'] = update_fields
+        
+        super().save(*args, **kwargs)
+        
+        if nuevo or update_fields is None or 'nombre_busqueda' in update_fields:
+            self.guardar_palabras(nuevo)
+    
+    def guardar_palabras(self, nuevo=False):
+        """Reemplaza las palabras de búsqueda del nombre (PalabraPedido)"""
+        if not nuevo:
+            self.palabras.all().delete()
+        PalabraPedido.objects.bulk_create([
+            PalabraPedido(pedido=self, palabra=palabra)
+            for palabra in palabras_nombre(self.nombre_busqueda)
+        ])
+    
     def cantidad_items(self):
         """Retorna la cantidad total de items en el pedido"""
-        return sum(item.cantidad for item in self.items.all())
+        return self.total_items
+    
+    @property
+    def activo(self):
+        return self.estado in self.ESTADOS_ACTIVOS
+    
+    def estados_siguientes(self):
+        """[(valor, nombre)] de los estados a los que puede pasar"""
+        nombres = dict(self.ESTADOS)
+        return [(estado, nombres[estado]) for estado in self.TRANSICIONES[self.estado]]
+    
+    def calcular_resumen(self, items):
+        """Completa total_items y resumen_items a partir de los items dados"""
+        self.total_items = sum(item.cantidad for item in items)
+        self.resumen_items = [item.resumen() for item in items]
+    
+    def actualizar_resumen(self):
+        """Recalcula y guarda el resumen desde los items guardados"""
+        self.calcular_resumen(list(self.items.select_related('producto')))
+        self.save(update_fields=['total_items', 'resumen_items'])
+
+
+class PalabraPedido(models.Model):
+    """
+    Cada palabra del nombre del cliente, normalizada, para buscar un pedido
+    por cualquiera de ellas con el índice (ver menu.busqueda)
+    """
+    pedido = models.ForeignKey(
+        Pedido,
+        on_delete=models.CASCADE,
+        related_name='palabras'
+    )
+    # db_index: en PostgreSQL Django agrega el índice varchar_pattern_ops
+    # que usa LIKE 'texto%'
+    palabra = models.CharField(max_length=LARGO_PALABRA, db_index=True)
+    
+    class Meta:
+        verbose_name_plural = "Palabras de pedidos"
+    
+    def __str__(self):
+        return f"{self.palabra} (Pedido #{self.pedido_id})"
 
 
 class ItemPedido(models.Model):
@@ -138,5 +323,81 @@ class ItemPedido(models.Model):
         """Calcula el subtotal del item"""
         return self.cantidad * self.precio_unitario
     
+    def resumen(self):
+        """Línea del item tal como se guarda en Pedido.resumen_items"""
+        return {
+            'producto': self.producto.nombre,
+            'cantidad': self.cantidad,
+            'precio_unitario': str(self.precio_unitario),
+            'subtotal': str(self.subtotal()),
+        }
+    
     def __str__(self):
         return f"{self.cantidad}x {self.producto.nombre} (Pedido #{self.pedido.id})"
+
+
+
+class Tarea(models.Model):
+    """Trabajos en segundo plano (ver menu.tareas y procesar_tareas)"""
+    
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('en_curso', 'En curso'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    ]
+    
+    nombre = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADOS,
+        default='pendiente'
+    )
+    intentos = models.PositiveIntegerField(default=0)
+    max_intentos = models.PositiveIntegerField(default=5)
+    ejecutar_desde = models.DateTimeField(
+        default=timezone.now,
+        help_text="No se ejecuta antes de esta fecha (reintentos con espera)"
+    )
+    error = models.TextField(blank=True)
+    reservada_hasta = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="En curso: el worker la renueva mientras ejecuta; vencida, vuelve a la cola"
+    )
+    
+    # Metadata
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['ejecutar_desde', 'id']
+        verbose_name_plural = "Tareas"
+        indexes = [
+            models.Index(fields=['estado', 'ejecutar_desde']),
+        ]
+    
+    def __str__(self):
+        return f"{self.nombre} #{self.id} ({self.estado})"
+
+
+class VersionCatalogo(models.Model):
+    """
+    Versión del catálogo ('catalogo') y de cada categoría ('categoria:<id>')
+    con la que se arman las claves de su caché (ver menu.catalogo). Se
+    guardan en la base de datos para que todos los procesos (los workers
+    web, los comandos y la cola de tareas) vean el mismo número.
+    """
+    
+    clave = models.CharField(max_length=50, primary_key=True)
+    # Empieza con la hora: si se reinicia la base, una caché compartida no
+    # devuelve entradas de las versiones anteriores
+    version = models.BigIntegerField(default=time.time_ns)
+    
+    class Meta:
+        verbose_name_plural = "Versiones del catálogo"
+    
+    def __str__(self):
+        return f"{self.clave}: {self.version}"
@@ -0,0 +1,115 @@
+"""
+Paginación por cursor (keyset) para listas ordenadas por (fecha, id).
+
+En lugar de OFFSET, cada página pide las filas anteriores (o posteriores)
+a la última fila vista: WHERE fecha <= f AND (fecha < f OR id < i). Con el
+índice sobre (fecha, id) la página 500 cuesta lo mismo que la primera.
+El cursor es la fecha y el id de esa fila, codificados en base64.
+"""
+import base64
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .pedidos import contar_pedidos
+
+
+def codificar_cursor(obj):
+    texto = f'{obj.fecha.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """(fecha, id) del cursor, o None si no es válido"""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        fecha, pk = base64.urlsafe_b64decode(cursor + relleno).decode().split('|')
+        fecha, pk = parse_datetime(fecha), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return (fecha, pk) if fecha else None
+
+
+class PaginaCursor:
+    """Una página de la lista, con los cursores para moverse"""
+
+    def __init__(self, objetos, siguiente=None, anterior=None, total=None):
+        self.object_list = objetos
+        self.siguiente = siguiente
+        self.anterior = anterior
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.siguiente is not None
+
+    def has_previous(self):
+        return self.anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def paginar_por_cursor(queryset, cursor=None, anterior=False, tamano=20):
+    """
+    Página de `tamano` filas del queryset en orden (-fecha, -id). Sin
+    cursor es la primera; con anterior=True son las filas más nuevas que
+    el cursor (la página previa).
+    """
+    posicion = decodificar_cursor(cursor) if cursor else None
+
+    if posicion is None:
+        anterior = False
+        filas = queryset.order_by('-fecha', '-id')
+    else:
+        fecha, pk = posicion
+        if anterior:
+            filas = queryset.filter(
+                Q(fecha__gt=fecha) | Q(fecha=fecha, id__gt=pk), fecha__gte=fecha
+            ).order_by('fecha', 'id')
+        else:
+            filas = queryset.filter(
+                Q(fecha__lt=fecha) | Q(fecha=fecha, id__lt=pk), fecha__lte=fecha
+            ).order_by('-fecha', '-id')
+
+    objetos = list(filas[:tamano + 1])
+    hay_mas = len(objetos) > tamano
+    objetos = objetos[:tamano]
+    if anterior:
+        objetos.reverse()
+
+    pagina = PaginaCursor(objetos)
+    if objetos:
+        if hay_mas if not anterior else posicion:
+            pagina.siguiente = codificar_cursor(objetos[-1])
+        if hay_mas if anterior else posicion:
+            pagina.anterior = codificar_cursor(objetos[0])
+    return pagina
+
+
+class PaginadorPedidos(Paginator):
+    """
+    Paginator para el admin de pedidos, que solo sabe paginar por número
+    de página: el total se cachea (menu.pedidos) y el OFFSET se hace sobre
+    los ids, que salen del índice, antes de leer las filas de la página.
+    El OFFSET igual recorre las filas salteadas, así que las páginas
+    lejanas cuestan más que la primera; la lista de pedidos del panel
+    pagina por cursor y no tiene ese problema.
+    """
+
+    @cached_property
+    def count(self):
+        return contar_pedidos(self.object_list)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        inicio = (number - 1) * self.per_page
+        ids = list(self.object_list.values_list('pk', flat=True)[inicio:inicio + self.per_page])
+        return self._get_page(self.object_list.filter(pk__in=ids), number, self)
@@ -0,0 +1,93 @@
+"""
+Versión de la lista de pedidos en caché.
+
+Cada vez que se guarda o elimina un pedido (menu.signals) la versión
+aumenta. Lo que se calcula sobre la lista completa (por ejemplo el total
+para la paginación) se cachea con la versión en la clave y se recalcula
+solo cuando hubo pedidos nuevos o cambios.
+
+También se guarda el id del último pedido creado: los avisos en vivo del
+panel (panel.eventos) lo leen de la caché para saber si hay pedidos nuevos
+sin consultar la base de datos.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import Max
+
+from .models import Pedido
+
+CLAVE_VERSION = 'pedidos:version'
+CLAVE_ULTIMO = 'pedidos:ultimo'
+
+
+def version_pedidos():
+    """Versión actual de la lista de pedidos"""
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        # Igual que en menu.catalogo: si la clave se perdió no se vuelve a
+        # empezar desde 1 (se servirían entradas viejas)
+        cache.add(CLAVE_VERSION, time.time_ns(), None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def invalidar_pedidos():
+    """Incrementa la versión de la lista de pedidos"""
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.add(CLAVE_VERSION, time.time_ns(), None)
+
+
+def ultimo_pedido():
+    """Id del último pedido creado (0 si no hay pedidos)"""
+    ultimo = cache.get(CLAVE_ULTIMO)
+    if ultimo is None:
+        ultimo = Pedido.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+        cache.add(CLAVE_ULTIMO, ultimo, None)
+    return ultimo
+
+
+async def aversion_pedidos():
+    """version_pedidos para código async (panel.eventos con ASGI)"""
+    version = await cache.aget(CLAVE_VERSION)
+    if version is None:
+        await cache.aadd(CLAVE_VERSION, time.time_ns(), None)
+        version = await cache.aget(CLAVE_VERSION)
+    return version
+
+
+async def aultimo_pedido():
+    """ultimo_pedido para código async"""
+    ultimo = await cache.aget(CLAVE_ULTIMO)
+    if ultimo is None:
+        ultimo = (await Pedido.objects.aaggregate(ultimo=Max('id')))['ultimo'] or 0
+        await cache.aadd(CLAVE_ULTIMO, ultimo, None)
+    return ultimo
+
+
+def registrar_pedido_nuevo(pedido_id):
+    """Llamada al confirmarse la transacción de un pedido nuevo (menu.signals)"""
+    if pedido_id > (cache.get(CLAVE_ULTIMO) or 0):
+        cache.set(CLAVE_ULTIMO, pedido_id, None)
+
+
+def contar_pedidos(queryset, timeout=300):
+    """
+    COUNT(*) del queryset de pedidos, cacheado hasta que cambie la versión
+    (o pasen `timeout` segundos). Cada filtro distinto tiene su entrada.
+    """
+    consulta = hashlib.md5(str(queryset.order_by().query).encode()).hexdigest()
+    clave = f'pedidos:conteo:{version_pedidos()}:{consulta}'
+    return cache.get_or_set(clave, queryset.count, timeout)
+
+
+def pedidos_activos():
+    """
+    Pedidos que la cocina todavía tiene que atender, del más viejo al más
+    nuevo. El filtro coincide con la condición del índice parcial
+    pedido_activo_idx, así que no recorre el historial.
+    """
+    return Pedido.objects.filter(estado__in=Pedido.ESTADOS_ACTIVOS).order_by('fecha', 'id')
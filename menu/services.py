@@ -0,0 +1,120 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import Producto, Pedido, ItemPedido
+from .signals import pedido_creado, pedido_estado_cambiado
+
+
+class CarritoInvalidoError(Exception):
+    """El carrito contiene líneas que no se pueden convertir en un pedido"""
+
+    def __init__(self, errores):
+        self.errores = errores
+        super().__init__('; '.join(errores))
+
+
+class TransicionInvalidaError(Exception):
+    """El pedido no puede pasar a ese estado desde el actual"""
+
+    def __init__(self, pedido, estado):
+        self.pedido = pedido
+        self.estado = estado
+        nombre = dict(Pedido.ESTADOS).get(estado, str(estado))
+        super().__init__(
+            f'El pedido #{pedido.pk} está {pedido.get_estado_display().lower()} '
+            f'y no puede pasar a {nombre.lower()}'
+        )
+
+
+def crear_pedido(pedido, carrito):
+    """
+    Crea el pedido y todos sus items a partir del carrito de la sesión.
+
+    Carga todos los productos del carrito en una sola consulta y guarda el
+    pedido junto con sus items (un único bulk insert) dentro de una misma
+    transacción. Si alguna línea no es válida no se guarda nada y se lanza
+    CarritoInvalidoError con un mensaje por línea.
+    """
+    errores = []
+    cantidades = {}
+
+    for producto_id, cantidad in carrito.items():
+        try:
+            producto_id = int(producto_id)
+            cantidad = int(cantidad)
+        except (TypeError, ValueError):
+            errores.append(f'Línea inválida en el carrito: {producto_id}')
+            continue
+
+        if cantidad < 1:
+            errores.append(f'Cantidad inválida para el producto #{producto_id}')
+            continue
+
+        cantidades[producto_id] = cantidad
+
+    productos = Producto.objects.in_bulk(list(cantidades))
+
+    items = []
+    total = 0
+
+    for producto_id, cantidad in cantidades.items():
+        producto = productos.get(producto_id)
+
+        if producto is None:
+            errores.append(f'El producto #{producto_id} ya no existe')
+            continue
+
+        if not producto.disponible:
+            errores.append(f'{producto.nombre} no está disponible en este momento')
+            continue
+
+        total += producto.precio * cantidad
+        items.append(ItemPedido(
+            producto=producto,
+            cantidad=cantidad,
+            precio_unitario=producto.precio
+        ))
+
+    if errores:
+        raise CarritoInvalidoError(errores)
+
+    with transaction.atomic():
+        pedido.total = total
+        pedido.calcular_resumen(items)
+        pedido.save()
+
+        for item in items:
+            item.pedido = pedido
+        ItemPedido.objects.bulk_create(items)
+        pedido_creado.send(sender=Pedido, pedido=pedido, items=items)
+
+    return pedido
+
+
+def cambiar_estado(pedido, estado):
+    """
+    Pasa el pedido al estado dado y registra la fecha de la transición.
+
+    El UPDATE es condicional al estado que tenía el pedido: si otra
+    pantalla ya lo cambió (dos tablets de cocina a la vez) se lanza
+    TransicionInvalidaError en lugar de pisar ese cambio.
+    """
+    anterior = pedido.estado
+    if estado not in Pedido.TRANSICIONES.get(anterior, []):
+        raise TransicionInvalidaError(pedido, estado)
+
+    campo = f'fecha_{estado}'
+    ahora = timezone.now()
+
+    with transaction.atomic():
+        actualizados = Pedido.objects.filter(pk=pedido.pk, estado=anterior).update(
+            estado=estado, **{campo: ahora}
+        )
+        if actualizados:
+            pedido.estado = estado
+            setattr(pedido, campo, ahora)
+            pedido_estado_cambiado.send(sender=Pedido, pedido=pedido, anterior=anterior)
+
+    if not actualizados:
+        pedido.refresh_from_db(fields=['estado', campo])
+        raise TransicionInvalidaError(pedido, estado)
+    return pedido
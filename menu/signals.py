@@ -0,0 +1,107 @@
+from functools import partial
+
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from .catalogo import invalidar_catalogo, olvidar_versiones
+from .imagenes import variantes_vigentes
+from .models import Producto, Categoria, Pedido
+from .pedidos import invalidar_pedidos, registrar_pedido_nuevo
+from .tareas import encolar
+
+# Enviada por services.crear_pedido dentro de la transacción del pedido,
+# ya guardados sus items: argumentos pedido e items
+pedido_creado = Signal()
+
+# Enviada por services.cambiar_estado dentro de la transacción, con el
+# pedido ya en su estado nuevo: argumentos pedido y anterior (estado previo)
+pedido_estado_cambiado = Signal()
+
+
+@receiver(request_started)
+def versiones_por_request(sender, **kwargs):
+    """Cada request lee una vez las versiones del catálogo (menu.catalogo)"""
+    olvidar_versiones()
+
+
+@receiver(pre_save, sender=Producto)
+def recordar_estado_anterior(sender, instance, **kwargs):
+    """
+    Guarda la categoría previa (para invalidar también su sección) y la
+    imagen previa (para borrarla si se reemplaza)
+    """
+    anterior = None
+    if instance.pk:
+        anterior = Producto.objects.filter(pk=instance.pk).values(
+            'categoria_id', 'imagen', 'imagen_variantes'
+        ).first()
+
+    instance._categoria_anterior_id = anterior['categoria_id'] if anterior else None
+    instance._imagen_anterior = anterior
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def producto_modificado(sender, instance, **kwargs):
+    """
+    Invalida la caché del catálogo y la sección de la categoría.
+
+    Cubre el panel, el admin (incluidos los cambios de list_editable, que
+    guardan cada objeto con save()) y los borrados en cascada. Se invalida
+    después del commit: antes, un request simultáneo podría leer el
+    catálogo viejo y cachearlo con la versión nueva.
+    """
+    transaction.on_commit(partial(
+        invalidar_catalogo,
+        instance.categoria_id,
+        getattr(instance, '_categoria_anterior_id', None)
+    ))
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def categoria_modificada(sender, instance, **kwargs):
+    """Invalida la caché del catálogo y la sección de la categoría, después del commit"""
+    transaction.on_commit(partial(invalidar_catalogo, instance.id))
+
+
+@receiver(post_save, sender=Producto)
+def encolar_trabajo_imagen(sender, instance, **kwargs):
+    """
+    Encola las variantes si la imagen es nueva y el borrado de la
+    anterior si se reemplazó. El guardado no espera a ninguna de las dos.
+    """
+    if instance.imagen and not variantes_vigentes(instance):
+        encolar('generar_variantes', producto_id=instance.pk)
+
+    anterior = getattr(instance, '_imagen_anterior', None)
+    if anterior and anterior['imagen'] and anterior['imagen'] != instance.imagen.name:
+        encolar('eliminar_imagen', nombre=anterior['imagen'], variantes=anterior['imagen_variantes'])
+
+
+@receiver(post_delete, sender=Producto)
+def encolar_borrado_imagen(sender, instance, **kwargs):
+    """Encola el borrado de la imagen del producto eliminado"""
+    if instance.imagen:
+        encolar('eliminar_imagen', nombre=instance.imagen.name, variantes=instance.imagen_variantes)
+
+
+@receiver(post_save, sender=Pedido)
+@receiver(post_delete, sender=Pedido)
+def pedido_modificado(sender, instance, **kwargs):
+    """Invalida los totales cacheados de la lista de pedidos"""
+    invalidar_pedidos()
+
+
+@receiver(pedido_creado)
+def avisar_pedido_nuevo(sender, pedido, **kwargs):
+    """Publica el id del pedido para los avisos en vivo, una vez confirmado"""
+    transaction.on_commit(partial(registrar_pedido_nuevo, pedido.pk))
+
+
+@receiver(pedido_estado_cambiado)
+def estado_modificado(sender, pedido, **kwargs):
+    """cambiar_estado guarda con update(), que no envía post_save"""
+    invalidar_pedidos()
@@ -0,0 +1,64 @@
+"""
+Almacenamiento direccionado por contenido para las imágenes de productos.
+
+El nombre de cada archivo es el hash de sus bytes, así que volver a subir
+la misma imagen (o usarla en dos productos) no crea una copia nueva:
+productos/burger.jpg -> productos/3f8a...c1.jpg
+
+Las variantes redimensionadas (menu.imagenes) se guardan con
+guardar_con_nombre: su nombre sale del de la imagen original, que ya es
+único para ese contenido, y tiene que poder calcularse de antemano.
+"""
+import hashlib
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# 32 caracteres hexadecimales (128 bits de SHA-256) más la extensión
+NOMBRE_POR_CONTENIDO = re.compile(r'^[0-9a-f]{32}\.[a-z0-9]+$')
+
+
+def hash_contenido(contenido):
+    """SHA-256 del archivo leyendo por partes (no lo carga entero en memoria)"""
+    digest = hashlib.sha256()
+    if hasattr(contenido, 'seek'):
+        contenido.seek(0)
+    for parte in contenido.chunks():
+        digest.update(parte)
+    if hasattr(contenido, 'seek'):
+        contenido.seek(0)
+    return digest.hexdigest()
+
+
+def es_nombre_por_contenido(nombre):
+    """True si el nombre ya sigue el formato <hash>.<extensión>"""
+    return bool(NOMBRE_POR_CONTENIDO.match(posixpath.basename(nombre)))
+
+
+@deconstructible
+class AlmacenamientoPorContenido(FileSystemStorage):
+    """FileSystemStorage que nombra cada archivo por el hash de su contenido"""
+
+    def nombre_por_contenido(self, nombre, contenido):
+        carpeta = posixpath.dirname(nombre)
+        extension = posixpath.splitext(nombre)[1].lower()
+        return posixpath.join(carpeta, f'{hash_contenido(contenido)[:32]}{extension}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        nombre = self.nombre_por_contenido(name, content)
+        if self.exists(nombre):
+            # Los mismos bytes ya están guardados: se reutiliza el archivo
+            return nombre
+        return super().save(nombre, content, max_length=max_length)
+
+    def guardar_con_nombre(self, name, content):
+        """Guarda con el nombre indicado, sin reemplazarlo por el hash"""
+        return super().save(name, content)
@@ -0,0 +1,228 @@
+"""
+Cola de tareas en segundo plano sobre la tabla menu_tarea.
+
+El trabajo lento que dispara el guardado de un producto (variantes de
+imágenes, borrar archivos reemplazados) se encola acá y el request vuelve
+enseguida. `python manage.py procesar_tareas` las ejecuta con un pool de
+procesos, reintenta las que fallan con espera exponencial y marca como
+fallidas las que agotan los intentos.
+
+Una tarea en curso queda reservada por el worker que la tomó hasta
+`reservada_hasta`, y el worker renueva la reserva mientras la ejecuta. Si
+el worker muere, la reserva vence y cualquier worker la devuelve a la cola
+(recuperar_colgadas); una tarea que sigue corriendo no se toma dos veces.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Min, Q
+from django.utils import timezone
+
+from .imagenes import actualizar_variantes, archivos_variantes
+from .models import Producto, Tarea
+
+logger = logging.getLogger(__name__)
+
+# Espera antes de reintentar: 30 s, 1 min, 2 min, ... hasta 1 hora
+ESPERA_BASE = 30
+ESPERA_MAXIMA = 60 * 60
+
+# Segundos que dura la reserva de una tarea en curso sin renovarse
+DURACION_RESERVA = 5 * 60
+
+REGISTRO = {}
+
+
+def tarea(nombre):
+    """Registra una función como tarea con ese nombre"""
+    def decorador(funcion):
+        REGISTRO[nombre] = funcion
+        return funcion
+    return decorador
+
+
+def encolar(nombre, /, max_intentos=5, **argumentos):
+    """
+    Encola una tarea. Los argumentos deben poder guardarse como JSON; el
+    nombre de la tarea va por posición, así una tarea puede recibir un
+    argumento `nombre` (eliminar_imagen).
+
+    La fila se crea en la transacción actual, así que el worker no la ve
+    hasta que se confirma. Con TAREAS_SINCRONICAS se ejecuta al confirmar,
+    dentro del mismo proceso.
+    """
+    if nombre not in REGISTRO:
+        raise ValueError(f'Tarea desconocida: {nombre}')
+
+    if settings.TAREAS_SINCRONICAS:
+        transaction.on_commit(lambda: REGISTRO[nombre](**argumentos))
+        return None
+
+    return Tarea.objects.create(nombre=nombre, argumentos=argumentos, max_intentos=max_intentos)
+
+
+def espera_reintento(intentos):
+    """Segundos a esperar tras el intento número `intentos` (con algo de azar)"""
+    espera = min(ESPERA_BASE * 2 ** (intentos - 1), ESPERA_MAXIMA)
+    return espera * random.uniform(0.9, 1.1)
+
+
+def reclamar(limite=1):
+    """
+    Marca como en curso hasta `limite` tareas listas y devuelve sus ids.
+
+    El UPDATE condicionado a estado='pendiente' hace que dos workers no
+    tomen la misma tarea, sin depender de SELECT ... FOR UPDATE.
+    """
+    ahora = timezone.now()
+    candidatas = Tarea.objects.filter(
+        estado='pendiente', ejecutar_desde__lte=ahora
+    ).values_list('id', flat=True)[:limite * 2]
+
+    reclamadas = []
+    for tarea_id in candidatas:
+        if len(reclamadas) == limite:
+            break
+        tomada = Tarea.objects.filter(pk=tarea_id, estado='pendiente').update(
+            estado='en_curso',
+            fecha_inicio=ahora,
+            reservada_hasta=ahora + timedelta(seconds=DURACION_RESERVA),
+            intentos=F('intentos') + 1,
+        )
+        if tomada:
+            reclamadas.append(tarea_id)
+    return reclamadas
+
+
+def renovar(ids):
+    """Extiende la reserva de las tareas en curso de este worker (latido)"""
+    return Tarea.objects.filter(pk__in=list(ids), estado='en_curso').update(
+        reservada_hasta=timezone.now() + timedelta(seconds=DURACION_RESERVA)
+    )
+
+
+def ejecutar(tarea_id):
+    """
+    Ejecuta una tarea ya reclamada. Devuelve True si terminó bien.
+
+    El resultado se guarda solo si la tarea sigue siendo la que se reclamó
+    (misma fecha_inicio): si la reserva venció y otro worker la volvió a
+    tomar, el resultado de este intento no pisa el del nuevo.
+    """
+    pendiente = Tarea.objects.get(pk=tarea_id)
+    funcion = REGISTRO.get(pendiente.nombre)
+    reclamada = Tarea.objects.filter(pk=tarea_id, estado='en_curso', fecha_inicio=pendiente.fecha_inicio)
+
+    try:
+        if funcion is None:
+            raise LookupError(f'Tarea desconocida: {pendiente.nombre}')
+        funcion(**pendiente.argumentos)
+    except Exception:
+        logger.exception('Falló la tarea %s (intento %s)', pendiente, pendiente.intentos)
+        ahora = timezone.now()
+        cambios = {'error': traceback.format_exc(), 'fecha_fin': ahora}
+
+        if funcion is None or pendiente.intentos >= pendiente.max_intentos:
+            cambios['estado'] = 'fallida'
+        else:
+            cambios['estado'] = 'pendiente'
+            cambios['ejecutar_desde'] = ahora + timedelta(seconds=espera_reintento(pendiente.intentos))
+
+        reclamada.update(**cambios)
+        return False
+
+    reclamada.update(estado='completada', error='', fecha_fin=timezone.now())
+    return True
+
+
+def recuperar_colgadas():
+    """
+    Devuelve a la cola las tareas en curso con la reserva vencida (el
+    worker que las tomó murió). Las que ya agotaron los intentos quedan
+    como fallidas. Las tareas sin reserva son de antes de que existiera y
+    se dan por vencidas.
+    """
+    colgadas = Tarea.objects.filter(estado='en_curso').filter(
+        Q(reservada_hasta__lt=timezone.now()) | Q(reservada_hasta__isnull=True)
+    )
+    fallidas = colgadas.filter(intentos__gte=F('max_intentos')).update(
+        estado='fallida', error='El worker se detuvo durante la ejecución'
+    )
+    return fallidas + colgadas.update(estado='pendiente')
+
+
+def purgar_completadas(dias=7):
+    """Elimina las tareas completadas hace más de `dias` días"""
+    limite = timezone.now() - timedelta(days=dias)
+    borradas, _ = Tarea.objects.filter(estado='completada', fecha_fin__lt=limite).delete()
+    return borradas
+
+
+def metricas_tareas():
+    """
+    Profundidad de la cola y latencias, en una sola consulta.
+
+    - pendientes: listas para ejecutar; programadas: esperando un reintento
+    - antiguedad_segundos: cuánto lleva esperando la pendiente más vieja
+    - espera_media_segundos / duracion_media_segundos: de las tareas
+      completadas en la última hora (desde que se encolaron hasta que
+      empezaron, y lo que tardó la ejecución)
+    """
+    ahora = timezone.now()
+    ultima_hora = Q(estado='completada', fecha_fin__gte=ahora - timedelta(hours=1))
+    duracion = DurationField()
+
+    datos = Tarea.objects.aggregate(
+        pendientes=Count('id', filter=Q(estado='pendiente', ejecutar_desde__lte=ahora)),
+        programadas=Count('id', filter=Q(estado='pendiente', ejecutar_desde__gt=ahora)),
+        en_curso=Count('id', filter=Q(estado='en_curso')),
+        fallidas=Count('id', filter=Q(estado='fallida')),
+        completadas_ultima_hora=Count('id', filter=ultima_hora),
+        mas_antigua=Min('fecha_creacion', filter=Q(estado='pendiente', ejecutar_desde__lte=ahora)),
+        espera_media=Avg(
+            ExpressionWrapper(F('fecha_inicio') - F('fecha_creacion'), output_field=duracion),
+            filter=ultima_hora
+        ),
+        duracion_media=Avg(
+            ExpressionWrapper(F('fecha_fin') - F('fecha_inicio'), output_field=duracion),
+            filter=ultima_hora
+        ),
+    )
+
+    mas_antigua = datos.pop('mas_antigua')
+    espera_media = datos.pop('espera_media')
+    duracion_media = datos.pop('duracion_media')
+    datos['antiguedad_segundos'] = round((ahora - mas_antigua).total_seconds(), 1) if mas_antigua else 0
+    datos['espera_media_segundos'] = round(espera_media.total_seconds(), 3) if espera_media else 0
+    datos['duracion_media_segundos'] = round(duracion_media.total_seconds(), 3) if duracion_media else 0
+    return datos
+
+
+# Tareas
+
+@tarea('generar_variantes')
+def tarea_generar_variantes(producto_id, forzar=False):
+    """Genera las variantes de la imagen de un producto"""
+    producto = Producto.objects.filter(pk=producto_id).first()
+    if producto is None:
+        # Se borró mientras esperaba en la cola
+        return
+    actualizar_variantes(producto, forzar=forzar, lanzar_errores=True)
+
+
+@tarea('eliminar_imagen')
+def tarea_eliminar_imagen(nombre, variantes=None):
+    """
+    Borra una imagen reemplazada (o de un producto eliminado) y sus
+    variantes, salvo que otro producto la siga usando.
+    """
+    if Producto.objects.filter(imagen=nombre).exists():
+        return
+
+    storage = Producto._meta.get_field('imagen').storage
+    for archivo in [nombre, *archivos_variantes(variantes or {})]:
+        storage.delete(archivo)
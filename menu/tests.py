@@ -1,3 +1,879 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import posixpath
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module, reload
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from menu import catalogo
+from menu import urls as menu_urls
+from menu.bench import sembrar_catalogo, sembrar_pedidos
+from menu.busqueda import filtro_pedidos
+from menu.catalogo import version_catalogo
+from menu.imagenes import actualizar_variantes, archivos_variantes
+from menu.importar import CAMPOS_PRODUCTO, ImportacionError, importar_catalogo
+from menu.models import Categoria, Pedido, Producto, Tarea
+from menu.paginacion import paginar_por_cursor
+from menu.tareas import (
+    DURACION_RESERVA, REGISTRO, ejecutar, espera_reintento, reclamar, recuperar_colgadas, renovar,
+)
+from panel.models import VentaDiariaProducto
+
+
+# Caché local distinta de la del sitio: simula un comando o un worker que
+# corre en otro proceso
+CACHE_OTRO_PROCESO = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'otro-proceso',
+}}
+
+
+async def leer_async(contenido):
+    """Consume el streaming_content async de una respuesta"""
+    return b''.join([parte async for parte in contenido])
+
+
+class PresupuestoConsultasMixin:
+    """
+    Presupuesto de consultas por nombre de URL.
+
+    Cada vista de PRESUPUESTOS se pide con la caché vacía sobre datos de
+    tamaño creciente (TAMANOS: productos y pedidos que se agregan en cada
+    paso; ya el primero ocupa más de una página en todas las listas).
+    Falla si una vista supera su presupuesto o si la cantidad de consultas
+    cambia con el tamaño, como pasa con un N+1. Las URLs de
+    `urls` que no tienen presupuesto tienen que estar en EXCLUIDAS con el
+    motivo, así una vista nueva no queda sin controlar.
+
+    Si un cambio necesita más consultas, subir el presupuesto a propósito
+    en el mismo commit.
+    """
+    urls = None
+    PRESUPUESTOS = {}
+    EXCLUIDAS = {}
+    # Vistas que no responden 200 (por ejemplo, redirigen después de un POST)
+    CODIGOS = {}
+    TAMANOS = [(15, 120), (45, 360)]
+
+    def setUp(self):
+        super().setUp()
+        # La caché (catálogo, métricas) sobrevive al rollback de otros tests
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.productos = []
+        self.pedidos = []
+
+    def sembrar(self, productos, pedidos):
+        """Agrega productos y pedidos hasta llegar al tamaño pedido"""
+        nuevos = sembrar_catalogo(productos=productos - len(self.productos))
+        self.productos += nuevos
+        self.pedidos += sembrar_pedidos(
+            self.productos, cantidad=pedidos - len(self.pedidos), semilla=len(self.pedidos)
+        )
+
+    def preparar(self, nombre):
+        """Datos que necesita la vista `nombre`, creados fuera del conteo"""
+
+    def pedir(self, nombre):
+        """Response de la vista `nombre`; la implementa cada app"""
+        raise NotImplementedError
+
+    def contar_consultas(self, nombre):
+        self.preparar(nombre)
+        cache.clear()
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.pedir(nombre)
+            if response.streaming:
+                # Con MARDEBURGER_ASGI=1 las vistas que transmiten lo hacen
+                # con un iterador async
+                if response.is_async:
+                    async_to_sync(leer_async)(response.streaming_content)
+                else:
+                    b''.join(response.streaming_content)
+        self.assertEqual(
+            response.status_code, self.CODIGOS.get(nombre, 200),
+            f'{nombre} respondió {response.status_code}'
+        )
+        return len(consultas)
+
+    def test_todas_las_urls_tienen_presupuesto(self):
+        nombres = {patron.name for patron in import_module(self.urls).urlpatterns if patron.name}
+        sin_presupuesto = nombres - set(self.PRESUPUESTOS) - set(self.EXCLUIDAS)
+        self.assertEqual(sin_presupuesto, set(), 'Declarar el presupuesto de consultas de estas URLs')
+
+    def test_consultas_dentro_del_presupuesto(self):
+        medidas = {}
+        for productos, pedidos in self.TAMANOS:
+            self.sembrar(productos, pedidos)
+            for nombre, maximo in self.PRESUPUESTOS.items():
+                with self.subTest(vista=nombre, productos=productos, pedidos=pedidos):
+                    consultas = self.contar_consultas(nombre)
+                    medidas.setdefault(nombre, []).append(consultas)
+                    self.assertLessEqual(
+                        consultas, maximo,
+                        f'{nombre} hizo {consultas} consultas (presupuesto: {maximo})'
+                    )
+
+        for nombre, cantidades in medidas.items():
+            with self.subTest(vista=nombre):
+                self.assertEqual(
+                    len(set(cantidades)), 1,
+                    f'{nombre}: las consultas crecen con los datos {cantidades}'
+                )
+
+
+class MenuPresupuestoConsultasTest(PresupuestoConsultasMixin, TestCase):
+    """Sitio público: catálogo, carrito y checkout"""
+    urls = 'menu.urls'
+    PRESUPUESTOS = {
+        # Las vistas del catálogo leen una vez las versiones (VersionCatalogo)
+        'home': 4,
+        'menu': 5,
+        'producto_detail': 5,
+        'pedido_confirmado': 2,
+        'actualizar_carrito': 6,
+        'api_carrito': 3,
+        'api_catalogo': 4,
+        'api_carrito_productos': 4,
+        # Al final: confirma el pedido y vacía el carrito. Incluye el
+        # resumen de ventas con filas nuevas y existentes (ver preparar) y
+        # las palabras de búsqueda del nombre
+        'checkout': 18,
+    }
+    CODIGOS = {'checkout': 302}
+    DATOS_CHECKOUT = {
+        'nombre_cliente': 'Cliente Prueba',
+        'telefono': '2291 123456',
+        'tipo_entrega': 'retiro',
+        'metodo_pago': 'efectivo',
+    }
+
+    def sembrar(self, productos, pedidos):
+        super().sembrar(productos, pedidos)
+        # Un pedido confirmado en la sesión y un carrito que crece con el catálogo
+        self.llenar_carrito()
+        self.client.post(reverse('checkout'), self.DATOS_CHECKOUT)
+        self.llenar_carrito()
+
+    def llenar_carrito(self):
+        for producto in self.productos[:len(self.productos) // 3]:
+            self.client.post(
+                reverse('api_carrito'),
+                json.dumps({'accion': 'agregar', 'producto_id': producto.pk, 'cantidad': 1}),
+                content_type='application/json'
+            )
+
+    def preparar(self, nombre):
+        if nombre == 'checkout':
+            # El resumen de hoy ya tiene fila para todos los productos del
+            # carrito salvo uno: se cuentan el UPDATE de las existentes y el
+            # INSERT de la que falta, siempre igual
+            VentaDiariaProducto.objects.filter(producto=self.productos[0]).delete()
+
+    def pedir(self, nombre):
+        if nombre == 'producto_detail':
+            return self.client.get(reverse(nombre, args=[self.productos[0].pk]))
+        if nombre == 'actualizar_carrito':
+            # Distinto del carrito de la sesión, así siempre se guarda
+            carrito = {str(producto.pk): 2 for producto in self.productos[:len(self.productos) // 3]}
+            return self.client.post(
+                reverse(nombre), json.dumps({'carrito': carrito}), content_type='application/json'
+            )
+        if nombre == 'checkout':
+            return self.client.post(reverse(nombre), self.DATOS_CHECKOUT)
+        if nombre == 'api_carrito_productos':
+            ids = ','.join(str(producto.pk) for producto in self.productos)
+            return self.client.get(reverse(nombre), {'ids': ids})
+        return self.client.get(reverse(nombre))
+
+
+class CarritoProductosApiTest(TestCase):
+    """?ids= viene de la URL pública: lo que no es un id se ignora"""
+
+    def setUp(self):
+        # El catálogo cacheado sobrevive al rollback de cada test
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_ids_invalidos_se_ignoran(self):
+        producto = sembrar_catalogo(productos=1)[0]
+        response = self.client.get(reverse('api_carrito_productos'), {'ids': f'²,abc,-1,,{producto.pk}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['id'] for p in response.json()['productos']], [producto.pk])
+
+
+class CarritoApiTest(TestCase):
+    """Cambios de a uno sobre el carrito de la sesión"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.producto, self.otro = sembrar_catalogo(productos=2)
+
+    def enviar(self, accion, producto, cantidad=1):
+        return self.client.post(
+            reverse('api_carrito'),
+            json.dumps({'accion': accion, 'producto_id': producto.pk, 'cantidad': cantidad}),
+            content_type='application/json',
+        )
+
+    def en_sesion(self):
+        return {item['id']: item['cantidad'] for item in self.client.get(reverse('api_carrito')).json()['items']}
+
+    def test_agregar_suma_unidades(self):
+        self.enviar('agregar', self.producto)
+        response = self.enviar('agregar', self.producto, 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['cantidad'], 3)
+        self.assertEqual(self.en_sesion(), {self.producto.pk: 3})
+
+    def test_quitar_resta_y_elimina_en_cero(self):
+        self.enviar('agregar', self.producto, 2)
+        self.enviar('agregar', self.otro)
+        self.enviar('quitar', self.producto)
+        self.assertEqual(self.en_sesion(), {self.producto.pk: 1, self.otro.pk: 1})
+        self.enviar('quitar', self.producto, 5)
+        self.assertEqual(self.en_sesion(), {self.otro.pk: 1})
+
+    def test_fijar_cantidad_y_cero_elimina(self):
+        self.enviar('fijar', self.producto, 150)
+        self.assertEqual(self.en_sesion(), {self.producto.pk: 99})
+        self.enviar('fijar', self.producto, 0)
+        self.assertEqual(self.en_sesion(), {})
+
+    def test_rechaza_producto_no_disponible(self):
+        Producto.objects.filter(pk=self.otro.pk).update(disponible=False)
+        cache.clear()
+        response = self.enviar('agregar', self.otro)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'El producto no está disponible')
+        self.assertEqual(self.en_sesion(), {})
+
+    def test_rechaza_accion_o_cantidad_invalida(self):
+        self.assertEqual(self.enviar('vaciar', self.producto).status_code, 400)
+        self.assertEqual(self.enviar('agregar', self.producto, -1).status_code, 400)
+        self.assertEqual(self.enviar('agregar', self.producto, 'dos').status_code, 400)
+        self.assertEqual(self.en_sesion(), {})
+
+
+class VistasAsyncTest(TestCase):
+    """
+    Vistas async del catálogo y el carrito, con AsyncClient. menu/urls.py
+    las elige al importarse según DESPLIEGUE_ASGI: se recarga con el
+    ajuste activo (y ROOT_URLCONF, que guarda los patrones ya resueltos),
+    así corren sin MARDEBURGER_ASGI=1.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with override_settings(DESPLIEGUE_ASGI=True):
+            self.recargar_urls()
+        self.addCleanup(self.recargar_urls)
+        self.producto, self.otro = sembrar_catalogo(categorias=1, productos=2)
+
+    def recargar_urls(self):
+        reload(menu_urls)
+        reload(import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    def test_usa_las_vistas_async(self):
+        for nombre, args in (('home', []), ('menu', []), ('producto_detail', [1]), ('api_carrito', [])):
+            with self.subTest(vista=nombre):
+                self.assertTrue(resolve(reverse(nombre, args=args)).func.view_class.view_is_async)
+
+    async def test_paginas_del_catalogo_y_304(self):
+        urls = [reverse('home'), reverse('menu'), reverse('producto_detail', args=[self.producto.pk])]
+        for url in urls:
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertContains(response, self.producto.nombre)
+                response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+                self.assertEqual(response.status_code, 304)
+
+        response = await self.async_client.get(reverse('producto_detail', args=[self.otro.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_carrito(self):
+        response = await self.async_client.post(
+            reverse('api_carrito'),
+            json.dumps({'accion': 'agregar', 'producto_id': self.producto.pk, 'cantidad': 2}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = await self.async_client.get(reverse('api_carrito'))
+        self.assertEqual(
+            [(item['id'], item['cantidad']) for item in response.json()['items']],
+            [(self.producto.pk, 2)]
+        )
+
+        response = await self.async_client.post(
+            reverse('api_carrito'), json.dumps({'accion': 'volar'}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class BusquedaPedidosTest(TestCase):
+    """menu.busqueda.filtro_pedidos, la búsqueda del panel y del admin"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jose = Pedido.objects.create(nombre_cliente='José María Pérez', telefono='2291 123-456', total=0)
+        cls.ana = Pedido.objects.create(nombre_cliente='Ana Perea', telefono='2292 654321', total=0)
+
+    def buscar(self, texto):
+        return set(Pedido.objects.filter(filtro_pedidos(texto)))
+
+    def test_numero_y_telefono(self):
+        self.assertEqual(self.buscar(f'#{self.ana.pk}'), {self.ana})
+        self.assertEqual(self.buscar('2291-12'), {self.jose})
+        self.assertIn(self.ana, self.buscar(str(self.ana.pk)))
+
+    def test_cualquier_palabra_del_nombre(self):
+        self.assertEqual(self.buscar('jose'), {self.jose})
+        self.assertEqual(self.buscar('PEREZ'), {self.jose})
+        self.assertEqual(self.buscar('pere'), {self.jose, self.ana})
+        self.assertEqual(self.buscar('maria per'), {self.jose})
+        self.assertEqual(self.buscar('erez'), set())
+
+    def test_cambio_de_nombre_y_pedidos_sembrados(self):
+        self.ana.nombre_cliente = 'Ana Gómez'
+        self.ana.save()
+        self.assertEqual(self.buscar('perea'), set())
+        self.assertEqual(self.buscar('gomez'), {self.ana})
+
+        self.ana.nombre_cliente = 'Ana Ruiz'
+        self.ana.save(update_fields=['nombre_cliente'])
+        self.assertEqual(self.buscar('ruiz'), {self.ana})
+
+        # bench.sembrar_pedidos usa bulk_create, sin Pedido.save
+        sembrados = sembrar_pedidos(sembrar_catalogo(productos=2), cantidad=5)
+        for pedido in sembrados:
+            self.assertIn(pedido, self.buscar(pedido.nombre_cliente.split()[-1]))
+
+    def test_el_nombre_se_busca_con_indices(self):
+        plan = Pedido.objects.filter(filtro_pedidos('maria perez')).explain()
+        if connection.vendor == 'sqlite':
+            self.assertIn('USING INDEX menu_palabrapedido_palabra', plan)
+            self.assertNotIn('SCAN', plan)
+
+    def test_digitos_unicode_no_rompen_la_busqueda(self):
+        self.assertEqual(self.buscar('²'), set())
+        self.assertEqual(self.buscar('#²'), set())
+
+
+class PaginacionCursorTest(TestCase):
+    """menu.paginacion.paginar_por_cursor, la lista de pedidos del panel"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for numero in range(7):
+            Pedido.objects.create(nombre_cliente=f'Cliente {numero}', telefono='1', total=0)
+        # Tres pedidos con la misma fecha: el id desempata
+        fecha = timezone.now() - timedelta(hours=1)
+        Pedido.objects.filter(pk__in=Pedido.objects.values('pk')[2:5]).update(fecha=fecha)
+        cls.orden = list(Pedido.objects.order_by('-fecha', '-id'))
+
+    def paginar(self, cursor=None, anterior=False):
+        return paginar_por_cursor(Pedido.objects.all(), cursor, anterior=anterior, tamano=3)
+
+    def test_recorre_todo_sin_repetir_con_fechas_iguales(self):
+        paginas = [self.paginar()]
+        while paginas[-1].has_next():
+            paginas.append(self.paginar(paginas[-1].siguiente))
+
+        self.assertEqual([len(pagina) for pagina in paginas], [3, 3, 1])
+        self.assertEqual([pedido for pagina in paginas for pedido in pagina], self.orden)
+        self.assertFalse(paginas[0].has_previous())
+        self.assertTrue(paginas[-1].has_previous())
+
+    def test_volver_hacia_atras(self):
+        primera = self.paginar()
+        segunda = self.paginar(primera.siguiente)
+        tercera = self.paginar(segunda.siguiente)
+
+        atras = self.paginar(tercera.anterior, anterior=True)
+        self.assertEqual(list(atras), list(segunda))
+        self.assertTrue(atras.has_next() and atras.has_previous())
+
+        atras = self.paginar(atras.anterior, anterior=True)
+        self.assertEqual(list(atras), list(primera))
+        self.assertFalse(atras.has_previous())
+        self.assertEqual(list(self.paginar(atras.siguiente)), list(segunda))
+
+    def test_cursor_invalido_da_la_primera_pagina(self):
+        primera = list(self.paginar())
+        for cursor in ('basura', '!!!', '4pyT', 'eHx5', 'bm8tZXMtZmVjaGF8MQ'):
+            with self.subTest(cursor=cursor):
+                pagina = self.paginar(cursor, anterior=True)
+                self.assertEqual(list(pagina), primera)
+                self.assertFalse(pagina.has_previous())
+
+
+class InvalidarCatalogoTest(TestCase):
+    """La versión del catálogo cambia recién cuando se confirma la transacción"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_invalida_despues_del_commit(self):
+        producto = sembrar_catalogo(productos=1)[0]
+        antes = version_catalogo()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            producto.precio += 100
+            producto.save()
+            producto.categoria.save()
+            self.assertEqual(version_catalogo(), antes)
+        self.assertEqual(len(callbacks), 2)
+        self.assertNotEqual(version_catalogo(), antes)
+
+    def test_cambio_desde_otro_proceso(self):
+        """Un comando o worker con su propia caché local invalida la del sitio"""
+        producto = sembrar_catalogo(productos=1)[0]
+        producto.refresh_from_db()
+        response = self.client.get(reverse('api_catalogo'))
+        self.assertEqual(response.json()['productos'][0]['precio'], str(producto.precio))
+        etag = response['ETag']
+
+        with override_settings(CACHES=CACHE_OTRO_PROCESO), self.captureOnCommitCallbacks(execute=True):
+            producto.precio = Decimal('12345.00')
+            producto.save()
+
+        response = self.client.get(reverse('api_catalogo'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['productos'][0]['precio'], '12345.00')
+
+
+class FragmentosMenuTest(TestCase):
+    """Cada sección del menú se vuelve a renderizar solo si cambió su categoría"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.productos = sembrar_catalogo(categorias=3, productos=6)
+        self.client.get(reverse('menu'))
+
+    def renderizadas(self):
+        """Categorías cuyas secciones se renderizan al pedir el menú"""
+        with mock.patch('menu.catalogo.render_to_string', wraps=catalogo.render_to_string) as render:
+            response = self.client.get(reverse('menu'))
+        self.assertEqual(response.status_code, 200)
+        return [llamada.args[1]['categoria'].pk for llamada in render.call_args_list], response
+
+    def test_sin_cambios_no_renderiza(self):
+        self.assertEqual(self.renderizadas()[0], [])
+
+    def test_guardar_un_producto_renderiza_solo_su_categoria(self):
+        producto = self.productos[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.nombre = 'Hamburguesa nueva'
+            producto.save()
+
+        categorias, response = self.renderizadas()
+        self.assertEqual(categorias, [producto.categoria_id])
+        self.assertContains(response, 'Hamburguesa nueva')
+        self.assertContains(response, self.productos[1].nombre)
+
+    def test_guardar_una_categoria_renderiza_solo_esa(self):
+        categoria = self.productos[2].categoria
+        with self.captureOnCommitCallbacks(execute=True):
+            categoria.descripcion = 'Nueva descripción'
+            categoria.save()
+
+        self.assertEqual(self.renderizadas()[0], [categoria.pk])
+
+
+class ValidacionCondicionalTest(TestCase):
+    """Las páginas del catálogo responden 304 mientras no cambie nada"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.producto = sembrar_catalogo(categorias=2, productos=4)[0]
+        # Last-Modified tiene resolución de segundos: el catálogo sembrado
+        # queda una hora atrás para que el cambio del test se note
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        Producto.objects.update(fecha_actualizacion=hace_una_hora)
+        Categoria.objects.update(fecha_actualizacion=hace_una_hora)
+        self.urls = [
+            reverse('home'), reverse('menu'), reverse('api_catalogo'),
+            reverse('producto_detail', args=[self.producto.pk]),
+        ]
+
+    def validadores(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        return response['ETag'], response['Last-Modified']
+
+    def test_304_con_if_none_match_o_if_modified_since(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag, modificado = self.validadores(url)
+                for encabezados in ({'HTTP_IF_NONE_MATCH': etag}, {'HTTP_IF_MODIFIED_SINCE': modificado}):
+                    response = self.client.get(url, **encabezados)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.content, b'')
+
+    def test_cada_pagina_tiene_su_etag(self):
+        etags = {self.validadores(url)[0] for url in self.urls}
+        self.assertEqual(len(etags), len(self.urls))
+
+    def test_200_despues_de_un_cambio(self):
+        antes = {url: self.validadores(url) for url in self.urls}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.precio += 100
+            self.producto.save()
+
+        for url, (etag, modificado) in antes.items():
+            with self.subTest(url=url):
+                for encabezados in ({'HTTP_IF_NONE_MATCH': etag}, {'HTTP_IF_MODIFIED_SINCE': modificado}):
+                    response = self.client.get(url, **encabezados)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertNotEqual(response['ETag'], etag)
+
+    def test_eliminar_cambia_el_etag(self):
+        url = reverse('api_catalogo')
+        etag, _ = self.validadores(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.exclude(pk=self.producto.pk).first().delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ImportarCatalogoTest(TestCase):
+    """menu.importar y el comando importar_catalogo"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.categoria = Categoria.objects.create(nombre='Hamburguesas', orden=1)
+        self.producto = Producto.objects.create(
+            nombre='Clásica', descripcion='Carne y queso', precio=Decimal('5000'),
+            categoria=self.categoria, imagen='productos/clasica.jpg'
+        )
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = Path(directorio.name)
+
+    def escribir_csv(self, filas):
+        ruta = self.directorio / 'catalogo.csv'
+        with open(ruta, 'w', encoding='utf-8', newline='') as archivo:
+            escritor = csv.DictWriter(archivo, fieldnames=['id', *CAMPOS_PRODUCTO])
+            escritor.writeheader()
+            escritor.writerows(filas)
+        return ruta
+
+    def importar(self, ruta, *opciones):
+        salida = io.StringIO()
+        call_command('importar_catalogo', str(ruta), *opciones, stdout=salida, stderr=io.StringIO())
+        return salida.getvalue()
+
+    def test_crea_y_actualiza(self):
+        ruta = self.escribir_csv([
+            {'id': self.producto.pk, 'precio': '5.500,50'},
+            {'nombre': 'Papas', 'categoria': 'Acompañamientos', 'precio': '2500',
+             'imagen': 'productos/papas.jpg', 'disponible': 'no'},
+        ])
+        salida = self.importar(ruta)
+
+        self.assertIn('1 productos nuevos, 1 modificados', salida)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.precio, Decimal('5500.50'))
+        self.assertEqual(self.producto.nombre, 'Clásica')
+        papas = Producto.objects.get(nombre='Papas')
+        self.assertEqual(papas.categoria.nombre, 'Acompañamientos')
+        self.assertFalse(papas.disponible)
+        self.assertEqual(papas.imagen.name, 'productos/papas.jpg')
+
+    def test_el_sitio_ve_la_importacion(self):
+        """El comando corre en otro proceso, con otra caché local que la del sitio"""
+        self.assertEqual(self.client.get(reverse('api_catalogo')).json()['productos'][0]['precio'], '5000.00')
+
+        ruta = self.escribir_csv([{'id': self.producto.pk, 'precio': '12345'}])
+        with override_settings(CACHES=CACHE_OTRO_PROCESO):
+            self.importar(ruta)
+
+        self.assertEqual(self.client.get(reverse('api_catalogo')).json()['productos'][0]['precio'], '12345.00')
+
+    def test_dry_run_no_guarda(self):
+        ruta = self.escribir_csv([
+            {'id': self.producto.pk, 'precio': '9999'},
+            {'nombre': 'Papas', 'categoria': 'Acompañamientos', 'precio': '2500', 'imagen': 'productos/papas.jpg'},
+        ])
+        salida = self.importar(ruta, '--dry-run')
+
+        self.assertIn('Prueba (no se guardó nada)', salida)
+        self.assertIn('precio 5000.00 → 9999.00', salida)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.precio, Decimal('5000'))
+        self.assertFalse(Producto.objects.filter(nombre='Papas').exists())
+        self.assertFalse(Categoria.objects.filter(nombre='Acompañamientos').exists())
+
+    def test_plantilla_ida_y_vuelta_sin_cambios(self):
+        ruta = self.directorio / 'plantilla.csv'
+        self.importar(ruta, '--plantilla')
+        salida = self.importar(ruta)
+        self.assertIn('0 productos nuevos, 0 modificados, 1 sin cambios', salida)
+
+    def test_filas_invalidas_no_guardan_nada(self):
+        filas = [
+            {'id': self.producto.pk, 'precio': '9999'},
+            {'id': self.producto.pk + 100, 'precio': '1'},
+            {'nombre': 'Sin imagen', 'categoria': self.categoria.pk, 'precio': '100'},
+            {'nombre': 'Precio raro', 'categoria': '²', 'precio': 'mucho', 'imagen': 'productos/x.jpg'},
+            {'nombre': 'Otra', 'categoria': 'Hamburguesas', 'precio': '100', 'imagen': 'x.jpg', 'destacado': 'quizás'},
+        ]
+        with self.assertRaises(ImportacionError) as contexto:
+            importar_catalogo([], filas)
+
+        errores = contexto.exception.errores
+        self.assertEqual(len(errores), 4)
+        self.assertIn(f'Fila 2: no existe el id {self.producto.pk + 100}', errores)
+        self.assertIn('Fila 3: para crear un producto falta imagen', errores)
+        self.assertIn('Fila 4: precio inválido (mucho)', errores)
+        self.assertIn('Fila 5: destacado inválido (quizás)', errores)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.precio, Decimal('5000'))
+        self.assertEqual(Producto.objects.count(), 1)
+
+
+class MediaTemporalMixin:
+    """MEDIA_ROOT en un directorio temporal y una categoría para los productos"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.media = Path(directorio.name)
+        ajuste = override_settings(MEDIA_ROOT=directorio.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        self.storage = Producto._meta.get_field('imagen').storage
+        self.categoria = Categoria.objects.create(nombre='Hamburguesas')
+
+    def producto(self, imagen, **datos):
+        return Producto.objects.create(
+            nombre=imagen, descripcion='', precio=1000, categoria=self.categoria, imagen=imagen, **datos
+        )
+
+
+class LimpiarMediaTest(MediaTemporalMixin, TestCase):
+    """Almacenamiento por contenido y limpiar_media"""
+
+    def archivo(self, nombre, contenido=b'imagen'):
+        ruta = self.media / nombre
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        ruta.write_bytes(contenido)
+        return nombre
+
+    def limpiar(self, *opciones):
+        call_command('limpiar_media', *opciones, stdout=io.StringIO())
+
+    def archivos(self):
+        return {str(ruta.relative_to(self.media)) for ruta in self.media.rglob('*') if ruta.is_file()}
+
+    def test_nombre_por_hash_y_copias_unicas(self):
+        nombre = self.storage.save('productos/burger.JPG', ContentFile(b'uno'))
+        self.assertEqual(nombre, f'productos/{hashlib.sha256(b"uno").hexdigest()[:32]}.jpg')
+        self.assertEqual(self.storage.save('productos/otra.jpg', ContentFile(b'uno')), nombre)
+        self.assertNotEqual(self.storage.save('productos/otra.jpg', ContentFile(b'dos')), nombre)
+        self.assertEqual(len(self.archivos()), 2)
+
+    def test_borra_huerfanos_y_conserva_referenciados(self):
+        imagen = self.storage.save('productos/burger.jpg', ContentFile(b'uno'))
+        variante = self.archivo('productos/variantes/burger_160.jpg')
+        self.producto(imagen, imagen_variantes={'origen': imagen, 'jpeg': {'160': variante}})
+        self.archivo('productos/vieja.jpg')
+        self.archivo('productos/variantes/vieja_160.jpg')
+
+        self.limpiar('--dry-run', '--minutos', '0')
+        self.assertEqual(len(self.archivos()), 4)
+
+        # Con el margen por defecto no se tocan los archivos recién subidos
+        self.limpiar()
+        self.assertEqual(len(self.archivos()), 4)
+
+        self.limpiar('--minutos', '0')
+        self.assertEqual(self.archivos(), {imagen, variante})
+
+    def test_deduplicar(self):
+        primero = self.producto(self.archivo('productos/a.jpg', b'misma'))
+        segundo = self.producto(self.archivo('productos/b.jpg', b'misma'))
+        self.assertEqual(self.client.get(reverse('api_catalogo')).json()['productos'][0]['imagen'], '/media/productos/a.jpg')
+
+        with override_settings(CACHES=CACHE_OTRO_PROCESO):
+            self.limpiar('--deduplicar', '--minutos', '0')
+
+        primero.refresh_from_db()
+        segundo.refresh_from_db()
+        nuevo = f'productos/{hashlib.sha256(b"misma").hexdigest()[:32]}.jpg'
+        self.assertEqual((primero.imagen.name, segundo.imagen.name), (nuevo, nuevo))
+        # El sitio ve el nombre nuevo; los viejos se borran en la próxima pasada
+        self.assertEqual(self.client.get(reverse('api_catalogo')).json()['productos'][0]['imagen'], f'/media/{nuevo}')
+        self.assertEqual(self.archivos(), {nuevo, 'productos/a.jpg', 'productos/b.jpg'})
+        self.limpiar('--minutos', '0')
+        self.assertEqual(self.archivos(), {nuevo})
+
+
+class VariantesImagenTest(MediaTemporalMixin, TestCase):
+    """menu.imagenes: variantes con nombre derivado de la original y srcset"""
+
+    def setUp(self):
+        super().setUp()
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 300), 'red').save(buffer, format='JPEG')
+        self.imagen = self.storage.save('productos/burger.jpg', ContentFile(buffer.getvalue()))
+        self.base = posixpath.splitext(posixpath.basename(self.imagen))[0]
+
+    def test_nombres_y_srcset(self):
+        producto = self.producto(self.imagen)
+        self.assertTrue(actualizar_variantes(producto))
+
+        producto.refresh_from_db()
+        self.assertEqual(producto.imagen_variantes['origen'], self.imagen)
+        self.assertEqual(producto.imagen_variantes['webp'], {
+            '160': f'productos/variantes/{self.base}_160.webp',
+            '320': f'productos/variantes/{self.base}_320.webp',
+        })
+        for nombre in archivos_variantes(producto.imagen_variantes):
+            self.assertTrue(self.storage.exists(nombre), nombre)
+        self.assertEqual(
+            producto.srcset_jpeg,
+            f'/media/productos/variantes/{self.base}_160.jpg 160w, /media/productos/variantes/{self.base}_320.jpg 320w'
+        )
+        self.assertEqual(producto.miniatura_url, f'/media/productos/variantes/{self.base}_160.jpg')
+
+    def test_regenerar_reemplaza_las_variantes(self):
+        producto = self.producto(self.imagen)
+        actualizar_variantes(producto)
+        antes = set(archivos_variantes(producto.imagen_variantes))
+
+        actualizar_variantes(producto, forzar=True)
+        self.assertEqual(set(archivos_variantes(producto.imagen_variantes)), antes)
+        en_disco = {str(ruta.relative_to(self.media)) for ruta in (self.media / 'productos' / 'variantes').iterdir()}
+        self.assertEqual(en_disco, antes)
+
+
+class ColaTareasTest(TestCase):
+    """menu.tareas: reintentos con espera, intentos agotados y reservas vencidas"""
+
+    def setUp(self):
+        self.llamadas = []
+        registro = mock.patch.dict(REGISTRO, {'prueba': self.tarea_prueba})
+        registro.start()
+        self.addCleanup(registro.stop)
+
+    def tarea_prueba(self, falla=False):
+        self.llamadas.append(falla)
+        if falla:
+            raise RuntimeError('falló')
+
+    def encolar(self, **argumentos):
+        return Tarea.objects.create(nombre='prueba', argumentos=argumentos, max_intentos=2)
+
+    def test_completa(self):
+        tarea = self.encolar()
+        self.assertEqual(reclamar(), [tarea.pk])
+        self.assertTrue(ejecutar(tarea.pk))
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ('completada', 1))
+
+    def test_espera_exponencial_con_tope(self):
+        with mock.patch('menu.tareas.random.uniform', return_value=1.0):
+            self.assertEqual([espera_reintento(n) for n in (1, 2, 3)], [30, 60, 120])
+            self.assertEqual(espera_reintento(20), 60 * 60)
+
+    def test_reintenta_con_espera_y_falla_al_agotar_intentos(self):
+        tarea = self.encolar(falla=True)
+        reclamar()
+        antes = timezone.now()
+        self.assertFalse(ejecutar(tarea.pk))
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ('pendiente', 1))
+        self.assertIn('RuntimeError', tarea.error)
+        espera = (tarea.ejecutar_desde - antes).total_seconds()
+        self.assertTrue(26 < espera < 34, espera)
+        # No se vuelve a tomar antes de la espera
+        self.assertEqual(reclamar(), [])
+
+        Tarea.objects.filter(pk=tarea.pk).update(ejecutar_desde=timezone.now())
+        reclamar()
+        self.assertFalse(ejecutar(tarea.pk))
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ('fallida', 2))
+        self.assertEqual(len(self.llamadas), 2)
+
+    def test_tarea_desconocida_falla_sin_reintentos(self):
+        tarea = Tarea.objects.create(nombre='no_existe')
+        reclamar()
+        self.assertFalse(ejecutar(tarea.pk))
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, 'fallida')
+
+    def test_recupera_solo_reservas_vencidas(self):
+        viva, vencida, agotada = self.encolar(), self.encolar(), self.encolar()
+        reclamar(3)
+        Tarea.objects.filter(pk=agotada.pk).update(intentos=2)
+        Tarea.objects.filter(pk__in=[vencida.pk, agotada.pk]).update(
+            reservada_hasta=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(recuperar_colgadas(), 2)
+        estados = dict(Tarea.objects.values_list('pk', 'estado'))
+        self.assertEqual(estados, {viva.pk: 'en_curso', vencida.pk: 'pendiente', agotada.pk: 'fallida'})
+
+    def test_renovar_extiende_la_reserva(self):
+        tarea = self.encolar()
+        reclamar()
+        Tarea.objects.filter(pk=tarea.pk).update(reservada_hasta=timezone.now() + timedelta(seconds=5))
+        self.assertEqual(renovar([tarea.pk]), 1)
+        tarea.refresh_from_db()
+        self.assertGreater(tarea.reservada_hasta, timezone.now() + timedelta(seconds=DURACION_RESERVA - 5))
+        self.assertEqual(recuperar_colgadas(), 0)
+
+    def test_intento_recuperado_no_pisa_al_nuevo(self):
+        tarea = self.encolar()
+
+        def reclamada_por_otro():
+            # Mientras corre, la reserva vence y otro worker la vuelve a tomar
+            Tarea.objects.filter(pk=tarea.pk).update(reservada_hasta=timezone.now() - timedelta(seconds=1))
+            recuperar_colgadas()
+            reclamar()
+
+        reclamar()
+        with mock.patch.dict(REGISTRO, {'prueba': reclamada_por_otro}):
+            self.assertTrue(ejecutar(tarea.pk))
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ('en_curso', 2))
+
+    @override_settings(TAREAS_SINCRONICAS=False)
+    def test_reemplazar_o_borrar_la_imagen_encola_el_borrado(self):
+        producto = sembrar_catalogo(categorias=1, productos=1)[0]
+        producto.imagen = 'productos/nueva.jpg'
+        producto.save()
+        Producto.objects.get(pk=producto.pk).delete()
+
+        self.assertEqual(
+            [t.argumentos['nombre'] for t in Tarea.objects.filter(nombre='eliminar_imagen').order_by('pk')],
+            ['productos/bench.jpg', 'productos/nueva.jpg']
+        )
@@ -1,11 +1,21 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# En el despliegue ASGI las páginas del catálogo y la API del carrito usan
+# las vistas async (settings.DESPLIEGUE_ASGI, variable MARDEBURGER_ASGI)
+if settings.DESPLIEGUE_ASGI:
+    HomeView, MenuView = views.HomeAsyncView, views.MenuAsyncView
+    ProductoDetailView, CarritoApiView = views.ProductoDetailAsyncView, views.CarritoApiAsyncView
+else:
+    HomeView, MenuView = views.HomeView, views.MenuView
+    ProductoDetailView, CarritoApiView = views.ProductoDetailView, views.CarritoApiView
+
 urlpatterns = [
     # Páginas principales
-    path('', views.HomeView.as_view(), name='home'),
-    path('menu/', views.MenuView.as_view(), name='menu'),
-    path('producto/<int:pk>/', views.ProductoDetailView.as_view(), name='producto_detail'),
+    path('', HomeView.as_view(), name='home'),
+    path('menu/', MenuView.as_view(), name='menu'),
+    path('producto/<int:pk>/', ProductoDetailView.as_view(), name='producto_detail'),
 
     # Proceso de compra
     path('checkout/', views.CheckoutView.as_view(), name='checkout'),
@@ -13,4 +23,7 @@ urlpatterns = [
 
      # API endpoints
     path('api/actualizar-carrito/', views.ActualizarCarritoView.as_view(), name='actualizar_carrito'),
+    path('api/carrito/', CarritoApiView.as_view(), name='api_carrito'),
+    path('api/catalogo/', views.CatalogoApiView.as_view(), name='api_catalogo'),
+    path('api/carrito/productos/', views.CarritoProductosApiView.as_view(), name='api_carrito_productos'),
 ]
\ No newline at end of file
@@ -1,45 +1,91 @@
-from django.views.generic import TemplateView, ListView, DetailView, FormView
+from django.views.generic import TemplateView, DetailView, FormView
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.views import View
-from .models import Producto, Categoria, Pedido, ItemPedido
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import condition
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from .models import Producto, Pedido
 from .forms import PedidoForm
+from .services import crear_pedido, CarritoInvalidoError
+from .carrito import Carrito
+from . import catalogo
+import hashlib
 import json
 import urllib.parse
 
+
+def etag_catalogo(request, *args, **kwargs):
+    """ETag de las páginas públicas: cambia con cualquier cambio del catálogo"""
+    if 'pk' in kwargs:
+        try:
+            catalogo.producto(kwargs['pk'])
+        except Http404:
+            return None
+    return etag_pagina(request, catalogo.marca_catalogo())
+
+
+def etag_pagina(request, marca):
+    # La ruta completa incluye la query string (ej. ?ids= de la API)
+    pagina = hashlib.md5(request.get_full_path().encode()).hexdigest()[:12]
+    return f"{marca['etag']}-{pagina}"
+
+
+def ultima_modificacion_catalogo(request, *args, **kwargs):
+    """Fecha de la última modificación de productos o categorías"""
+    return catalogo.marca_catalogo()['modificado']
+
+
+# Las páginas del catálogo responden 304 sin renderizar si no cambió nada.
+# no-cache obliga al navegador a revalidar siempre (nunca usa una copia vieja)
+validar_catalogo = [
+    cache_control(no_cache=True),
+    condition(etag_func=etag_catalogo, last_modified_func=ultima_modificacion_catalogo),
+]
+
+
+@method_decorator(validar_catalogo, name='get')
 class HomeView(TemplateView):
     """Vista principal del sitio"""
     template_name = 'menu/home.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['destacados'] = Producto.objects.filter(
-            destacado=True, 
-            disponible=True
-        )[:4]
+        context['destacados'] = catalogo.destacados()
         return context
     
-class MenuView(ListView):
+@method_decorator(validar_catalogo, name='get')
+class MenuView(TemplateView):
     """Vista del menú completo con todos los productos"""
-    model = Producto
     template_name = 'menu/menu.html'
-    context_object_name = 'productos'
-    
-    def get_queryset(self):
-        return Producto.objects.filter(disponible=True).select_related('categoria')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categorias'] = Categoria.objects.all()
+        context['categorias'] = catalogo.categorias()
+        # Secciones por categoría ya renderizadas (cacheadas)
+        context['secciones'] = catalogo.secciones_menu()
         return context
 
 
+@method_decorator(validar_catalogo, name='get')
 class ProductoDetailView(DetailView):
     """Vista de detalle de un producto específico"""
     model = Producto
     template_name = 'menu/producto_detail.html'
     context_object_name = 'producto'
+    
+    def get_object(self, queryset=None):
+        self.detalle = catalogo.producto(self.kwargs['pk'])
+        return self.detalle['producto']
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['relacionados'] = self.detalle['relacionados']
+        return context
 
 
 class CheckoutView(FormView):
@@ -48,55 +94,29 @@ class CheckoutView(FormView):
     form_class = PedidoForm
     success_url = reverse_lazy('pedido_confirmado')
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['productos'] = Producto.objects.all()
-        return context
-    
     def form_valid(self, form):
         # Obtener carrito de la sesión
-        carrito = self.request.session.get('carrito', {})
+        carrito = Carrito(self.request.session)
         
-        if not carrito:
+        if not carrito.items:
             return redirect('menu')
         
-        # Guardar el pedido
+        # Guardar el pedido y sus items en una sola transacción
         pedido = form.save(commit=False)
         
-        # Calcular total y crear items
-        total = 0
-        items_data = []
-        
-        for producto_id, cantidad in carrito.items():
-            try:
-                producto = Producto.objects.get(id=producto_id)
-                subtotal = producto.precio * cantidad
-                total += subtotal
-                items_data.append({
-                    'producto': producto,
-                    'cantidad': cantidad,
-                    'precio': producto.precio
-                })
-            except Producto.DoesNotExist:
-                continue
-        
-        pedido.total = total
-        pedido.save()
-        
-        # Crear items del pedido
-        for item in items_data:
-            ItemPedido.objects.create(
-                pedido=pedido,
-                producto=item['producto'],
-                cantidad=item['cantidad'],
-                precio_unitario=item['precio']
-            )
+        try:
+            crear_pedido(pedido, carrito.items)
+        except CarritoInvalidoError as error:
+            for mensaje in error.errores:
+                form.add_error(None, mensaje)
+            return self.form_invalid(form)
         
         # Guardar ID del pedido en sesión
         self.request.session['ultimo_pedido'] = pedido.id
         
         # Limpiar carrito
-        self.request.session['carrito'] = {}
+        carrito.vaciar()
+        carrito.guardar()
         
         return super().form_valid(form)
 
@@ -116,8 +136,8 @@ class PedidoConfirmadoView(TemplateView):
                 
                 # Generar mensaje para WhatsApp
                 items = "\n".join([
-                    f"• {item.cantidad}x {item.producto.nombre} (${item.precio_unitario})"
-                    for item in pedido.items.all()
+                    f"• {linea['cantidad']}x {linea['producto']} (${linea['precio_unitario']})"
+                    for linea in pedido.resumen_items
                 ])
                 
                 mensaje = f"""¡Hola! Quiero confirmar mi pedido #{pedido.id}:
@@ -148,12 +168,177 @@ class PedidoConfirmadoView(TemplateView):
 
 
 class ActualizarCarritoView(View):
-    """API para actualizar el carrito en la sesión"""
+    """
+    API para reemplazar el carrito completo en la sesión. El sitio ya no la
+    usa (pisa los cambios de otros requests: ver CarritoApiView); queda
+    para las páginas de checkout que los navegadores tengan abiertas.
+    """
     def post(self, request):
         try:
             data = json.loads(request.body)
-            carrito = data.get('carrito', {})
-            request.session['carrito'] = carrito
+            carrito = Carrito(request.session)
+            carrito.reemplazar(data.get('carrito', {}))
+            carrito.guardar()
             return JsonResponse({'success': True})
-        except:
+        except (ValueError, TypeError, AttributeError):
             return JsonResponse({'success': False}, status=400)
+
+
+@method_decorator(ensure_csrf_cookie, name='get')
+class CarritoApiView(View):
+    """
+    API del carrito con precios calculados en el servidor.
+
+    GET devuelve el carrito actual. POST aplica un único cambio
+    {"accion": "agregar" | "quitar" | "fijar", "producto_id": 1, "cantidad": 2}
+    y devuelve el carrito resultante.
+
+    Cada POST lee la sesión, la modifica y la guarda entera: dos POST
+    simultáneos de la misma sesión se pisarían (y con la sesión en cookie
+    no hay forma de bloquearla en el servidor). Por eso el navegador
+    manda los cambios de a uno, esperando cada respuesta (base.html).
+    """
+    ACCIONES = {
+        'agregar': Carrito.agregar,
+        'quitar': Carrito.quitar,
+        'fijar': Carrito.fijar,
+    }
+    
+    def get(self, request):
+        return JsonResponse({'success': True, **Carrito(request.session).resumen()})
+    
+    def post(self, request):
+        try:
+            data = json.loads(request.body)
+            accion = self.ACCIONES[data['accion']]
+        except (ValueError, TypeError, KeyError):
+            return JsonResponse({'success': False, 'error': 'Acción inválida'}, status=400)
+        
+        carrito = Carrito(request.session)
+        try:
+            accion(carrito, data.get('producto_id'), data.get('cantidad', 1))
+        except ValueError as error:
+            return JsonResponse({'success': False, 'error': str(error)}, status=400)
+        
+        carrito.guardar()
+        return JsonResponse({'success': True, **carrito.resumen()})
+
+
+# Máximo de productos por consulta a la API del carrito
+MAX_IDS_CARRITO = 100
+
+
+@method_decorator(validar_catalogo, name='get')
+class CatalogoApiView(View):
+    """API con los productos disponibles (id, nombre, precio e imagen)"""
+    def get(self, request):
+        return JsonResponse(
+            {'productos': list(catalogo.productos_api().values())},
+            json_dumps_params={'separators': (',', ':')}
+        )
+
+
+@method_decorator(validar_catalogo, name='get')
+class CarritoProductosApiView(View):
+    """API que devuelve solo los productos pedidos en ?ids=1,2,3"""
+    def get(self, request):
+        ids = []
+        for valor in request.GET.get('ids', '').split(','):
+            if valor.strip().isdecimal():
+                ids.append(int(valor))
+        
+        productos = catalogo.productos_api()
+        return JsonResponse(
+            {'productos': [productos[i] for i in ids[:MAX_IDS_CARRITO] if i in productos]},
+            json_dumps_params={'separators': (',', ':')}
+        )
+
+
+# ============================================
+# VISTAS ASYNC (despliegue ASGI, MARDEBURGER_ASGI=1)
+# ============================================
+# Las mismas páginas del catálogo y la API del carrito, con la caché y el
+# ORM async (menu.catalogo.a*). menu/urls.py las usa en lugar de las
+# sincrónicas cuando settings.DESPLIEGUE_ASGI está activo.
+
+class CatalogoAsyncMixin:
+    """
+    Equivalente async de validar_catalogo: responde 304 si el ETag o la
+    fecha coinciden y, si no, renderiza con responder().
+    """
+    async def get(self, request, *args, **kwargs):
+        if 'pk' in kwargs:
+            # 404 antes de calcular validadores, como etag_catalogo
+            await catalogo.aproducto(kwargs['pk'])
+
+        marca = await catalogo.amarca_catalogo()
+        etag = quote_etag(etag_pagina(request, marca))
+        modificado = int(marca['modificado'].timestamp()) if marca['modificado'] else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=modificado)
+        if response is None:
+            response = await self.responder(request, *args, **kwargs)
+            if modificado and not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(modificado)
+            response.headers.setdefault('ETag', etag)
+
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class HomeAsyncView(CatalogoAsyncMixin, TemplateView):
+    """HomeView con consultas async"""
+    template_name = 'menu/home.html'
+    
+    async def responder(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        context['destacados'] = await catalogo.adestacados()
+        return self.render_to_response(context)
+
+
+class MenuAsyncView(CatalogoAsyncMixin, TemplateView):
+    """MenuView con consultas async"""
+    template_name = 'menu/menu.html'
+    
+    async def responder(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        context['categorias'] = await catalogo.acategorias()
+        context['secciones'] = await catalogo.asecciones_menu()
+        return self.render_to_response(context)
+
+
+class ProductoDetailAsyncView(CatalogoAsyncMixin, TemplateView):
+    """ProductoDetailView con consultas async"""
+    template_name = 'menu/producto_detail.html'
+    
+    async def responder(self, request, *args, **kwargs):
+        detalle = await catalogo.aproducto(kwargs['pk'])
+        context = self.get_context_data(**kwargs)
+        context['producto'] = context['object'] = detalle['producto']
+        context['relacionados'] = detalle['relacionados']
+        return self.render_to_response(context)
+
+
+@method_decorator(ensure_csrf_cookie, name='get')
+class CarritoApiAsyncView(CarritoApiView):
+    """CarritoApiView con la sesión y el catálogo cargados de forma async"""
+    
+    async def get(self, request):
+        carrito = await Carrito.acargar(request.session)
+        return JsonResponse({'success': True, **carrito.resumen()})
+    
+    async def post(self, request):
+        try:
+            data = json.loads(request.body)
+            accion = self.ACCIONES[data['accion']]
+        except (ValueError, TypeError, KeyError):
+            return JsonResponse({'success': False, 'error': 'Acción inválida'}, status=400)
+        
+        carrito = await Carrito.acargar(request.session)
+        try:
+            accion(carrito, data.get('producto_id'), data.get('cantidad', 1))
+        except ValueError as error:
+            return JsonResponse({'success': False, 'error': str(error)}, status=400)
+        
+        carrito.guardar()
+        return JsonResponse({'success': True, **carrito.resumen()})
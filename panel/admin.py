@@ -1,3 +1,30 @@
 from django.contrib import admin
+from .models import VentaDiaria, VentaDiariaProducto
 
-# Register your models here.
+
+@admin.register(VentaDiaria)
+class VentaDiariaAdmin(admin.ModelAdmin):
+    """Resumen diario de ventas (solo lectura, lo mantiene panel.ventas)"""
+    list_display = ['fecha', 'metodo_pago', 'tipo_entrega', 'pedidos', 'ingresos']
+    list_filter = ['metodo_pago', 'tipo_entrega']
+    date_hierarchy = 'fecha'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(VentaDiariaProducto)
+class VentaDiariaProductoAdmin(admin.ModelAdmin):
+    """Resumen diario por producto (solo lectura, lo mantiene panel.ventas)"""
+    list_display = ['fecha', 'nombre_producto', 'cantidad', 'ingresos']
+    search_fields = ['nombre_producto']
+    date_hierarchy = 'fecha'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,162 @@
+"""
+Avisos en vivo para el panel (server-sent events en /panel/eventos/):
+
+    event: pedido        un pedido nuevo (datos en JSON)
+    event: actualizado   cambió algún pedido (estado, cancelación, admin)
+
+El id de cada evento es "último pedido:versión de la lista" (menu.pedidos).
+Si se corta la conexión el navegador se reconecta solo y lo manda en
+Last-Event-ID, así que no se pierden pedidos ni cambios.
+
+Con WSGI cada worker atiende un request a la vez, así que una conexión
+abierta por pantalla los agotaría (y con ellos el checkout). Por eso
+sondeo_pedidos responde enseguida con lo pendiente y cierra: el navegador
+vuelve a pedir a los SONDEO segundos (campo retry). Cada vuelta es una
+consulta por la clave primaria.
+
+Con ASGI (settings.DESPLIEGUE_ASGI) aeventos_pedidos mantiene la conexión
+abierta: espera con asyncio sin ocupar un hilo, mira en la caché el último
+pedido y la versión una vez por segundo y solo consulta la base de datos
+cuando cambian. Con la caché por defecto (LocMemCache) cada proceso tiene
+la suya: por eso cada CONSULTA_BASE segundos también se mira el último id
+en la base. La conexión se cierra sola a los DURACION segundos.
+"""
+import asyncio
+import json
+import time
+
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from menu.models import Pedido
+from menu.pedidos import aultimo_pedido, aversion_pedidos, version_pedidos
+
+INTERVALO = 1
+SONDEO = 3
+LATIDO = 15
+CONSULTA_BASE = 10
+DURACION = 300
+MAXIMO_POR_VUELTA = 50
+
+
+def evento(tipo, datos, id=None):
+    """Texto de un evento en formato text/event-stream"""
+    lineas = [f'event: {tipo}']
+    if id is not None:
+        lineas.append(f'id: {id}')
+    lineas.append(f'data: {json.dumps(datos, ensure_ascii=False)}')
+    return '\n'.join(lineas) + '\n\n'
+
+
+def datos_pedido(pedido, request=None, con_html=False):
+    """Resumen del pedido para el evento; con_html agrega la fila y los modales de la lista"""
+    datos = {
+        'id': pedido.pk,
+        'nombre_cliente': pedido.nombre_cliente,
+        'telefono': pedido.telefono,
+        'tipo_entrega': pedido.tipo_entrega,
+        'estado': pedido.estado,
+        'total': str(pedido.total),
+        'total_items': pedido.total_items,
+        'fecha': timezone.localtime(pedido.fecha).strftime('%d/%m/%Y %H:%M'),
+    }
+    if con_html:
+        contexto = {'pedido': pedido}
+        datos['fila'] = render_to_string('panel/pedido_fila.html', contexto, request)
+        datos['modales'] = render_to_string('panel/pedido_modales.html', contexto, request)
+    return datos
+
+
+def _ultimos():
+    return Pedido.objects.order_by('-id').values_list('id', flat=True)
+
+
+def _nuevos(desde):
+    return Pedido.objects.filter(pk__gt=desde).order_by('id')[:MAXIMO_POR_VUELTA]
+
+
+def ultimo_id(pedido_id, version):
+    """Id de evento con el último pedido enviado y la versión de la lista"""
+    return f'{pedido_id}:{version}'
+
+
+def leer_ultimo_id(texto):
+    """
+    (pedido, versión) de un id de evento o del parámetro ?desde=. La
+    versión es None si no viene; (None, None) si el texto no es válido.
+    """
+    pedido, _, version = (texto or '').partition(':')
+    try:
+        pedido = int(pedido)
+    except ValueError:
+        return None, None
+    try:
+        version = int(version)
+    except ValueError:
+        version = None
+    return pedido, version
+
+
+def sondeo_pedidos(desde, version, request=None, con_html=False):
+    """
+    Respuesta de una sola vuelta (WSGI): los pedidos con id mayor a
+    `desde` y el aviso de cambios si la versión no es `version`. Termina
+    con el id que el navegador devuelve en Last-Event-ID al reconectarse.
+    En la primera conexión (desde=None) solo marca el punto de partida.
+    """
+    eventos = [f'retry: {SONDEO * 1000}\n\n']
+    actual = version_pedidos()
+
+    if desde is None:
+        desde = _ultimos().first() or 0
+    else:
+        nuevos = list(_nuevos(desde))
+        for pedido in nuevos:
+            eventos.append(evento('pedido', datos_pedido(pedido, request, con_html), id=ultimo_id(pedido.pk, actual)))
+            desde = pedido.pk
+        # Los pedidos nuevos también cambian la versión
+        if not nuevos and version is not None and actual != version:
+            eventos.append(evento('actualizado', {'version': actual}, id=ultimo_id(desde, actual)))
+
+    # Un id sin data no dispara ningún evento, pero queda como último id
+    eventos.append(f'id: {ultimo_id(desde, actual)}\n\n')
+    return eventos
+
+
+async def aeventos_pedidos(desde, request=None, con_html=False, duracion=DURACION, version=None):
+    """
+    Generador async para StreamingHttpResponse (despliegue ASGI): los
+    pedidos con id mayor a `desde` a medida que se crean, más los cambios
+    de la lista desde `version` (la actual si es None).
+    """
+    yield f'retry: {INTERVALO * 3000}\n\n'
+
+    inicio = ultimo_envio = ultima_consulta = time.monotonic()
+    if version is None:
+        version = await aversion_pedidos()
+
+    while time.monotonic() - inicio < duracion:
+        ahora = time.monotonic()
+        ultimo = await aultimo_pedido()
+        if ultimo <= desde and ahora - ultima_consulta >= CONSULTA_BASE:
+            ultimo = await _ultimos().afirst() or 0
+            ultima_consulta = ahora
+
+        if ultimo > desde:
+            # La versión también cambió por los pedidos nuevos: se toma
+            # antes de leerlos para no tapar cambios posteriores
+            version = await aversion_pedidos()
+            async for pedido in _nuevos(desde):
+                yield evento('pedido', datos_pedido(pedido, request, con_html), id=ultimo_id(pedido.pk, version))
+                desde = pedido.pk
+            ultimo_envio = ahora
+        elif (actual := await aversion_pedidos()) != version:
+            version = actual
+            yield evento('actualizado', {'version': version}, id=ultimo_id(desde, version))
+            ultimo_envio = ahora
+        elif ahora - ultimo_envio >= LATIDO:
+            # Comentario: mantiene viva la conexión a través de proxies
+            yield ': latido\n\n'
+            ultimo_envio = ahora
+
+        await asyncio.sleep(INTERVALO)
@@ -0,0 +1,143 @@
+"""
+Exportación del historial de pedidos en CSV o JSON Lines.
+
+Todo son generadores: los pedidos se leen de a CHUNK filas (cursor del
+lado del servidor en PostgreSQL) y cada línea se entrega apenas está
+lista, así que la memoria usada no depende de la cantidad de pedidos y
+la descarga empieza enseguida.
+
+- CSV: una fila por item (los datos del pedido se repiten en cada una).
+  Los textos que empiezan como una fórmula (=, +, -, @) se prefijan con '
+  para que Excel no los ejecute: nombre, dirección y notas los escribe el
+  cliente
+- JSONL: una línea por pedido, con sus items en una lista
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+from itertools import groupby, islice
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from menu.models import Pedido
+
+CHUNK = 2000
+
+FORMATOS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+CAMPOS_PEDIDO = [
+    'id', 'fecha', 'nombre_cliente', 'telefono', 'direccion',
+    'tipo_entrega', 'metodo_pago', 'estado', 'total', 'total_items', 'notas',
+]
+CAMPOS_ITEM = ['items__producto_id', 'items__producto__nombre', 'items__cantidad', 'items__precio_unitario']
+
+# Excel interpreta como fórmula una celda que empieza con estos caracteres
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+COLUMNAS_CSV = [
+    'pedido', 'fecha', 'cliente', 'telefono', 'direccion', 'tipo_entrega',
+    'metodo_pago', 'estado', 'total', 'total_items', 'notas',
+    'producto_id', 'producto', 'cantidad', 'precio_unitario', 'subtotal',
+]
+
+
+def _medianoche(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def pedidos_con_items(desde=None, hasta=None):
+    """
+    Filas (pedido, item) ordenadas por fecha, leídas por partes. Los
+    pedidos sin items salen una vez con los campos del item en None.
+
+    El rango se filtra con fechas completas (no con __date) para que la
+    base pueda usar el índice sobre fecha.
+    """
+    pedidos = Pedido.objects.all()
+    if desde:
+        pedidos = pedidos.filter(fecha__gte=_medianoche(desde))
+    if hasta:
+        pedidos = pedidos.filter(fecha__lt=_medianoche(hasta + timedelta(days=1)))
+
+    filas = pedidos.order_by('fecha', 'id', 'items__id').values_list(*CAMPOS_PEDIDO, *CAMPOS_ITEM)
+    return filas.iterator(chunk_size=CHUNK)
+
+
+def _celda(valor):
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+class _Linea:
+    """Archivo falso para csv.writer: devuelve la línea en lugar de guardarla"""
+
+    def write(self, valor):
+        return valor
+
+
+def exportar_csv(filas):
+    """Genera el CSV línea por línea (con BOM para que Excel lea UTF-8)"""
+    escritor = csv.writer(_Linea())
+    yield '\ufeff' + escritor.writerow(COLUMNAS_CSV)
+
+    n = len(CAMPOS_PEDIDO)
+    for fila in filas:
+        pedido, (producto_id, producto, cantidad, precio) = fila[:n], fila[n:]
+        subtotal = cantidad * precio if cantidad is not None else None
+        yield escritor.writerow([
+            *pedido[:1],
+            timezone.localtime(pedido[1]).isoformat(),
+            *map(_celda, pedido[2:]),
+            producto_id, _celda(producto), cantidad, precio, subtotal,
+        ])
+
+
+def exportar_jsonl(filas):
+    """Genera una línea JSON por pedido, agrupando sus items consecutivos"""
+    n = len(CAMPOS_PEDIDO)
+    for pedido, lineas in groupby(filas, key=lambda fila: fila[:n]):
+        datos = dict(zip(CAMPOS_PEDIDO, pedido))
+        datos['fecha'] = timezone.localtime(datos['fecha']).isoformat()
+        datos['total'] = str(datos['total'])
+        datos['items'] = [
+            {
+                'producto_id': producto_id,
+                'producto': producto,
+                'cantidad': cantidad,
+                'precio_unitario': str(precio),
+                'subtotal': str(cantidad * precio),
+            }
+            for producto_id, producto, cantidad, precio in (linea[n:] for linea in lineas)
+            if cantidad is not None
+        ]
+        yield json.dumps(datos, ensure_ascii=False) + '\n'
+
+
+def exportar(formato, desde=None, hasta=None):
+    """Generador de texto con los pedidos del rango en el formato pedido"""
+    filas = pedidos_con_items(desde, hasta)
+    return exportar_csv(filas) if formato == 'csv' else exportar_jsonl(filas)
+
+
+async def en_lotes_async(lineas, tamano=CHUNK):
+    """
+    Recorre el generador desde ASGI de a `tamano` líneas. Un
+    StreamingHttpResponse con un generador sincrónico se consumiría
+    entero en memoria antes de enviarse; así se leen por partes, siempre
+    en el mismo hilo (el cursor de la base queda en esa conexión).
+    """
+    siguientes = sync_to_async(lambda: list(islice(lineas, tamano)), thread_sensitive=True)
+    while lote := await siguientes():
+        for linea in lote:
+            yield linea
+
+
+def nombre_archivo(formato, desde=None, hasta=None):
+    """pedidos_2025-01-01_2025-01-31.csv"""
+    partes = ['pedidos'] + [dia.isoformat() for dia in (desde, hasta) if dia]
+    return '_'.join(partes) + f'.{formato}'
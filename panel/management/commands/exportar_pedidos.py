@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from panel.exportar import FORMATOS, exportar
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta los pedidos con sus items en CSV o JSON Lines, leyendo por '
+        'partes (la memoria no crece con el historial).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=list(FORMATOS), default='csv')
+        parser.add_argument('--desde', help='Primer día a exportar (AAAA-MM-DD)')
+        parser.add_argument('--hasta', help='Último día a exportar (AAAA-MM-DD)')
+        parser.add_argument('--salida', help='Archivo de salida (por defecto, la salida estándar)')
+
+    def handle(self, *args, **options):
+        fechas = {}
+        for opcion in ('desde', 'hasta'):
+            if options[opcion]:
+                try:
+                    fechas[opcion] = parse_date(options[opcion])
+                except ValueError:
+                    fechas[opcion] = None
+                if fechas[opcion] is None:
+                    raise CommandError(f'Fecha inválida en --{opcion}: {options[opcion]}')
+
+        lineas = exportar(options['formato'], **fechas)
+
+        if not options['salida']:
+            sys.stdout.writelines(lineas)
+            return
+
+        with open(options['salida'], 'w', encoding='utf-8', newline='') as archivo:
+            archivo.writelines(lineas)
+        self.stderr.write(self.style.SUCCESS(f'Pedidos exportados en {options["salida"]}'))
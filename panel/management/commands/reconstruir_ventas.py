@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from panel.ventas import reconstruir_ventas
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula el resumen diario de ventas desde los pedidos. Usarlo '
+        'después de migrar o si se editaron pedidos desde el admin.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primer día a recalcular (AAAA-MM-DD)')
+        parser.add_argument('--hasta', help='Último día a recalcular (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        fechas = {}
+        for opcion in ('desde', 'hasta'):
+            if options[opcion]:
+                try:
+                    fechas[opcion] = parse_date(options[opcion])
+                except ValueError:
+                    fechas[opcion] = None
+                if fechas[opcion] is None:
+                    raise CommandError(f'Fecha inválida en --{opcion}: {options[opcion]}')
+
+        dias, productos = reconstruir_ventas(**fechas)
+        self.stdout.write(self.style.SUCCESS(
+            f'Resumen reconstruido: {dias} filas por día y {productos} filas por producto'
+        ))
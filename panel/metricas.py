@@ -0,0 +1,288 @@
+"""
+Métricas por vista: duración, consultas SQL, tiempo en SQL y consultas
+duplicadas de cada request (las toma panel.middleware.MetricasMiddleware).
+
+Cada proceso acumula en memoria, agrupando por nombre de URL, y cada
+PUBLICAR segundos deja una copia en la caché. La página de métricas del
+panel y /panel/metricas/prometheus/ suman las copias de todos los
+procesos: con una caché compartida (MARDEBURGER_CACHE_BACKEND) se ven los
+de todos los workers; con la caché local, los del proceso que responde.
+
+Para no mantener una lista de procesos (que dos workers podrían pisarse
+al actualizarla) cada proceso reserva un lugar numerado con cache.add,
+que es atómico, y publica en la clave de ese lugar. Para sumar se leen
+los MAXIMO_PROCESOS lugares con un solo get_many.
+
+Los histogramas usan buckets fijos, así que el costo por request es
+constante (algunas sumas bajo un lock) sin importar el tráfico.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+# Límites superiores de los buckets
+BUCKETS_SEGUNDOS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+BUCKETS_CONSULTAS = [0, 1, 2, 5, 10, 20, 50, 100]
+
+PUBLICAR = 10
+MAXIMO_PROCESOS = 64
+# Dueño (pid) de cada lugar y copia publicada desde ese lugar
+CLAVE_LUGAR = 'metricas:lugar:{}'
+CLAVE_PROCESO = 'metricas:proceso:{}'
+# Los procesos que dejan de publicar desaparecen de las métricas y
+# liberan su lugar
+VENCIMIENTO = 3600
+
+
+def _vista_vacia():
+    return {
+        'requests': 0,
+        'errores': 0,
+        'segundos': 0.0,
+        'sql_segundos': 0.0,
+        'consultas': 0,
+        'max_consultas': 0,
+        'duplicadas': 0,
+        'con_duplicadas': 0,
+        'buckets_segundos': [0] * (len(BUCKETS_SEGUNDOS) + 1),
+        'buckets_consultas': [0] * (len(BUCKETS_CONSULTAS) + 1),
+    }
+
+
+class Medicion:
+    """
+    Se instala con connection.execute_wrapper durante un request: cuenta
+    las consultas, su tiempo y las que repiten el mismo SQL (típico N+1).
+    """
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+        self.sql_vistos = set()
+        self.duplicadas = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.consultas += 1
+            if sql in self.sql_vistos:
+                self.duplicadas += 1
+            else:
+                self.sql_vistos.add(sql)
+
+
+class Registro:
+    """Acumulado del proceso, por nombre de URL"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lock_publicar = threading.Lock()
+        self.vistas = {}
+        self.ultima_publicacion = time.monotonic()
+        self.lugar = None
+
+    def registrar(self, vista, segundos, medicion, error=False):
+        with self.lock:
+            datos = self.vistas.get(vista)
+            if datos is None:
+                datos = self.vistas[vista] = _vista_vacia()
+            datos['requests'] += 1
+            datos['errores'] += error
+            datos['segundos'] += segundos
+            datos['sql_segundos'] += medicion.segundos
+            datos['consultas'] += medicion.consultas
+            datos['max_consultas'] = max(datos['max_consultas'], medicion.consultas)
+            datos['duplicadas'] += medicion.duplicadas
+            datos['con_duplicadas'] += bool(medicion.duplicadas)
+            datos['buckets_segundos'][bisect_left(BUCKETS_SEGUNDOS, segundos)] += 1
+            datos['buckets_consultas'][bisect_left(BUCKETS_CONSULTAS, medicion.consultas)] += 1
+
+            publicar = time.monotonic() - self.ultima_publicacion >= PUBLICAR
+            if publicar:
+                self.ultima_publicacion = time.monotonic()
+                copia = self._copiar()
+
+        if publicar:
+            self.publicar(copia)
+
+    def _copiar(self):
+        return {
+            vista: {
+                **datos,
+                'buckets_segundos': list(datos['buckets_segundos']),
+                'buckets_consultas': list(datos['buckets_consultas']),
+            }
+            for vista, datos in self.vistas.items()
+        }
+
+    def _reservar_lugar(self):
+        """
+        Lugar del proceso, renovado por VENCIMIENTO segundos más. Se
+        compara con el pid porque un proceso hijo (fork) hereda el lugar
+        del padre, y porque el lugar pudo vencer y tomarlo otro proceso.
+        None si ya hay MAXIMO_PROCESOS publicando.
+        """
+        pid = os.getpid()
+        if self.lugar is not None and cache.get(CLAVE_LUGAR.format(self.lugar)) == pid:
+            cache.touch(CLAVE_LUGAR.format(self.lugar), VENCIMIENTO)
+            return self.lugar
+
+        self.lugar = None
+        for lugar in range(MAXIMO_PROCESOS):
+            if cache.add(CLAVE_LUGAR.format(lugar), pid, VENCIMIENTO):
+                self.lugar = lugar
+                break
+        return self.lugar
+
+    def publicar(self, copia=None):
+        """Deja el acumulado del proceso en la caché"""
+        if copia is None:
+            with self.lock:
+                copia = self._copiar()
+        with self.lock_publicar:
+            lugar = self._reservar_lugar()
+            if lugar is not None:
+                cache.set(CLAVE_PROCESO.format(lugar), copia, VENCIMIENTO)
+
+
+registro = Registro()
+
+
+def metricas_por_vista():
+    """
+    {vista: datos} sumando lo publicado por todos los procesos. El proceso
+    actual publica antes, para que la página muestre lo último.
+    """
+    registro.publicar()
+    copias = cache.get_many([CLAVE_PROCESO.format(lugar) for lugar in range(MAXIMO_PROCESOS)])
+
+    total = {}
+    for copia in copias.values():
+        for vista, datos in copia.items():
+            acumulado = total.setdefault(vista, _vista_vacia())
+            for campo, valor in datos.items():
+                if campo == 'max_consultas':
+                    acumulado[campo] = max(acumulado[campo], valor)
+                elif campo.startswith('buckets_'):
+                    acumulado[campo] = [a + b for a, b in zip(acumulado[campo], valor)]
+                else:
+                    acumulado[campo] += valor
+    return total
+
+
+def percentil_bucket(buckets, limites, p):
+    """
+    Límite superior del bucket donde cae el percentil p (aproximado). None
+    si cae en el último bucket, sin límite.
+    """
+    total = sum(buckets)
+    if not total:
+        return 0
+    objetivo = total * p / 100
+    acumulado = 0
+    for limite, cantidad in zip(limites, buckets):
+        acumulado += cantidad
+        if acumulado >= objetivo:
+            return limite
+    return None
+
+
+def _nombre_bucket(limite):
+    return f'≤{limite * 1000:g} ms' if limite < 1 else f'≤{limite:g} s'
+
+
+NOMBRES_BUCKETS = [_nombre_bucket(limite) for limite in BUCKETS_SEGUNDOS] + [f'>{BUCKETS_SEGUNDOS[-1]:g} s']
+
+
+def resumen_vistas():
+    """Filas para la página del panel, de la vista que más tiempo suma a la que menos"""
+    filas = []
+    for vista, datos in metricas_por_vista().items():
+        requests = datos['requests'] or 1
+        mayor = max(datos['buckets_segundos']) or 1
+        filas.append({
+            'vista': vista,
+            'requests': datos['requests'],
+            'errores': datos['errores'],
+            'total_segundos': round(datos['segundos'], 2),
+            'media_ms': round(datos['segundos'] / requests * 1000, 1),
+            'p50': percentil_bucket(datos['buckets_segundos'], BUCKETS_SEGUNDOS, 50),
+            'p95': percentil_bucket(datos['buckets_segundos'], BUCKETS_SEGUNDOS, 95),
+            'consultas_media': round(datos['consultas'] / requests, 1),
+            'max_consultas': datos['max_consultas'],
+            'sql_media_ms': round(datos['sql_segundos'] / requests * 1000, 1),
+            'sql_porcentaje': round(datos['sql_segundos'] / datos['segundos'] * 100) if datos['segundos'] else 0,
+            'duplicadas_media': round(datos['duplicadas'] / requests, 1),
+            'con_duplicadas': datos['con_duplicadas'],
+            'histograma': [
+                {'nombre': nombre, 'cantidad': cantidad, 'alto': round(cantidad / mayor * 100)}
+                for nombre, cantidad in zip(NOMBRES_BUCKETS, datos['buckets_segundos'])
+            ],
+        })
+    filas.sort(key=lambda fila: fila['total_segundos'], reverse=True)
+    return filas
+
+
+def _etiqueta(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _limite(valor):
+    return '+Inf' if valor == float('inf') else repr(float(valor))
+
+
+def _histograma(lineas, nombre, vista, buckets, limites, suma):
+    acumulado = 0
+    for limite, cantidad in zip([*limites, float('inf')], buckets):
+        acumulado += cantidad
+        lineas.append(f'{nombre}_bucket{{vista="{vista}",le="{_limite(limite)}"}} {acumulado}')
+    lineas.append(f'{nombre}_sum{{vista="{vista}"}} {suma}')
+    lineas.append(f'{nombre}_count{{vista="{vista}"}} {acumulado}')
+
+
+def texto_prometheus(tareas=None):
+    """Métricas en el formato de texto de Prometheus"""
+    vistas = metricas_por_vista()
+    lineas = [
+        '# HELP mardeburger_request_segundos Duración de los requests por vista',
+        '# TYPE mardeburger_request_segundos histogram',
+    ]
+    for vista, datos in sorted(vistas.items()):
+        _histograma(
+            lineas, 'mardeburger_request_segundos', _etiqueta(vista),
+            datos['buckets_segundos'], BUCKETS_SEGUNDOS, round(datos['segundos'], 6)
+        )
+
+    lineas += [
+        '# HELP mardeburger_request_consultas Consultas SQL por request',
+        '# TYPE mardeburger_request_consultas histogram',
+    ]
+    for vista, datos in sorted(vistas.items()):
+        _histograma(
+            lineas, 'mardeburger_request_consultas', _etiqueta(vista),
+            datos['buckets_consultas'], BUCKETS_CONSULTAS, datos['consultas']
+        )
+
+    contadores = [
+        ('sql_segundos', 'mardeburger_sql_segundos_total', 'Tiempo total en consultas SQL'),
+        ('duplicadas', 'mardeburger_consultas_duplicadas_total', 'Consultas que repiten un SQL ya ejecutado en el mismo request'),
+        ('con_duplicadas', 'mardeburger_requests_con_duplicadas_total', 'Requests con alguna consulta duplicada'),
+        ('errores', 'mardeburger_requests_error_total', 'Requests que terminaron en error 5xx'),
+    ]
+    for campo, nombre, ayuda in contadores:
+        lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} counter']
+        for vista, datos in sorted(vistas.items()):
+            valor = round(datos[campo], 6) if isinstance(datos[campo], float) else datos[campo]
+            lineas.append(f'{nombre}{{vista="{_etiqueta(vista)}"}} {valor}')
+
+    for clave, valor in (tareas or {}).items():
+        nombre = f'mardeburger_tareas_{clave}'
+        lineas += [f'# TYPE {nombre} gauge', f'{nombre} {valor}']
+
+    return '\n'.join(lineas) + '\n'
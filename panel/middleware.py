@@ -0,0 +1,66 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .metricas import Medicion, registro
+
+
+def _instalar(medicion):
+    connection.execute_wrappers.append(medicion)
+
+
+def _quitar(medicion):
+    connection.execute_wrappers.remove(medicion)
+
+
+class MetricasMiddleware:
+    """
+    Mide cada request (duración, consultas, tiempo en SQL y consultas
+    duplicadas) y lo suma a las métricas de su vista (panel.metricas).
+    Va primero en MIDDLEWARE para medir también a los demás middlewares.
+    Se desactiva con MARDEBURGER_METRICAS=0.
+
+    En las respuestas en streaming (exportación, avisos en vivo) se mide
+    hasta que empieza la respuesta, no el envío completo.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICAS_ACTIVAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        medicion = Medicion()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(medicion):
+            response = self.get_response(request)
+        self.registrar(request, response, time.perf_counter() - inicio, medicion)
+        return response
+
+    async def __acall__(self, request):
+        medicion = Medicion()
+        inicio = time.perf_counter()
+        # Las consultas del ORM async corren en el hilo de sync_to_async del
+        # request, que tiene su propia conexión: el wrapper se instala ahí
+        await sync_to_async(_instalar)(medicion)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_quitar)(medicion)
+        self.registrar(request, response, time.perf_counter() - inicio, medicion)
+        return response
+
+    def registrar(self, request, response, duracion, medicion):
+        match = request.resolver_match
+        vista = match.view_name if match else 'sin_ruta'
+        registro.registrar(vista, duracion, medicion, error=response.status_code >= 500)
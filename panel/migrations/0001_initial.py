@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('menu', '0006_producto_imagen_por_contenido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('metodo_pago', models.CharField(choices=[('efectivo', 'Efectivo'), ('transferencia', 'Transferencia Bancaria'), ('mercadopago', 'Mercado Pago')], max_length=20)),
+                ('tipo_entrega', models.CharField(choices=[('retiro', 'Retiro en local'), ('delivery', 'Delivery')], max_length=20)),
+                ('pedidos', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Venta diaria',
+                'verbose_name_plural': 'Ventas diarias',
+                'ordering': ['-fecha', 'metodo_pago', 'tipo_entrega'],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'metodo_pago', 'tipo_entrega'), name='venta_por_dia_pago_entrega')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('nombre_producto', models.CharField(help_text='Nombre al momento de la venta (se conserva si el producto se elimina)', max_length=200)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventas_diarias', to='menu.producto')),
+            ],
+            options={
+                'verbose_name': 'Venta diaria por producto',
+                'verbose_name_plural': 'Ventas diarias por producto',
+                'ordering': ['-fecha', 'nombre_producto'],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'producto'), name='venta_producto_por_dia')],
+            },
+        ),
+    ]
@@ -1,3 +1,54 @@
 from django.db import models
+from menu.models import Pedido, Producto
 
-# Create your models here.
+
+class VentaDiariaProducto(models.Model):
+    """Unidades e ingresos por producto y por día (ver panel.ventas)"""
+    fecha = models.DateField()
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ventas_diarias'
+    )
+    nombre_producto = models.CharField(
+        max_length=200,
+        help_text="Nombre al momento de la venta (se conserva si el producto se elimina)"
+    )
+    cantidad = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-fecha', 'nombre_producto']
+        verbose_name = "Venta diaria por producto"
+        verbose_name_plural = "Ventas diarias por producto"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='venta_producto_por_dia'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.nombre_producto}: {self.cantidad}"
+
+
+class VentaDiaria(models.Model):
+    """Pedidos e ingresos por día, método de pago y tipo de entrega"""
+    fecha = models.DateField()
+    metodo_pago = models.CharField(max_length=20, choices=Pedido.METODO_PAGO)
+    tipo_entrega = models.CharField(max_length=20, choices=Pedido.TIPO_ENTREGA)
+    pedidos = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-fecha', 'metodo_pago', 'tipo_entrega']
+        verbose_name = "Venta diaria"
+        verbose_name_plural = "Ventas diarias"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'metodo_pago', 'tipo_entrega'],
+                name='venta_por_dia_pago_entrega'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.metodo_pago}/{self.tipo_entrega}: ${self.ingresos}"
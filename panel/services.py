@@ -0,0 +1,71 @@
+"""
+Métricas del dashboard del panel.
+
+Se calculan con tres consultas (agregados condicionales sobre pedidos y
+sobre productos, y la cuenta de categorías) y se guardan en caché unos
+segundos: un dashboard abierto con recarga automática no vuelve a
+consultar la base de datos en cada refresco.
+"""
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from menu.models import Categoria, Pedido, Producto
+
+CLAVE_METRICAS = 'panel:metricas'
+TTL_METRICAS = 30
+
+
+def inicio_del_dia():
+    """Medianoche de hoy en la zona horaria del local"""
+    return timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+
+
+def calcular_metricas():
+    """Cuentas del catálogo y pedidos, ventas de hoy y pedidos por entrega"""
+    # Los cancelados no suman a las ventas de hoy
+    hoy = Q(fecha__gte=inicio_del_dia()) & ~Q(estado='cancelado')
+    por_entrega = {
+        f'entrega_{valor}': Count('id', filter=hoy & Q(tipo_entrega=valor))
+        for valor, _ in Pedido.TIPO_ENTREGA
+    }
+
+    datos = Pedido.objects.aggregate(
+        total_pedidos=Count('id'),
+        pedidos_hoy=Count('id', filter=hoy),
+        ingresos_hoy=Sum('total', filter=hoy),
+        ticket_promedio_hoy=Avg('total', filter=hoy),
+        **por_entrega
+    )
+    datos.update(Producto.objects.aggregate(
+        total_productos=Count('id'),
+        productos_disponibles=Count('id', filter=Q(disponible=True)),
+    ))
+    datos['total_categorias'] = Categoria.objects.count()
+
+    for clave in ('ingresos_hoy', 'ticket_promedio_hoy'):
+        datos[clave] = (datos[clave] or Decimal('0')).quantize(Decimal('0.01'))
+    datos['pedidos_por_entrega'] = [
+        {'tipo': valor, 'nombre': nombre, 'cantidad': datos.pop(f'entrega_{valor}')}
+        for valor, nombre in Pedido.TIPO_ENTREGA
+    ]
+    return datos
+
+
+def metricas_dashboard():
+    """
+    Métricas y últimos pedidos del dashboard, cacheados TTL_METRICAS
+    segundos. Los pedidos se guardan como diccionarios (no instancias).
+    """
+    metricas = cache.get(CLAVE_METRICAS)
+    if metricas is None:
+        metricas = calcular_metricas()
+        metricas['ultimos_pedidos'] = list(Pedido.objects.values(
+            'id', 'nombre_cliente', 'telefono', 'tipo_entrega', 'total', 'fecha'
+        )[:5])
+        metricas['calculadas'] = timezone.now()
+        cache.set(CLAVE_METRICAS, metricas, TTL_METRICAS)
+    return metricas
@@ -0,0 +1,30 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from menu.models import Pedido
+from menu.signals import pedido_creado, pedido_estado_cambiado
+from .ventas import restar_pedido, sumar_pedido
+
+
+@receiver(pedido_creado)
+def sumar_venta(sender, pedido, items, **kwargs):
+    """Suma el pedido nuevo al resumen diario de ventas"""
+    sumar_pedido(pedido, items)
+
+
+@receiver(pedido_estado_cambiado)
+def restar_cancelado(sender, pedido, **kwargs):
+    """Resta del resumen el pedido cancelado"""
+    if pedido.estado == 'cancelado':
+        restar_pedido(pedido)
+
+
+@receiver(pre_delete, sender=Pedido)
+def restar_venta(sender, instance, **kwargs):
+    """
+    Resta del resumen el pedido borrado (desde el admin), salvo que ya se
+    haya restado al cancelarlo. Se usa pre_delete porque los items todavía
+    existen (el borrado en cascada viene después).
+    """
+    if instance.estado != 'cancelado':
+        restar_pedido(instance)
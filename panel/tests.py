@@ -1,3 +1,568 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import re
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from menu.models import Categoria, Producto, Pedido, ItemPedido
+from menu.bench import sembrar_catalogo
+from menu.services import TransicionInvalidaError, cambiar_estado, crear_pedido
+from menu.tests import PresupuestoConsultasMixin, leer_async
+from panel.eventos import aeventos_pedidos, leer_ultimo_id
+from panel.exportar import COLUMNAS_CSV
+from panel.metricas import Medicion, Registro, metricas_por_vista
+from panel.models import VentaDiaria, VentaDiariaProducto
+from panel.services import CLAVE_METRICAS, TTL_METRICAS, calcular_metricas, inicio_del_dia, metricas_dashboard
+from panel.ventas import _sumar_productos, reconstruir_ventas
+
+
+class PedidoListQueriesTest(TestCase):
+    """La lista de pedidos no debe hacer consultas por cada fila"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('staff', password='clave-segura')
+        categoria = Categoria.objects.create(nombre='Hamburguesas')
+        cls.productos = [
+            Producto.objects.create(
+                nombre=f'Burger {i}',
+                descripcion='Descripción',
+                precio=1000 + i,
+                categoria=categoria,
+                imagen='productos/burger.jpg'
+            )
+            for i in range(3)
+        ]
+
+    def crear_pedidos(self, cantidad):
+        for i in range(cantidad):
+            pedido = Pedido.objects.create(
+                nombre_cliente=f'Cliente {i}',
+                telefono='2291123456',
+                total=0
+            )
+            for producto in self.productos:
+                ItemPedido.objects.create(
+                    pedido=pedido,
+                    producto=producto,
+                    cantidad=2,
+                    precio_unitario=producto.precio
+                )
+            pedido.actualizar_resumen()
+
+    def contar_consultas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('panel_pedido_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(consultas)
+
+    def test_cantidad_de_consultas_constante(self):
+        self.client.force_login(self.usuario)
+
+        self.crear_pedidos(2)
+        consultas_pocos_pedidos = self.contar_consultas()
+
+        self.crear_pedidos(18)
+        with self.assertNumQueries(consultas_pocos_pedidos):
+            response = self.client.get(reverse('panel_pedido_list'))
+
+        self.assertContains(response, '6 items')
+        self.assertContains(response, 'Burger 2')
+
+
+class PanelPresupuestoConsultasTest(PresupuestoConsultasMixin, TestCase):
+    """Panel y listados del admin de pedidos y categorías"""
+    urls = 'panel.urls'
+    PRESUPUESTOS = {
+        'panel_login': 0,
+        'panel_dashboard': 7,
+        'panel_categoria_list': 3,
+        'panel_categoria_create': 2,
+        'panel_categoria_update': 3,
+        'panel_categoria_delete': 5,
+        'panel_producto_list': 4,
+        'panel_producto_create': 3,
+        'panel_producto_update': 4,
+        'panel_producto_delete': 4,
+        'panel_pedido_list': 4,
+        'panel_pedido_exportar': 3,
+        'panel_pedido_estado': 6,
+        'panel_cocina': 3,
+        'panel_reporte_ventas': 5,
+        'panel_mas_vendidos': 3,
+        'panel_metricas': 3,
+        'panel_metricas_prometheus': 3,
+        'panel_logout': 4,
+        'admin:menu_pedido_changelist': 7,
+        'admin:menu_categoria_changelist': 5,
+    }
+    EXCLUIDAS = {
+        'panel_eventos': 'con ASGI es un stream de varios minutos; el sondeo de WSGI lo cubre EventosPedidosTest',
+    }
+    CODIGOS = {'panel_logout': 302, 'panel_pedido_estado': 302}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', password='clave-segura')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.usuario)
+
+    def sembrar(self, productos, pedidos):
+        super().sembrar(productos, pedidos)
+        reconstruir_ventas()
+
+    def preparar(self, nombre):
+        if nombre == 'panel_logout':
+            # Otra sesión, para no cerrar la de las demás vistas
+            self.otro_cliente = Client()
+            self.otro_cliente.force_login(self.usuario)
+        elif nombre == 'panel_pedido_estado':
+            self.pedido = Pedido.objects.create(nombre_cliente='Cliente', telefono='2291123456', total=0)
+
+    def pedir(self, nombre):
+        if nombre == 'panel_login':
+            return Client().get(reverse(nombre))
+        if nombre == 'panel_logout':
+            return self.otro_cliente.post(reverse(nombre))
+        if nombre in ('panel_categoria_update', 'panel_categoria_delete'):
+            return self.client.get(reverse(nombre, args=[self.productos[0].categoria_id]))
+        if nombre in ('panel_producto_update', 'panel_producto_delete'):
+            return self.client.get(reverse(nombre, args=[self.productos[0].pk]))
+        if nombre == 'panel_pedido_estado':
+            return self.client.post(reverse(nombre, args=[self.pedido.pk]), {'estado': 'preparando'})
+        return self.client.get(reverse(nombre))
+
+
+class PedidoEstadoTest(TestCase):
+    """Transiciones de estado desde el panel"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('staff', password='clave-segura')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.pedido = Pedido.objects.create(nombre_cliente='Cliente', telefono='2291123456', total=0)
+
+    def cambiar(self, **datos):
+        response = self.client.post(reverse('panel_pedido_estado', args=[self.pedido.pk]), datos, follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.pedido.refresh_from_db()
+        return [str(mensaje) for mensaje in response.context['messages']]
+
+    def test_recorrido_completo(self):
+        for estado in ('preparando', 'listo', 'entregado'):
+            self.cambiar(estado=estado)
+            self.assertEqual(self.pedido.estado, estado)
+            self.assertIsNotNone(getattr(self.pedido, f'fecha_{estado}'))
+
+    def test_transicion_invalida(self):
+        self.cambiar(estado='cancelado')
+        mensajes = self.cambiar(estado='preparando')
+        self.assertEqual(self.pedido.estado, 'cancelado')
+        self.assertIn('no puede pasar a en preparación', mensajes[-1])
+        self.assertIsNone(self.pedido.fecha_preparando)
+
+    def test_estado_faltante_o_desconocido(self):
+        for datos in ({}, {'estado': 'volando'}):
+            with self.subTest(datos=datos):
+                mensajes = self.cambiar(**datos)
+                self.assertEqual(self.pedido.estado, 'recibido')
+                self.assertIn('Estado inválido', mensajes[-1])
+
+    def test_cambio_concurrente_no_pisa_el_otro(self):
+        """Otra pantalla ya lo pasó a cancelado: el UPDATE condicional no aplica"""
+        desactualizado = Pedido.objects.get(pk=self.pedido.pk)
+        cambiar_estado(self.pedido, 'cancelado')
+        with self.assertRaises(TransicionInvalidaError):
+            cambiar_estado(desactualizado, 'preparando')
+        self.assertEqual(desactualizado.estado, 'cancelado')
+        self.pedido.refresh_from_db()
+        self.assertEqual(self.pedido.estado, 'cancelado')
+
+
+class MetricasDashboardTest(TestCase):
+    """Cifras de panel.services.metricas_dashboard y su caché"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Hamburguesas')
+        Producto.objects.create(nombre='Clásica', precio=1000, categoria=categoria)
+        Producto.objects.create(nombre='Doble', precio=2000, categoria=categoria, disponible=False)
+
+        def pedido(total, tipo_entrega='retiro'):
+            return Pedido.objects.create(
+                nombre_cliente='Cliente', telefono='2291123456', tipo_entrega=tipo_entrega, total=total
+            )
+
+        pedido(Decimal('1000.00'))
+        pedido(Decimal('2000.50'), 'delivery')
+        cancelado = pedido(Decimal('9000.00'), 'delivery')
+        Pedido.objects.filter(pk=cancelado.pk).update(estado='cancelado')
+        # Un segundo antes de la medianoche local: es de ayer
+        ayer = pedido(Decimal('5000.00'))
+        Pedido.objects.filter(pk=ayer.pk).update(fecha=inicio_del_dia() - timedelta(seconds=1))
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_cifras_de_hoy(self):
+        metricas = metricas_dashboard()
+
+        self.assertEqual(metricas['total_pedidos'], 4)
+        self.assertEqual(metricas['pedidos_hoy'], 2)
+        self.assertEqual(metricas['ingresos_hoy'], Decimal('3000.50'))
+        self.assertEqual(metricas['ticket_promedio_hoy'], Decimal('1500.25'))
+        self.assertEqual(
+            [(fila['tipo'], fila['cantidad']) for fila in metricas['pedidos_por_entrega']],
+            [('retiro', 1), ('delivery', 1)]
+        )
+        self.assertEqual((metricas['total_productos'], metricas['productos_disponibles']), (2, 1))
+        self.assertEqual(metricas['total_categorias'], 1)
+        self.assertEqual(len(metricas['ultimos_pedidos']), 4)
+
+    def test_sin_ventas_hoy(self):
+        Pedido.objects.filter(fecha__gte=inicio_del_dia()).delete()
+        metricas = calcular_metricas()
+        self.assertEqual(metricas['ingresos_hoy'], Decimal('0.00'))
+        self.assertEqual(metricas['ticket_promedio_hoy'], Decimal('0.00'))
+
+    def test_cache_hasta_el_ttl(self):
+        primera = metricas_dashboard()
+        Pedido.objects.create(nombre_cliente='Otro', telefono='1', total=Decimal('700.00'))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(metricas_dashboard(), primera)
+
+        with mock.patch('panel.services.cache.set') as guardar:
+            cache.delete(CLAVE_METRICAS)
+            self.assertEqual(metricas_dashboard()['ingresos_hoy'], Decimal('3700.50'))
+        self.assertEqual(guardar.call_args.args[2], TTL_METRICAS)
+
+
+class VentasIncrementalesTest(TestCase):
+    """El resumen que se actualiza con cada pedido tiene que coincidir con reconstruir_ventas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.productos = sembrar_catalogo(productos=4)
+
+    def crear(self, carrito, metodo_pago='efectivo'):
+        pedido = Pedido(
+            nombre_cliente='Cliente', telefono='2291123456',
+            tipo_entrega='retiro', metodo_pago=metodo_pago
+        )
+        return crear_pedido(pedido, {str(self.productos[i].pk): cantidad for i, cantidad in carrito.items()})
+
+    def resumen(self):
+        return (
+            sorted(VentaDiaria.objects.values_list('fecha', 'metodo_pago', 'tipo_entrega', 'pedidos', 'ingresos')),
+            sorted(VentaDiariaProducto.objects.values_list('fecha', 'producto_id', 'cantidad', 'ingresos')),
+        )
+
+    def test_coincide_con_reconstruir(self):
+        self.crear({0: 2, 1: 1})
+        self.crear({1: 3, 2: 1, 3: 1})
+        cancelado = self.crear({0: 1, 3: 2}, metodo_pago='transferencia')
+        borrado = self.crear({2: 4})
+        cancelado_y_borrado = self.crear({0: 1, 1: 1})
+        self.crear({0: 1, 2: 1}, metodo_pago='transferencia')
+
+        cambiar_estado(cancelado, 'cancelado')
+        borrado.delete()
+        cambiar_estado(cancelado_y_borrado, 'cancelado')
+        cancelado_y_borrado.delete()
+
+        incremental = self.resumen()
+        self.assertTrue(incremental[0] and incremental[1])
+        reconstruir_ventas()
+        self.assertEqual(self.resumen(), incremental)
+
+    def test_sumar_productos_actualiza_y_crea(self):
+        hoy = timezone.localdate()
+        ids = [producto.pk for producto in self.productos]
+        VentaDiariaProducto.objects.create(fecha=hoy, producto_id=ids[0], nombre_producto='A', cantidad=2, ingresos=20)
+
+        def lineas(*indices):
+            return {ids[i]: [f'P{i}', 1, Decimal('10')] for i in indices}
+
+        # Una fila existente y una nueva, y después dos y dos: mismas consultas
+        with CaptureQueriesContext(connection) as pocas:
+            _sumar_productos(hoy, lineas(0, 1), 1)
+        with CaptureQueriesContext(connection) as muchas:
+            _sumar_productos(hoy, lineas(0, 1, 2, 3), 1)
+        self.assertEqual(len(pocas), len(muchas))
+
+        _sumar_productos(hoy, lineas(1), -1)
+        self.assertEqual(
+            sorted(VentaDiariaProducto.objects.values_list('producto_id', 'cantidad', 'ingresos')),
+            [(ids[0], 4, 40), (ids[1], 1, 10), (ids[2], 1, 10), (ids[3], 1, 10)],
+        )
+
+    def test_sumar_productos_fila_creada_en_paralelo(self):
+        hoy = timezone.localdate()
+        ids = [producto.pk for producto in self.productos]
+        # Otro pedido crea la fila del primer producto después del SELECT:
+        # el SELECT no la ve y el INSERT choca con ella
+        VentaDiariaProducto.objects.create(fecha=hoy, producto_id=ids[0], nombre_producto='A', cantidad=5, ingresos=50)
+        sin_filas = VentaDiariaProducto.objects.none()
+        with mock.patch.object(VentaDiariaProducto.objects, 'select_for_update', return_value=sin_filas):
+            _sumar_productos(hoy, {ids[0]: ['A', 1, Decimal('10')], ids[1]: ['B', 2, Decimal('30')]}, 1)
+
+        self.assertEqual(
+            sorted(VentaDiariaProducto.objects.values_list('producto_id', 'cantidad', 'ingresos')),
+            [(ids[0], 6, 60), (ids[1], 2, 30)],
+        )
+
+    def test_todo_cancelado_no_deja_filas(self):
+        pedido = self.crear({0: 1, 1: 2})
+        cambiar_estado(pedido, 'cancelado')
+        self.assertEqual(self.resumen(), ([], []))
+
+    def test_fechas_inexistentes(self):
+        self.client.force_login(User.objects.create_user('staff', password='clave-segura'))
+        response = self.client.get(reverse('panel_reporte_ventas'), {'desde': '2025-02-30', 'hasta': '2025-13-01'})
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(CommandError):
+            call_command('reconstruir_ventas', desde='2025-02-30')
+
+
+class ExportarPedidosTest(TestCase):
+    """Contenido del CSV y del JSONL, rango de fechas y fechas inexistentes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('staff', password='clave-segura')
+        cls.productos = sembrar_catalogo(productos=2)
+        cls.con_items = crear_pedido(
+            Pedido(
+                nombre_cliente='=HYPERLINK("http://ejemplo.com")', telefono='+54 2291 123456',
+                tipo_entrega='retiro', metodo_pago='efectivo', notas='@SUM(1)'
+            ),
+            {str(cls.productos[0].pk): 2, str(cls.productos[1].pk): 1}
+        )
+        cls.sin_items = Pedido.objects.create(nombre_cliente='Sin Items', telefono='2291000000', total=0)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def descargar(self, **parametros):
+        response = self.client.get(reverse('panel_pedido_exportar'), parametros)
+        self.assertEqual(response.status_code, 200)
+        if response.is_async:
+            contenido = async_to_sync(leer_async)(response.streaming_content)
+        else:
+            contenido = b''.join(response.streaming_content)
+        return contenido.decode('utf-8')
+
+    def filas_csv(self, **parametros):
+        contenido = self.descargar(**parametros)
+        self.assertTrue(contenido.startswith('\ufeff'))
+        return list(csv.reader(io.StringIO(contenido[1:])))
+
+    def test_csv_una_fila_por_item(self):
+        encabezado, *filas = self.filas_csv()
+        self.assertEqual(encabezado, COLUMNAS_CSV)
+        columnas = [dict(zip(encabezado, fila)) for fila in filas]
+
+        del_pedido = [fila for fila in columnas if fila['pedido'] == str(self.con_items.pk)]
+        self.assertEqual(
+            sorted((fila['producto_id'], fila['cantidad']) for fila in del_pedido),
+            sorted([(str(self.productos[0].pk), '2'), (str(self.productos[1].pk), '1')])
+        )
+        # Lo que escribe el cliente no llega a Excel como fórmula
+        self.assertEqual(del_pedido[0]['cliente'], '\'=HYPERLINK("http://ejemplo.com")')
+        self.assertEqual(del_pedido[0]['telefono'], "'+54 2291 123456")
+        self.assertEqual(del_pedido[0]['notas'], "'@SUM(1)")
+
+        sin_items = [fila for fila in columnas if fila['pedido'] == str(self.sin_items.pk)]
+        self.assertEqual(len(sin_items), 1)
+        self.assertEqual((sin_items[0]['cliente'], sin_items[0]['producto_id']), ('Sin Items', ''))
+        self.assertEqual(len(filas), 3)
+
+    def test_jsonl_una_linea_por_pedido(self):
+        pedidos = {
+            datos['id']: datos
+            for datos in map(json.loads, self.descargar(formato='jsonl').splitlines())
+        }
+        self.assertEqual(set(pedidos), {self.con_items.pk, self.sin_items.pk})
+        self.assertEqual(pedidos[self.con_items.pk]['nombre_cliente'], '=HYPERLINK("http://ejemplo.com")')
+        self.assertEqual(len(pedidos[self.con_items.pk]['items']), 2)
+        self.assertEqual(pedidos[self.con_items.pk]['total'], str(self.con_items.total))
+        self.assertEqual(pedidos[self.sin_items.pk]['items'], [])
+
+    def test_rango_de_fechas_por_dia_local(self):
+        hoy = timezone.localdate()
+        ayer = hoy - timedelta(days=1)
+        medianoche_ayer = timezone.make_aware(datetime.combine(ayer, time.min))
+        # Justo en el borde de ayer y un segundo antes
+        Pedido.objects.filter(pk=self.con_items.pk).update(fecha=medianoche_ayer)
+        Pedido.objects.filter(pk=self.sin_items.pk).update(fecha=medianoche_ayer - timedelta(seconds=1))
+        hoy_pedido = Pedido.objects.create(nombre_cliente='Hoy', telefono='2291000001', total=0)
+
+        def pedidos(**parametros):
+            return {int(fila[0]) for fila in self.filas_csv(**parametros)[1:]}
+
+        self.assertEqual(pedidos(desde=ayer.isoformat()), {self.con_items.pk, hoy_pedido.pk})
+        self.assertEqual(pedidos(desde=ayer.isoformat(), hasta=ayer.isoformat()), {self.con_items.pk})
+        self.assertEqual(pedidos(hasta=(ayer - timedelta(days=1)).isoformat()), {self.sin_items.pk})
+
+    def test_fechas_inexistentes(self):
+        response = self.client.get(reverse('panel_pedido_exportar'), {'desde': '2025-02-30'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="pedidos.csv"')
+        with self.assertRaises(CommandError):
+            call_command('exportar_pedidos', hasta='2025-02-30')
+
+
+@override_settings(DESPLIEGUE_ASGI=False)
+class EventosPedidosTest(TestCase):
+    """Con WSGI cada request de /panel/eventos/ responde lo pendiente y cierra"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('staff', password='clave-segura')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client.force_login(self.usuario)
+        self.pedido = Pedido.objects.create(nombre_cliente='Cliente', telefono='2291123456', total=0)
+
+    def sondear(self, ultimo_id=None):
+        headers = {'Last-Event-ID': ultimo_id} if ultimo_id else {}
+        response = self.client.get(reverse('panel_eventos'), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.streaming)
+        texto = response.content.decode()
+        self.assertTrue(texto.startswith('retry: 3000'))
+        return texto, re.findall(r'^id: (.+)$', texto, re.MULTILINE)[-1]
+
+    def test_primera_conexion_marca_el_punto_de_partida(self):
+        for ultimo_id in (None, '²', 'basura'):
+            with self.subTest(ultimo_id=ultimo_id):
+                texto, ultimo = self.sondear(ultimo_id)
+                self.assertNotIn('event:', texto)
+                self.assertTrue(ultimo.startswith(f'{self.pedido.pk}:'))
+
+    def test_pedidos_nuevos_y_cambios(self):
+        _, ultimo = self.sondear()
+        texto, sin_cambios = self.sondear(ultimo)
+        self.assertNotIn('event:', texto)
+        self.assertEqual(sin_cambios, ultimo)
+
+        nuevo = Pedido.objects.create(nombre_cliente='Otro', telefono='2291654321', total=0)
+        texto, ultimo = self.sondear(ultimo)
+        self.assertIn('event: pedido', texto)
+        self.assertIn('"nombre_cliente": "Otro"', texto)
+        self.assertTrue(ultimo.startswith(f'{nuevo.pk}:'))
+
+        cambiar_estado(self.pedido, 'preparando')
+        texto, ultimo = self.sondear(ultimo)
+        self.assertIn('event: actualizado', texto)
+        self.assertNotIn('event: pedido', texto)
+        texto, _ = self.sondear(ultimo)
+        self.assertNotIn('event:', texto)
+
+    def test_stream_asgi_retoma_desde_el_id(self):
+        """aeventos_pedidos (ASGI) usa el mismo id y manda lo que pasó mientras estaba desconectado"""
+        _, ultimo = self.sondear()
+        desde, version = leer_ultimo_id(ultimo)
+        nuevo = Pedido.objects.create(nombre_cliente='Otro', telefono='2291654321', total=0)
+
+        async def leer():
+            return [texto async for texto in aeventos_pedidos(desde, duracion=0.5, version=version)]
+
+        texto = ''.join(async_to_sync(leer)())
+        self.assertIn('event: pedido', texto)
+        self.assertIn(f'id: {nuevo.pk}:', texto)
+
+
+class MetricasTest(TestCase):
+    """Medición por request y el endpoint de Prometheus"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='clave-segura', is_staff=True)
+        cls.cliente = User.objects.create_user('cliente', password='clave-segura')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def pedir_prometheus(self, **headers):
+        return self.client.get(reverse('panel_metricas_prometheus'), headers=headers)
+
+    @override_settings(METRICAS_TOKEN='secreto')
+    def test_acceso_prometheus(self):
+        self.assertEqual(self.pedir_prometheus().status_code, 403)
+        self.assertEqual(self.pedir_prometheus(Authorization='Bearer otro').status_code, 403)
+        self.assertEqual(self.pedir_prometheus(Authorization='Bearer secreto').status_code, 200)
+
+        self.client.force_login(self.cliente)
+        self.assertEqual(self.pedir_prometheus().status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.pedir_prometheus().status_code, 200)
+
+    @override_settings(METRICAS_TOKEN='')
+    def test_sin_token_configurado_no_acepta_bearer_vacio(self):
+        self.assertEqual(self.pedir_prometheus(Authorization='Bearer ').status_code, 403)
+
+    def test_cuenta_consultas_duplicadas_de_un_n_mas_1(self):
+        sembrar_catalogo(categorias=2, productos=5)
+        medicion = Medicion()
+        with connection.execute_wrapper(medicion):
+            # Sin select_related: una consulta por la categoría de cada producto
+            nombres = [producto.categoria.nombre for producto in Producto.objects.all()]
+        self.assertEqual(len(nombres), 5)
+        self.assertEqual(medicion.consultas, 6)
+        self.assertEqual(medicion.duplicadas, 4)
+
+    def test_formato_prometheus(self):
+        self.client.get(reverse('home'))
+        self.client.get(reverse('home'))
+        self.client.force_login(self.staff)
+        texto = self.pedir_prometheus().content.decode()
+
+        self.assertIn('# TYPE mardeburger_request_segundos histogram', texto)
+        self.assertIn('mardeburger_request_segundos_bucket{vista="home",le="+Inf"}', texto)
+        # Los buckets son acumulados y el último es igual a _count
+        for metrica in ('mardeburger_request_segundos', 'mardeburger_request_consultas'):
+            buckets = [
+                int(valor) for valor in
+                re.findall(rf'^{metrica}_bucket{{vista="home",le="[^"]+"}} (\d+)$', texto, re.MULTILINE)
+            ]
+            total = int(re.search(rf'^{metrica}_count{{vista="home"}} (\d+)$', texto, re.MULTILINE).group(1))
+            self.assertEqual(buckets, sorted(buckets))
+            self.assertEqual(buckets[-1], total)
+            self.assertGreaterEqual(total, 2)
+        self.assertRegex(texto, r'(?m)^mardeburger_consultas_duplicadas_total\{vista="home"\} \d+$')
+
+    def test_suma_los_procesos(self):
+        """Cada proceso publica en su propio lugar y se suman todos"""
+        for pid in (1001, 1002):
+            otro = Registro()
+            medicion = Medicion()
+            medicion.consultas = 3
+            otro.registrar('vista_prueba', 0.01, medicion)
+            with mock.patch('panel.metricas.os.getpid', return_value=pid):
+                otro.publicar()
+                otro.publicar()
+
+        datos = metricas_por_vista()['vista_prueba']
+        self.assertEqual(datos['requests'], 2)
+        self.assertEqual(datos['consultas'], 6)
@@ -23,5 +23,16 @@ urlpatterns = [
     
     # Pedidos
     path('pedidos/', views.PedidoListView.as_view(), name='panel_pedido_list'),
-    path('pedidos/<int:pk>/cancelar/', views.PedidoDeleteView.as_view(), name='panel_pedido_delete'),
+    path('pedidos/exportar/', views.ExportarPedidosView.as_view(), name='panel_pedido_exportar'),
+    path('pedidos/<int:pk>/estado/', views.PedidoEstadoView.as_view(), name='panel_pedido_estado'),
+    path('cocina/', views.CocinaView.as_view(), name='panel_cocina'),
+    path('eventos/', views.EventosPedidosView.as_view(), name='panel_eventos'),
+    
+    # Reportes
+    path('reportes/ventas/', views.ReporteVentasView.as_view(), name='panel_reporte_ventas'),
+    path('reportes/mas-vendidos/', views.MasVendidosView.as_view(), name='panel_mas_vendidos'),
+    
+    # Métricas
+    path('metricas/', views.MetricasView.as_view(), name='panel_metricas'),
+    path('metricas/prometheus/', views.MetricasPrometheusView.as_view(), name='panel_metricas_prometheus'),
 ]
\ No newline at end of file
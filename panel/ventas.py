@@ -0,0 +1,253 @@
+"""
+Resumen diario de ventas (VentaDiaria y VentaDiariaProducto).
+
+Se actualiza de forma incremental: al crearse un pedido (señal
+menu.signals.pedido_creado) se suman sus importes al día correspondiente
+y al cancelarlo (o borrarlo) se restan. Los reportes del panel leen solo de
+estas tablas, sin recorrer el historial de pedidos.
+
+Si las tablas quedan desfasadas (por ejemplo, pedidos editados desde el
+admin) `python manage.py reconstruir_ventas` las recalcula.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from menu.models import ItemPedido, Pedido
+from .models import VentaDiaria, VentaDiariaProducto
+
+PERIODOS = {
+    'dia': ('Día', None, 30),
+    'semana': ('Semana', TruncWeek, 7 * 12),
+    'mes': ('Mes', TruncMonth, 365),
+}
+
+
+def _sumar(modelo, claves, defaults=None, **incrementos):
+    """
+    Suma los incrementos a la fila con esas claves, creándola si no
+    existe. El UPDATE con F() evita perder sumas entre pedidos simultáneos.
+    """
+    cambios = {campo: F(campo) + valor for campo, valor in incrementos.items()}
+    if modelo.objects.filter(**claves).update(**cambios):
+        return
+
+    try:
+        with transaction.atomic():
+            modelo.objects.create(**claves, **(defaults or {}), **incrementos)
+    except IntegrityError:
+        # Otro pedido creó la fila entre el UPDATE y el INSERT
+        modelo.objects.filter(**claves).update(**cambios)
+
+
+@transaction.atomic
+def _sumar_productos(fecha, por_producto, signo):
+    """
+    Suma las líneas del pedido ({producto_id: [nombre, cantidad, ingresos]})
+    a VentaDiariaProducto con la misma cantidad de consultas sin importar
+    cuántos productos tenga: las filas existentes se bloquean y se
+    actualizan con un solo UPDATE (F() + incremento) y las que faltan se
+    crean con un solo INSERT.
+    """
+    existentes = dict(
+        VentaDiariaProducto.objects.select_for_update()
+        .filter(fecha=fecha, producto_id__in=list(por_producto))
+        .values_list('producto_id', 'pk')
+    )
+
+    actualizar = []
+    nuevas = []
+    for producto_id, (nombre, cantidad, ingresos) in por_producto.items():
+        if producto_id in existentes:
+            actualizar.append(VentaDiariaProducto(
+                pk=existentes[producto_id],
+                cantidad=F('cantidad') + signo * cantidad,
+                ingresos=F('ingresos') + signo * ingresos,
+            ))
+        else:
+            nuevas.append(VentaDiariaProducto(
+                fecha=fecha, producto_id=producto_id, nombre_producto=nombre,
+                cantidad=signo * cantidad, ingresos=signo * ingresos,
+            ))
+
+    if actualizar:
+        VentaDiariaProducto.objects.bulk_update(actualizar, ['cantidad', 'ingresos'])
+
+    if nuevas:
+        try:
+            with transaction.atomic():
+                VentaDiariaProducto.objects.bulk_create(nuevas)
+        except IntegrityError:
+            # Otro pedido creó alguna de las filas al mismo tiempo
+            for fila in nuevas:
+                _sumar(
+                    VentaDiariaProducto,
+                    {'fecha': fecha, 'producto_id': fila.producto_id},
+                    defaults={'nombre_producto': fila.nombre_producto},
+                    cantidad=fila.cantidad,
+                    ingresos=fila.ingresos,
+                )
+
+
+def _registrar(pedido, lineas, signo):
+    """Suma (signo=1) o resta (signo=-1) el pedido al resumen de su día"""
+    fecha = timezone.localdate(pedido.fecha)
+
+    _sumar(
+        VentaDiaria,
+        {'fecha': fecha, 'metodo_pago': pedido.metodo_pago, 'tipo_entrega': pedido.tipo_entrega},
+        pedidos=signo,
+        ingresos=signo * pedido.total,
+    )
+
+    por_producto = {}
+    for producto_id, nombre, cantidad, subtotal in lineas:
+        acumulado = por_producto.setdefault(producto_id, [nombre, 0, 0])
+        acumulado[1] += cantidad
+        acumulado[2] += subtotal
+
+    _sumar_productos(fecha, por_producto, signo)
+
+    if signo < 0:
+        # Las filas que quedaron en cero se borran, como si el pedido no
+        # hubiera existido (igual que al reconstruir)
+        VentaDiaria.objects.filter(fecha=fecha, pedidos__lte=0).delete()
+        VentaDiariaProducto.objects.filter(fecha=fecha, cantidad__lte=0).delete()
+
+
+def sumar_pedido(pedido, items):
+    """Agrega un pedido recién creado (con sus items) al resumen"""
+    _registrar(pedido, [
+        (item.producto_id, item.producto.nombre, item.cantidad, item.subtotal())
+        for item in items
+    ], 1)
+
+
+def restar_pedido(pedido):
+    """Descuenta del resumen un pedido cancelado"""
+    items = pedido.items.values_list('producto_id', 'producto__nombre', 'cantidad', 'precio_unitario')
+    _registrar(pedido, [
+        (producto_id, nombre, cantidad, cantidad * precio)
+        for producto_id, nombre, cantidad, precio in items
+    ], -1)
+
+
+@transaction.atomic
+def reconstruir_ventas(desde=None, hasta=None):
+    """
+    Recalcula el resumen desde Pedido e ItemPedido, para todo el
+    historial o para un rango de fechas (inclusive). Devuelve la cantidad
+    de filas creadas en cada tabla.
+    """
+    # Los cancelados no cuentan como venta
+    pedidos = Pedido.objects.exclude(estado='cancelado').order_by()
+    items = ItemPedido.objects.exclude(pedido__estado='cancelado').order_by()
+    ventas = VentaDiaria.objects.all()
+    ventas_producto = VentaDiariaProducto.objects.all()
+
+    if desde:
+        pedidos = pedidos.filter(fecha__date__gte=desde)
+        items = items.filter(pedido__fecha__date__gte=desde)
+        ventas = ventas.filter(fecha__gte=desde)
+        ventas_producto = ventas_producto.filter(fecha__gte=desde)
+    if hasta:
+        pedidos = pedidos.filter(fecha__date__lte=hasta)
+        items = items.filter(pedido__fecha__date__lte=hasta)
+        ventas = ventas.filter(fecha__lte=hasta)
+        ventas_producto = ventas_producto.filter(fecha__lte=hasta)
+
+    ventas.delete()
+    ventas_producto.delete()
+
+    zona = timezone.get_current_timezone()
+    por_dia = pedidos.annotate(dia=TruncDate('fecha', tzinfo=zona)).values(
+        'dia', 'metodo_pago', 'tipo_entrega'
+    ).annotate(cantidad=Count('id'), suma=Sum('total'))
+
+    creadas = VentaDiaria.objects.bulk_create((
+        VentaDiaria(
+            fecha=fila['dia'],
+            metodo_pago=fila['metodo_pago'],
+            tipo_entrega=fila['tipo_entrega'],
+            pedidos=fila['cantidad'],
+            ingresos=fila['suma'],
+        )
+        for fila in por_dia.iterator()
+    ), batch_size=500)
+
+    por_producto = items.annotate(dia=TruncDate('pedido__fecha', tzinfo=zona)).values(
+        'dia', 'producto_id', 'producto__nombre'
+    ).annotate(
+        unidades=Sum('cantidad'),
+        suma=Sum(F('cantidad') * F('precio_unitario'), output_field=DecimalField()),
+    )
+
+    creadas_producto = VentaDiariaProducto.objects.bulk_create((
+        VentaDiariaProducto(
+            fecha=fila['dia'],
+            producto_id=fila['producto_id'],
+            nombre_producto=fila['producto__nombre'],
+            cantidad=fila['unidades'],
+            ingresos=fila['suma'],
+        )
+        for fila in por_producto.iterator()
+    ), batch_size=500)
+
+    return len(creadas), len(creadas_producto)
+
+
+# Reportes (solo leen el resumen)
+
+def rango_por_defecto(periodo):
+    """Desde/hasta por defecto para el período: últimos 30 días, 12 semanas o 12 meses"""
+    hasta = timezone.localdate()
+    return hasta - timedelta(days=PERIODOS[periodo][2] - 1), hasta
+
+
+def ventas_por_periodo(periodo, desde, hasta):
+    """Pedidos e ingresos agrupados por día, semana o mes"""
+    truncar = PERIODOS[periodo][1]
+    ventas = VentaDiaria.objects.filter(fecha__range=(desde, hasta))
+    agrupador = truncar('fecha') if truncar else F('fecha')
+
+    return list(
+        ventas.annotate(periodo=agrupador).values('periodo')
+        .annotate(pedidos=Sum('pedidos'), ingresos=Sum('ingresos'))
+        .order_by('periodo')
+    )
+
+
+def ventas_por_tipo(desde, hasta):
+    """Totales del rango por método de pago y por tipo de entrega"""
+    ventas = VentaDiaria.objects.filter(fecha__range=(desde, hasta)).order_by()
+    pagos = dict(Pedido.METODO_PAGO)
+    entregas = dict(Pedido.TIPO_ENTREGA)
+
+    return {
+        'metodo_pago': [
+            {**fila, 'nombre': pagos.get(fila['metodo_pago'], fila['metodo_pago'])}
+            for fila in ventas.values('metodo_pago').annotate(
+                pedidos=Sum('pedidos'), ingresos=Sum('ingresos')
+            ).order_by('-ingresos')
+        ],
+        'tipo_entrega': [
+            {**fila, 'nombre': entregas.get(fila['tipo_entrega'], fila['tipo_entrega'])}
+            for fila in ventas.values('tipo_entrega').annotate(
+                pedidos=Sum('pedidos'), ingresos=Sum('ingresos')
+            ).order_by('-ingresos')
+        ],
+    }
+
+
+def mas_vendidos(desde, hasta, limite=20):
+    """Productos con más unidades vendidas en el rango"""
+    return list(
+        VentaDiariaProducto.objects.filter(fecha__range=(desde, hasta))
+        .values('producto_id', 'nombre_producto')
+        .annotate(cantidad=Sum('cantidad'), ingresos=Sum('ingresos'))
+        .filter(cantidad__gt=0)
+        .order_by('-cantidad', '-ingresos')[:limite]
+    )
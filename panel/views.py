@@ -1,11 +1,24 @@
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.views import LoginView, LogoutView
-from django.views.generic import TemplateView, ListView, CreateView, UpdateView, DeleteView
+from django.views.generic import View, TemplateView, ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from django.shortcuts import redirect
+from django.shortcuts import get_object_or_404, redirect
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.contrib import messages
+from django.db.models import Count
 from menu.models import Producto, Categoria, Pedido
-from django.db.models import Q
+from menu.catalogo import estadisticas_catalogo
+from .services import metricas_dashboard
+from . import eventos, exportar, metricas, ventas
+from django.utils.dateparse import parse_date
+from menu.busqueda import filtro_pedidos
+from menu.paginacion import paginar_por_cursor
+from menu.pedidos import contar_pedidos, pedidos_activos, ultimo_pedido
+from menu.services import TransicionInvalidaError, cambiar_estado
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from menu.tareas import metricas_tareas
 
 # ============================================
 # AUTENTICACIÓN
@@ -36,11 +49,8 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_productos'] = Producto.objects.count()
-        context['total_categorias'] = Categoria.objects.count()
-        context['total_pedidos'] = Pedido.objects.count()
-        context['productos_disponibles'] = Producto.objects.filter(disponible=True).count()
-        context['ultimos_pedidos'] = Pedido.objects.all()[:5]
+        context.update(metricas_dashboard())
+        context['cache_catalogo'] = estadisticas_catalogo()
         return context
 
 
@@ -55,6 +65,9 @@ class CategoriaListView(LoginRequiredMixin, ListView):
     context_object_name = 'categorias'
     login_url = reverse_lazy('panel_login')
     ordering = ['orden', 'nombre']
+    
+    def get_queryset(self):
+        return super().get_queryset().annotate(total_productos=Count('productos'))
 
 
 class CategoriaCreateView(LoginRequiredMixin, CreateView):
@@ -107,6 +120,9 @@ class ProductoListView(LoginRequiredMixin, ListView):
     login_url = reverse_lazy('panel_login')
     ordering = ['categoria', 'nombre']
     paginate_by = 12
+    
+    def get_queryset(self):
+        return super().get_queryset().select_related('categoria')
 
 
 class ProductoCreateView(LoginRequiredMixin, CreateView):
@@ -157,33 +173,265 @@ class PedidoListView(LoginRequiredMixin, ListView):
     template_name = 'panel/pedido_list.html'
     context_object_name = 'pedidos'
     login_url = reverse_lazy('panel_login')
-    ordering = ['-fecha']
+    ordering = ['-fecha', '-id']
     paginate_by = 20
     
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Paginación por cursor (?despues=... / ?antes=...) en lugar de
+        ?page=N: cada página cuesta lo mismo sin importar cuán atrás esté.
+        """
+        antes = self.request.GET.get('antes')
+        cursor = antes or self.request.GET.get('despues')
+        pagina = paginar_por_cursor(queryset, cursor, anterior=bool(antes), tamano=page_size)
+        pagina.total = contar_pedidos(queryset)
+        return (None, pagina, pagina.object_list, pagina.has_other_pages())
+    
     def get_queryset(self):
         queryset = super().get_queryset()
         
-        # Búsqueda por número de orden o nombre
+        # Búsqueda por número de orden, teléfono o nombre (ver menu.busqueda)
         search = self.request.GET.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(id__icontains=search) | 
-                Q(nombre_cliente__icontains=search)
-            )
+            queryset = queryset.filter(filtro_pedidos(search))
         
         # Filtro por tipo de entrega
         tipo_entrega = self.request.GET.get('tipo_entrega')
         if tipo_entrega:
             queryset = queryset.filter(tipo_entrega=tipo_entrega)
         
+        # Filtro por estado
+        estado = self.request.GET.get('estado')
+        if estado:
+            queryset = queryset.filter(estado=estado)
+        
         return queryset
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['estados'] = Pedido.ESTADOS
+        return context
 
-class PedidoDeleteView(LoginRequiredMixin, DeleteView):
-    """Cancelar/Eliminar pedido"""
-    model = Pedido
-    success_url = reverse_lazy('panel_pedido_list')
+class PedidoEstadoView(LoginRequiredMixin, View):
+    """
+    Cambia el estado de un pedido (POST estado=...), desde la lista o la
+    cola de cocina. Cancelar ya no borra el pedido: queda en el historial
+    y se descuenta del resumen de ventas (panel.signals).
+    """
     login_url = reverse_lazy('panel_login')
     
-    def delete(self, request, *args, **kwargs):
-        messages.success(request, f'Pedido #{self.get_object().id} cancelado exitosamente')
-        return super().delete(request, *args, **kwargs)
+    def post(self, request, pk):
+        pedido = get_object_or_404(Pedido, pk=pk)
+        estado = request.POST.get('estado')
+        if estado not in dict(Pedido.ESTADOS):
+            messages.error(request, f'Estado inválido para el pedido #{pedido.id}')
+        else:
+            try:
+                cambiar_estado(pedido, estado)
+            except TransicionInvalidaError as error:
+                messages.error(request, str(error))
+            else:
+                if pedido.estado == 'cancelado':
+                    messages.success(request, f'Pedido #{pedido.id} cancelado exitosamente')
+                else:
+                    messages.success(request, f'Pedido #{pedido.id}: {pedido.get_estado_display()}')
+        
+        siguiente = request.POST.get('next')
+        if siguiente and url_has_allowed_host_and_scheme(siguiente, allowed_hosts={request.get_host()}):
+            return redirect(siguiente)
+        return redirect('panel_pedido_list')
+
+
+class CocinaView(LoginRequiredMixin, TemplateView):
+    """Cola de cocina: solo los pedidos activos, agrupados por estado"""
+    template_name = 'panel/cocina.html'
+    login_url = reverse_lazy('panel_login')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        pedidos = list(pedidos_activos())
+        nombres = dict(Pedido.ESTADOS)
+        context['columnas'] = [
+            {
+                'estado': estado,
+                'nombre': nombres[estado],
+                'pedidos': [pedido for pedido in pedidos if pedido.estado == estado],
+            }
+            for estado in Pedido.ESTADOS_ACTIVOS
+        ]
+        context['total_activos'] = len(pedidos)
+        return context
+
+
+class EventosPedidosView(LoginRequiredMixin, View):
+    """
+    Avisos de pedidos nuevos como server-sent events (ver panel.eventos):
+    con WSGI responde lo pendiente y cierra, con ASGI deja la conexión
+    abierta. ?vista=lista agrega el HTML de la fila para la lista.
+    """
+    login_url = reverse_lazy('panel_login')
+    
+    def get(self, request):
+        # Al reconectarse el navegador manda el último id que recibió
+        desde, version = eventos.leer_ultimo_id(
+            request.headers.get('Last-Event-ID') or request.GET.get('desde')
+        )
+        con_html = request.GET.get('vista') == 'lista'
+        
+        if not settings.DESPLIEGUE_ASGI:
+            response = HttpResponse(
+                ''.join(eventos.sondeo_pedidos(desde, version, request, con_html)),
+                content_type='text/event-stream'
+            )
+            response['Cache-Control'] = 'no-cache'
+            return response
+        
+        if desde is None:
+            desde = ultimo_pedido()
+        response = StreamingHttpResponse(
+            eventos.aeventos_pedidos(desde, request, con_html, version=version),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Sin buffer en nginx, para que cada evento salga en el momento
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class ExportarPedidosView(LoginRequiredMixin, View):
+    """
+    Descarga de pedidos con sus items (?formato=csv|jsonl&desde=&hasta=).
+    La respuesta se genera mientras se envía (ver panel.exportar).
+    """
+    login_url = reverse_lazy('panel_login')
+    
+    def get(self, request, *args, **kwargs):
+        formato = request.GET.get('formato')
+        if formato not in exportar.FORMATOS:
+            formato = 'csv'
+        desde = leer_fecha(request.GET.get('desde'))
+        hasta = leer_fecha(request.GET.get('hasta'))
+        
+        lineas = exportar.exportar(formato, desde, hasta)
+        if settings.DESPLIEGUE_ASGI:
+            lineas = exportar.en_lotes_async(lineas)
+        
+        response = StreamingHttpResponse(
+            lineas,
+            content_type=f'{exportar.FORMATOS[formato]}; charset=utf-8'
+        )
+        nombre = exportar.nombre_archivo(formato, desde, hasta)
+        response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+        return response
+
+
+# ============================================
+# REPORTES DE VENTAS
+# ============================================
+
+def leer_fecha(valor):
+    """AAAA-MM-DD como date; None si falta o no existe (2025-02-30)"""
+    try:
+        return parse_date(valor or '')
+    except ValueError:
+        return None
+
+
+class ReporteMixin:
+    """Rango de fechas (?desde=&hasta=) para los reportes de ventas"""
+    periodo = 'dia'
+    
+    def get_rango(self):
+        desde, hasta = ventas.rango_por_defecto(self.periodo)
+        desde = leer_fecha(self.request.GET.get('desde')) or desde
+        hasta = leer_fecha(self.request.GET.get('hasta')) or hasta
+        if desde > hasta:
+            desde, hasta = hasta, desde
+        return desde, hasta
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['desde'], context['hasta'] = self.get_rango()
+        return context
+
+
+class ReporteVentasView(LoginRequiredMixin, ReporteMixin, TemplateView):
+    """Ingresos por día, semana o mes (lee el resumen diario de ventas)"""
+    template_name = 'panel/reporte_ventas.html'
+    login_url = reverse_lazy('panel_login')
+    
+    def get(self, request, *args, **kwargs):
+        periodo = request.GET.get('periodo')
+        self.periodo = periodo if periodo in ventas.PERIODOS else 'dia'
+        return super().get(request, *args, **kwargs)
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        filas = ventas.ventas_por_periodo(self.periodo, context['desde'], context['hasta'])
+        
+        context['periodo'] = self.periodo
+        context['periodos'] = [(clave, datos[0]) for clave, datos in ventas.PERIODOS.items()]
+        context['filas'] = filas
+        context['maximo'] = max((fila['ingresos'] for fila in filas), default=0)
+        context['total_pedidos'] = sum(fila['pedidos'] for fila in filas)
+        context['total_ingresos'] = sum((fila['ingresos'] for fila in filas), 0)
+        context.update(ventas.ventas_por_tipo(context['desde'], context['hasta']))
+        return context
+
+
+class MasVendidosView(LoginRequiredMixin, ReporteMixin, TemplateView):
+    """Productos más vendidos del rango (lee el resumen diario de ventas)"""
+    template_name = 'panel/mas_vendidos.html'
+    login_url = reverse_lazy('panel_login')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        productos = ventas.mas_vendidos(context['desde'], context['hasta'])
+        context['productos'] = productos
+        context['maximo'] = max((p['cantidad'] for p in productos), default=0)
+        return context
+
+
+# ============================================
+# MÉTRICAS
+# ============================================
+
+class MetricasView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """Duración, consultas SQL y consultas duplicadas por vista (solo staff)"""
+    template_name = 'panel/metricas.html'
+    login_url = reverse_lazy('panel_login')
+    
+    def test_func(self):
+        return self.request.user.is_staff
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['vistas'] = metricas.resumen_vistas()
+        context['tareas'] = [
+            (clave.replace('_', ' ').capitalize(), valor)
+            for clave, valor in metricas_tareas().items()
+        ]
+        context['activas'] = settings.METRICAS_ACTIVAS
+        return context
+
+
+class MetricasPrometheusView(View):
+    """
+    Las mismas métricas en formato Prometheus. Acepta el token de
+    MARDEBURGER_METRICAS_TOKEN (Authorization: Bearer) o una sesión de staff.
+    """
+    
+    def get(self, request):
+        if not self.autorizado(request):
+            return HttpResponse('No autorizado', status=403, content_type='text/plain')
+        return HttpResponse(
+            metricas.texto_prometheus(metricas_tareas()),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+    
+    def autorizado(self, request):
+        token = settings.METRICAS_TOKEN
+        enviado = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if token and enviado and constant_time_compare(enviado, token):
+            return True
+        return request.user.is_authenticated and request.user.is_staff